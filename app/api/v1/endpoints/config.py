@@ -20,6 +20,7 @@ async def get_frontend_config():
         APP_PORT=settings.APP_PORT,
         DEBUG=settings.DEBUG,
         USE_LOCAL_DB=settings.USE_LOCAL_DB,
+        VECTOR_DB_PROVIDER=settings.ACTIVE_VECTOR_DB,
         # ==========================================
         # 2. Dynamic Model Providers & Engines
         # ==========================================
@@ -50,6 +51,8 @@ async def get_frontend_config():
         CHUNKING_STRATEGY=settings.CHUNKING_STRATEGY,
         ENABLE_TABLE_PARSING=settings.ENABLE_TABLE_PARSING,
         TOP_K=settings.TOP_K,
+        SEARCH_MODE=settings.SEARCH_MODE,
+        RETRIEVAL_PROFILE=settings.RETRIEVAL_PROFILE,
         # ==========================================
         # 6. Database / Infrastructure Ecosystem
         # ==========================================
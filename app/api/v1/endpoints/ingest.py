@@ -11,7 +11,11 @@ from fastapi import (
 from app.components.loaders.pdf_loader import parse_pdf
 from app.components.loaders.web_loader import parse_url
 from app.core.dependencies import get_ingestion_service
-from app.models.api_requests import IngestRequest, UrlIngestRequest
+from app.models.api_requests import (
+    BulkIngestRequest,
+    IngestRequest,
+    UrlIngestRequest,
+)
 from app.models.api_response import IngestResponse
 
 router = APIRouter()
@@ -90,3 +94,40 @@ async def ingest_custom_text(
     """Ingest any list of strings directly as JSON."""
     await service.ingest_texts(request.texts, source_name="manual_upload")
     return IngestResponse(status="success", count=len(request.texts))
+
+
+@router.post(
+    "/bulk", response_model=IngestResponse, summary="Bulk-ingest many sources at once"
+)
+async def ingest_bulk(
+    background_tasks: BackgroundTasks,
+    request: BulkIngestRequest,
+    service=Depends(get_ingestion_service),
+):
+    """
+    Ingest several sources in one background job. With bulk_load (default) the
+    vector index is rebuilt once after all rows are stored instead of being
+    updated row by row.
+    """
+    if not request.documents:
+        raise HTTPException(status_code=400, detail="No documents to ingest")
+
+    background_tasks.add_task(
+        service.ingest_sources,
+        documents=request.documents,
+        bulk_load=request.bulk_load,
+    )
+
+    return IngestResponse(
+        status="Bulk ingestion started in background",
+        count=sum(len(texts) for texts in request.documents.values()),
+    )
+
+
+@router.delete(
+    "/source", response_model=IngestResponse, summary="Delete an ingested source"
+)
+async def delete_source(name: str, service=Depends(get_ingestion_service)):
+    """Remove every chunk ingested under `name` (a file name or URL)."""
+    await service.delete_source(name)
+    return IngestResponse(status="deleted", filename=name)
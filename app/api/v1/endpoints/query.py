@@ -11,35 +11,49 @@ router = APIRouter()
 @router.post(
     "",
     response_model=QueryResponse,
-    summary="Query a specific file in the RAG knowledge base",
+    summary="Query one file, several files or the whole RAG knowledge base",
 )
 async def query_knowledge_base(request: ChatRequest, engine=Depends(get_rag_engine)):
     """
-    Search and Answer isolated strictly to an explicit file.
+    Search and Answer, isolated to the given files when any are provided.
 
     - **message**: Your question
-    - **file_name**: MANDATORY target file. Other documents will not be touched.
+    - **file_name**: Optional target file. Other documents will not be touched.
+    - **file_names**: Optional list of target files, searched in one round trip.
+      Omit both to search the whole knowledge base.
     - **translation_strategy**: Optional strategy (multi_query, hyde, etc.)
     - **prompt_name**: Optional custom system prompt name
+    - **search_mode**: Optional 'vector' or 'hybrid' (keyword + vector) retrieval
+    - **retrieval_profile**: Optional 'fast', 'balanced' or 'exhaustive'
+    - **hybrid_alpha**: Optional dense/keyword weight for Pinecone hybrid search
     """
-    if not request.file_name.strip():
+    target_files = [request.file_name] if request.file_name is not None else []
+    target_files += request.file_names or []
+    if any(not name.strip() for name in target_files):
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail={
                 "error_code": "VALIDATION_ERROR",
-                "message": "A valid target 'file_name' must be explicitly provided to ensure query isolation.",
+                "message": "File names must not be blank. Omit them to search the whole knowledge base.",
             },
         )
 
     system_report = load_prompt(request.prompt_name) if request.prompt_name else None
-    enriched_query = enrich_query(request.message, request.file_name)
+    # Topic enrichment only makes sense when the question targets a single file
+    enriched_query = enrich_query(
+        request.message, target_files[0] if len(target_files) == 1 else None
+    )
+    file_filter = target_files[0] if len(target_files) == 1 else target_files or None
 
     try:
         result = await engine.answer_question(
             query=enriched_query,
-            file_filter=request.file_name,
+            file_filter=file_filter,
             translation_strategy=request.translation_strategy,
             system_prompt=system_report,
+            search_mode=request.search_mode,
+            retrieval_profile=request.retrieval_profile,
+            hybrid_alpha=request.hybrid_alpha,
         )
         return result
     except RuntimeError as e:
@@ -2,6 +2,7 @@ from typing import List
 
 import tiktoken
 
+from app.components.embedders.batching import get_token_counter
 from app.core.config import settings
 
 
@@ -13,19 +14,26 @@ class TokenSafeMixin:
     ):
         self.encoder = tiktoken.encoding_for_model(model)
         self.max_tokens = max_tokens
+        # Counts are only reusable when they come from the embedding model's tokenizer
+        self.shares_counts = model == settings.EMBEDDING_MODEL
 
     def enforce_token_limit(self, chunks: List[str]) -> List[str]:
         safe_chunks = []
+        token_counts = []
 
         for chunk in chunks:
             tokens = self.encoder.encode(chunk)
 
             if len(tokens) <= self.max_tokens:
                 safe_chunks.append(chunk)
+                token_counts.append(len(tokens))
                 continue
 
             for i in range(0, len(tokens), self.max_tokens):
                 sub_tokens = tokens[i : i + self.max_tokens]
                 safe_chunks.append(self.encoder.decode(sub_tokens))
+                token_counts.append(len(sub_tokens))
 
+        if self.shares_counts:
+            get_token_counter().remember(safe_chunks, token_counts)
         return safe_chunks
@@ -0,0 +1,83 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import tiktoken
+
+from app.core.config import settings
+
+# Texts whose token count is remembered between chunking and embedding
+TOKEN_COUNT_CACHE_SIZE = 100_000
+
+
+class TokenCounter:
+    """
+    Token counts under the tokenizer TokenSafeMixin uses. The chunker records the
+    counts it already computed, so packing batches and charging the rate limiter
+    reuse them instead of encoding every chunk again. Entries are keyed by a
+    16-byte digest, so the cache holds no chunk texts.
+    """
+
+    def __init__(self, model: str, max_entries: int):
+        self.encoder = tiktoken.encoding_for_model(model)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._counts: "OrderedDict[bytes, int]" = OrderedDict()
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def remember(self, texts: List[str], counts: List[int]):
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            for key, count in zip(keys, counts):
+                self._counts[key] = count
+                self._counts.move_to_end(key)
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+
+    def count(self, texts: List[str]) -> List[int]:
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            counts = [self._counts.get(key) for key in keys]
+        missing = [text for text, count in zip(texts, counts) if count is None]
+        if not missing:
+            return counts
+
+        fresh = [len(tokens) for tokens in self.encoder.encode_batch(missing)]
+        self.remember(missing, fresh)
+        computed = iter(fresh)
+        return [next(computed) if count is None else count for count in counts]
+
+
+def pack_batches(
+    token_counts: List[int], max_tokens: int, max_items: int
+) -> List[Tuple[int, int]]:
+    """
+    Greedy, order-preserving packing into [start, end) ranges of at most
+    `max_items` texts and `max_tokens` tokens. A text over the budget on its own
+    (only possible when it exceeds EMBEDDING_MODEL_MAX_TOKEN) gets its own batch.
+    """
+    batches: List[Tuple[int, int]] = []
+    start, tokens = 0, 0
+    for i, count in enumerate(token_counts):
+        if i > start and (i - start >= max_items or tokens + count > max_tokens):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += count
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
+
+# One counter per process, shared by the chunkers, ingestion and the scheduler
+_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    global _counter
+    if _counter is None:
+        _counter = TokenCounter(settings.EMBEDDING_MODEL, TOKEN_COUNT_CACHE_SIZE)
+    return _counter
@@ -0,0 +1,436 @@
+import asyncio
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from psycopg.sql import SQL, Identifier
+from psycopg_pool import ConnectionPool
+
+from app.core.config import settings
+from app.core.interfaces import BaseEmbedder
+from app.core.sqlite import open_sqlite
+
+CACHE_TABLE = "rag_embedding_cache"
+
+# New rows written between two checks of the on-disk size
+EVICTION_CHECK_ROWS = 1000
+
+# Seconds between two hit/miss summaries of a CachedEmbedder
+SUMMARY_INTERVAL = 30.0
+
+# In-memory hits are written back to the store's last_used in batches: once this
+# many keys are pending, or this many seconds after the last write-back
+TOUCH_BATCH_KEYS = 1000
+TOUCH_INTERVAL = 60.0
+
+# (key, float32 vector bytes)
+CacheRow = Tuple[bytes, bytes]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Texts that differ only in Unicode form or whitespace share an entry."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model: str, dimension: int, text: str) -> bytes:
+    payload = f"{model}\0{dimension}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+class EmbeddingStore(ABC):
+    """
+    Persistent layer of the cache. Methods are blocking and thread-safe: they run
+    in worker threads, and the semantic chunker calls in from its own event loop.
+    """
+
+    @abstractmethod
+    def load(self, keys: List[bytes]) -> Dict[bytes, bytes]:
+        """Vectors found for `keys`; marks them as recently used."""
+
+    @abstractmethod
+    def save(self, rows: List[CacheRow]):
+        pass
+
+    @abstractmethod
+    def touch(self, keys: List[bytes]):
+        """Marks `keys` as recently used (hits served from the in-memory LRU)."""
+
+    @abstractmethod
+    def size(self) -> Tuple[int, int]:
+        """(entries, bytes of vector data)."""
+
+    @abstractmethod
+    def evict_oldest(self, count: int):
+        pass
+
+
+class SQLiteEmbeddingStore(EmbeddingStore):
+    """Single file next to the app, shared by the workers of one host."""
+
+    def __init__(self, path: str):
+        self._lock, self._conn = open_sqlite(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {CACHE_TABLE} (key BLOB PRIMARY KEY, "
+                "vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {CACHE_TABLE}_last_used_idx "
+                f"ON {CACHE_TABLE} (last_used)"
+            )
+
+    def load(self, keys: List[bytes]) -> Dict[bytes, bytes]:
+        found: Dict[bytes, bytes] = {}
+        with self._lock, self._conn:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                placeholders = ", ".join("?" * len(batch))
+                cur = self._conn.execute(
+                    f"SELECT key, vector FROM {CACHE_TABLE} "
+                    f"WHERE key IN ({placeholders})",
+                    batch,
+                )
+                hits = cur.fetchall()
+                found.update(hits)
+                if hits:
+                    self._conn.execute(
+                        f"UPDATE {CACHE_TABLE} SET last_used = ? "
+                        f"WHERE key IN ({', '.join('?' * len(hits))})",
+                        [time.time(), *(key for key, _ in hits)],
+                    )
+        return found
+
+    def save(self, rows: List[CacheRow]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {CACHE_TABLE} (key, vector, last_used) "
+                "VALUES (?, ?, ?)",
+                [(key, vector, now) for key, vector in rows],
+            )
+
+    def touch(self, keys: List[bytes]):
+        now = time.time()
+        with self._lock, self._conn:
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                self._conn.execute(
+                    f"UPDATE {CACHE_TABLE} SET last_used = ? "
+                    f"WHERE key IN ({', '.join('?' * len(batch))})",
+                    [now, *batch],
+                )
+
+    def size(self) -> Tuple[int, int]:
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT count(*), coalesce(sum(length(vector)), 0) FROM {CACHE_TABLE}"
+            ).fetchone()
+
+    def evict_oldest(self, count: int):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"DELETE FROM {CACHE_TABLE} WHERE key IN ("
+                f"SELECT key FROM {CACHE_TABLE} ORDER BY last_used LIMIT ?)",
+                [count],
+            )
+
+
+class PostgresEmbeddingStore(EmbeddingStore):
+    """
+    Table on DATABASE_URL, shared by every worker and host. Uses a small sync
+    pool: callers may sit on different event loops, which an async pool forbids.
+    """
+
+    def __init__(self, db_url: str):
+        self._pool = ConnectionPool(
+            db_url,
+            min_size=1,
+            max_size=4,
+            kwargs={"autocommit": True},
+            open=True,
+        )
+        with self._pool.connection() as conn:
+            conn.execute(
+                SQL("""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key BYTEA PRIMARY KEY,
+                    vector BYTEA NOT NULL,
+                    last_used TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """).format(table=Identifier(CACHE_TABLE))
+            )
+            conn.execute(
+                SQL("CREATE INDEX IF NOT EXISTS {idx} ON {table} (last_used)").format(
+                    idx=Identifier(f"{CACHE_TABLE}_last_used_idx"),
+                    table=Identifier(CACHE_TABLE),
+                )
+            )
+
+    def load(self, keys: List[bytes]) -> Dict[bytes, bytes]:
+        with self._pool.connection() as conn:
+            cur = conn.execute(
+                SQL("""
+                UPDATE {table} SET last_used = now()
+                WHERE key = ANY(%s)
+                RETURNING key, vector
+            """).format(table=Identifier(CACHE_TABLE)),
+                [keys],
+            )
+            return {bytes(key): bytes(vector) for key, vector in cur.fetchall()}
+
+    def save(self, rows: List[CacheRow]):
+        with self._pool.connection() as conn, conn.cursor() as cur:
+            cur.executemany(
+                SQL("""
+                INSERT INTO {table} (key, vector) VALUES (%s, %s)
+                ON CONFLICT (key) DO UPDATE
+                SET vector = EXCLUDED.vector, last_used = now()
+            """).format(table=Identifier(CACHE_TABLE)),
+                rows,
+            )
+
+    def touch(self, keys: List[bytes]):
+        with self._pool.connection() as conn:
+            conn.execute(
+                SQL("UPDATE {table} SET last_used = now() WHERE key = ANY(%s)").format(
+                    table=Identifier(CACHE_TABLE)
+                ),
+                [keys],
+            )
+
+    def size(self) -> Tuple[int, int]:
+        with self._pool.connection() as conn:
+            cur = conn.execute(
+                SQL(
+                    "SELECT count(*), coalesce(sum(length(vector)), 0) FROM {table}"
+                ).format(table=Identifier(CACHE_TABLE))
+            )
+            entries, size = cur.fetchone() or (0, 0)
+            return int(entries), int(size)
+
+    def evict_oldest(self, count: int):
+        with self._pool.connection() as conn:
+            conn.execute(
+                SQL("""
+                DELETE FROM {table} WHERE key IN (
+                    SELECT key FROM {table} ORDER BY last_used LIMIT %s
+                )
+            """).format(table=Identifier(CACHE_TABLE)),
+                [count],
+            )
+
+
+class EmbeddingCache:
+    """
+    Content-addressed vectors: an in-process LRU in front of a persistent store.
+    The store is trimmed to EMBEDDING_CACHE_MAX_MB, least recently used first;
+    in-memory hits refresh the store's recency too, batched (see TOUCH_BATCH_KEYS).
+    """
+
+    def __init__(self, store: EmbeddingStore, memory_items: int, max_bytes: int):
+        self.store = store
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._unchecked_rows = EVICTION_CHECK_ROWS  # check once at startup
+        self._touched: Dict[bytes, None] = {}  # memory hits not yet in the store
+        self._touched_at = time.monotonic()
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+
+    async def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self._touched[key] = None
+                    found[key] = vector
+            self.memory_hits += len(found)
+        touched = self._take_touched(force=False)
+        if touched:
+            await asyncio.to_thread(self.store.touch, touched)
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            loaded = await asyncio.to_thread(self.store.load, missing)
+            for key, blob in loaded.items():
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+            self._remember(found)
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    async def put_many(self, vectors: Dict[bytes, np.ndarray]):
+        if not vectors:
+            return
+        rows = [
+            (key, vector.astype(np.float32, copy=False).tobytes())
+            for key, vector in vectors.items()
+        ]
+        await asyncio.to_thread(self.store.save, rows)
+        self._remember(vectors)
+
+        with self._lock:
+            self._unchecked_rows += len(rows)
+            check = self._unchecked_rows >= EVICTION_CHECK_ROWS
+            if check:
+                self._unchecked_rows = 0
+        if check:
+            # Pending memory hits first, so the hottest vectors are not evicted
+            await asyncio.to_thread(self._evict, self._take_touched(force=True))
+
+    def _take_touched(self, force: bool) -> List[bytes]:
+        """The pending memory-hit keys once a write-back is due, else []."""
+        now = time.monotonic()
+        with self._lock:
+            due = (
+                len(self._touched) >= TOUCH_BATCH_KEYS
+                or now - self._touched_at >= TOUCH_INTERVAL
+            )
+            if not (self._touched and (force or due)):
+                return []
+            touched = list(self._touched)
+            self._touched.clear()
+            self._touched_at = now
+        return touched
+
+    def _remember(self, vectors: Dict[bytes, np.ndarray]):
+        if self.memory_items <= 0:
+            return
+        with self._lock:
+            for key, vector in vectors.items():
+                self._memory[key] = vector
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _evict(self, touched: List[bytes]):
+        if touched:
+            self.store.touch(touched)
+        entries, size = self.store.size()
+        if size <= self.max_bytes or not entries:
+            return
+        # Trim to 90% so the next few inserts do not trigger another pass
+        excess = size - int(self.max_bytes * 0.9)
+        count = -(-excess * entries // size)
+        self.store.evict_oldest(count)
+        print(f"[EmbedCache] Evicted {count} least recently used vectors")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": settings.EMBEDDING_CACHE,
+            "lookups": lookups,
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "memory_entries": len(self._memory),
+        }
+
+
+class CachedEmbedder(BaseEmbedder):
+    """
+    Wraps an embedder so each distinct (model, dimension, normalised text) is
+    embedded once: a batch looks everything up together and only the misses
+    (de-duplicated) reach the provider. Logs one summary per SUMMARY_INTERVAL
+    at most, not one line per batch.
+    """
+
+    def __init__(self, embedder: BaseEmbedder, cache: "EmbeddingCache"):
+        self.embedder = embedder
+        self.cache = cache
+        self.model = getattr(embedder, "model", type(embedder).__name__)
+        self.dimension = getattr(embedder, "dimension", settings.EMBEDDING_DIMENSION)
+        self._lock = threading.Lock()
+        self._texts = 0
+        self._sent = 0
+        self._summary_at = time.monotonic()
+
+    async def embed_text(self, text: str) -> List[float]:
+        return (await self.embed_batch([text]))[0]
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.model, self.dimension, text) for text in texts]
+        found = await self.cache.get_many(list(dict.fromkeys(keys)))
+
+        pending: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                pending.setdefault(key, text)
+
+        if pending:
+            vectors = await self.embedder.embed_batch(list(pending.values()))
+            fresh = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in zip(pending, vectors)
+            }
+            await self.cache.put_many(fresh)
+            found.update(fresh)
+
+        self._summarize(len(texts), len(pending))
+        return [found[key].tolist() for key in keys]
+
+    def _summarize(self, texts: int, sent: int):
+        now = time.monotonic()
+        with self._lock:
+            self._texts += texts
+            self._sent += sent
+            if now - self._summary_at < SUMMARY_INTERVAL:
+                return
+            texts, sent, since = self._texts, self._sent, self._summary_at
+            self._texts = self._sent = 0
+            self._summary_at = now
+
+        hit_rate = self.cache.stats()["hit_rate"] or 0.0
+        print(
+            f"[EmbedCache] {texts} texts in {now - since:.0f}s, {sent} sent to the "
+            f"provider (hit rate {hit_rate:.1%} since start)"
+        )
+
+
+# One cache (one LRU, one store connection) per process
+_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """The configured cache, or None when EMBEDDING_CACHE is "none"."""
+    global _cache
+    if settings.EMBEDDING_CACHE == "none":
+        return None
+    if _cache is None:
+        store: EmbeddingStore
+        if settings.EMBEDDING_CACHE == "sqlite":
+            store = SQLiteEmbeddingStore(settings.EMBEDDING_CACHE_PATH)
+        else:
+            store = PostgresEmbeddingStore(settings.DATABASE_URL)
+        _cache = EmbeddingCache(
+            store,
+            memory_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 2**20,
+        )
+        print(
+            f"[EmbedCache] Vectors cached in {settings.EMBEDDING_CACHE} "
+            f"(max {settings.EMBEDDING_CACHE_MAX_MB} MB, "
+            f"LRU: {settings.EMBEDDING_CACHE_MEMORY_ITEMS} vectors)"
+        )
+    return _cache
+
+
+def with_embedding_cache(embedder: BaseEmbedder) -> BaseEmbedder:
+    cache = get_embedding_cache()
+    return embedder if cache is None else CachedEmbedder(embedder, cache)
@@ -4,6 +4,7 @@ from typing import List
 
 from langchain_core.embeddings import Embeddings
 
+from app.components.embedders.batching import get_token_counter, pack_batches
 from app.core.config import settings
 from app.core.interfaces import BaseEmbedder
 
@@ -27,22 +28,20 @@ class LangChainEmbeddingsWrapper(Embeddings):
             return asyncio.run(coroutine)
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        batch_size = settings.BATCH_SIZE
-        all_embeddings = []
-
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
-
-            if hasattr(self.embedder, "embed_batch"):
-                batch_embeddings = self._run_async(self.embedder.embed_batch(batch))
-            else:
-                batch_embeddings = [
-                    self._run_async(self.embedder.embed_text(t)) for t in batch
-                ]
-
-            all_embeddings.extend(batch_embeddings)
-
-        return all_embeddings
+        return self._run_async(self._embed_documents(texts))
+
+    async def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Batches are packed by token budget and go out together, paced by the
+        # embedder's scheduler
+        ranges = pack_batches(
+            get_token_counter().count(texts),
+            settings.EMBEDDING_BATCH_TOKENS,
+            settings.BATCH_SIZE,
+        )
+        batches = await asyncio.gather(
+            *(self.embedder.embed_batch(texts[start:end]) for start, end in ranges)
+        )
+        return [vector for batch in batches for vector in batch]
 
     def embed_query(self, text: str) -> List[float]:
         return self._run_async(self.embedder.embed_text(text))
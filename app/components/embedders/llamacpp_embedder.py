@@ -0,0 +1,127 @@
+import asyncio
+import os
+import threading
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+from llama_cpp import Llama
+
+from app.core.config import settings
+from app.core.interfaces import BaseEmbedder
+
+# Epsilon of the layer norm applied before Matryoshka truncation
+LAYER_NORM_EPS = 1e-5
+
+
+class LlamaCppEmbedder(BaseEmbedder):
+    """
+    Embeds in-process with an embedding GGUF (nomic-embed, bge, gte, ...) from
+    MODELS_DIR: no network and no quota, so it is not rate limited.
+
+    llama.cpp evaluates a whole batch of inputs per call on `n_threads` CPU
+    threads. A Llama context is not thread-safe, so calls are serialised by a
+    lock and run in a worker thread, off the event loop.
+
+    If the model is wider than EMBEDDING_DIMENSION, vectors keep their leading
+    dimensions and are re-normalised (Matryoshka truncation). That only makes
+    sense for models trained for it, like nomic-embed-text-v1.5, whose recipe
+    layer-norms the full vector before slicing it (`layer_norm`, per model:
+    LOCAL_EMBEDDING_LAYER_NORM).
+    """
+
+    def __init__(
+        self,
+        model_file: str,
+        n_ctx: int,
+        n_threads: int,
+        truncate: bool,
+        layer_norm: bool = False,
+    ):
+        path = os.path.join(settings.MODELS_DIR, model_file)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Embedding model not found at: '{path}'")
+
+        print(f"[LlamaCppEmbedder] Loading {path} ({n_threads} threads)")
+        self._lock = threading.Lock()
+        self._llm = Llama(
+            model_path=path,
+            embedding=True,
+            n_ctx=n_ctx,
+            # Encoder models need each input in a single micro-batch
+            n_batch=n_ctx,
+            n_ubatch=n_ctx,
+            n_threads=n_threads,
+            n_threads_batch=n_threads,
+            n_gpu_layers=0,
+            verbose=settings.DEBUG,
+        )
+
+        self.model = model_file
+        self.dimension = settings.EMBEDDING_DIMENSION
+        self.layer_norm = layer_norm
+        self.native_dimension = self._llm.n_embd()
+        if self.native_dimension < self.dimension or (
+            self.native_dimension > self.dimension and not truncate
+        ):
+            raise ValueError(
+                f"{model_file} produces {self.native_dimension}-d vectors but "
+                f"EMBEDDING_DIMENSION={self.dimension}"
+            )
+
+    async def embed_text(self, text: str) -> List[float]:
+        return (await self.embed_batch([text]))[0]
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        safe_texts = [t if t.strip() else " " for t in texts]
+        return await asyncio.to_thread(self._embed, safe_texts)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            vectors = np.asarray(
+                self._llm.embed(texts, normalize=False, truncate=True),
+                dtype=np.float32,
+            )
+        if self.layer_norm and self.native_dimension > self.dimension:
+            mean = vectors.mean(axis=1, keepdims=True)
+            variance = vectors.var(axis=1, keepdims=True)
+            vectors = (vectors - mean) / np.sqrt(variance + LAYER_NORM_EPS)
+        vectors = vectors[:, : self.dimension]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).tolist()
+
+
+class TaskPrefixEmbedder(BaseEmbedder):
+    """
+    Prepends the task prefix a model was trained with (nomic-embed expects
+    "search_document: " on chunks and "search_query: " on queries). It wraps the
+    cache, so a text embedded as a query and as a document gets two entries.
+    """
+
+    def __init__(self, embedder: BaseEmbedder, prefix: str):
+        self.embedder = embedder
+        self.prefix = prefix
+        self.model = getattr(embedder, "model", type(embedder).__name__)
+        self.dimension = getattr(embedder, "dimension", settings.EMBEDDING_DIMENSION)
+
+    async def embed_text(self, text: str) -> List[float]:
+        return await self.embedder.embed_text(self.prefix + text)
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return await self.embedder.embed_batch([self.prefix + text for text in texts])
+
+
+def with_task_prefix(embedder: BaseEmbedder, prefix: str) -> BaseEmbedder:
+    return TaskPrefixEmbedder(embedder, prefix) if prefix else embedder
+
+
+@lru_cache(maxsize=1)
+def get_llamacpp_embedder() -> LlamaCppEmbedder:
+    """Cached so the model is only loaded once per process."""
+    return LlamaCppEmbedder(
+        settings.LOCAL_EMBEDDING_MODEL,
+        n_ctx=settings.LOCAL_EMBEDDING_N_CTX,
+        n_threads=settings.LOCAL_EMBEDDING_THREADS or os.cpu_count() or 1,
+        truncate=settings.LOCAL_EMBEDDING_MATRYOSHKA,
+        layer_norm=settings.LOCAL_EMBEDDING_LAYER_NORM,
+    )
@@ -0,0 +1,175 @@
+import asyncio
+import bisect
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.interfaces import BaseEmbedder
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100)
+
+# (text, caller's future, enqueue time)
+PendingCall = Tuple[str, asyncio.Future, float]
+
+
+class Histogram:
+    """Cumulative bucket counts, Prometheus style ("le" = less than or equal)."""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.total += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self.counts)
+            total = self.total
+        running, buckets = 0, {}
+        for bound, count in zip([*self.bounds, "+Inf"], counts):
+            running += count
+            buckets[str(bound)] = running
+        return {
+            "le": buckets,
+            "count": running,
+            "mean": round(total / running, 3) if running else None,
+        }
+
+
+class _Window:
+    def __init__(self):
+        self.calls: List[PendingCall] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatchingEmbedder(BaseEmbedder):
+    """
+    Coalesces concurrent query embeddings: the first call opens a window, which
+    is sent as one embed_batch after `max_wait_ms` or as soon as it holds
+    `max_items` texts, and every text's caller awaits its own future. Under load
+    one request carries many queries; a lone query pays at most `max_wait_ms`.
+    Small embed_batch calls (translated sub-queries) join the window too. If a
+    window's request fails, its texts are retried one by one, so a caller only
+    sees the error of its own text.
+
+    Windows are per event loop, so a caller on a loop of its own (LangChain's sync
+    bridge starts one) never waits on another loop's futures.
+    """
+
+    def __init__(self, embedder: BaseEmbedder, max_wait_ms: float, max_items: int):
+        self.embedder = embedder
+        self.max_wait = max_wait_ms / 1000
+        self.max_items = max_items
+        self.model = getattr(embedder, "model", type(embedder).__name__)
+        self.dimension = getattr(embedder, "dimension", settings.EMBEDDING_DIMENSION)
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.wait_ms = Histogram(WAIT_MS_BUCKETS)
+        self._windows: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._sending: set = set()  # keeps flush tasks referenced until done
+
+    async def embed_text(self, text: str) -> List[float]:
+        return await self._enqueue(text)
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) >= self.max_items:
+            return await self.embedder.embed_batch(texts)
+        return list(await asyncio.gather(*(self._enqueue(text) for text in texts)))
+
+    def _enqueue(self, text: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        window = self._windows.get(loop)
+        if window is None:
+            window = self._windows[loop] = _Window()
+
+        future = loop.create_future()
+        window.calls.append((text, future, time.perf_counter()))
+        if len(window.calls) >= self.max_items:
+            self._flush(loop)
+        elif window.timer is None:
+            window.timer = loop.call_later(self.max_wait, self._flush, loop)
+        return future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop):
+        window = self._windows.pop(loop, None)
+        if window is None:
+            return
+        if window.timer is not None:
+            window.timer.cancel()
+        task = loop.create_task(self._send(window.calls))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, calls: List[PendingCall]):
+        error: Optional[Exception] = None
+        try:
+            sent_at = time.perf_counter()
+            for _, _, queued_at in calls:
+                self.wait_ms.observe((sent_at - queued_at) * 1000)
+            # Popular questions arrive together: each distinct text is embedded once
+            texts = list(dict.fromkeys(text for text, _, _ in calls))
+            self.batch_sizes.observe(len(texts))
+
+            outcomes = await self._embed(texts)
+            for text, future, _ in calls:
+                if future.done():  # the caller may have been cancelled
+                    continue
+                outcome = outcomes[text]
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+        except Exception as e:
+            error = e  # goes to the callers, not to the event loop
+        finally:
+            # No caller may be left waiting, whatever cut the flush short
+            for _, future, _ in calls:
+                if future.done():
+                    continue
+                if error is None:  # the flush task was cancelled
+                    future.cancel()
+                else:
+                    future.set_exception(error)
+
+    async def _embed(self, texts: List[str]) -> Dict[str, Any]:
+        """Vector, or the exception it failed with, for each text."""
+        try:
+            vectors = await self.embedder.embed_batch(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"Got {len(vectors)} vectors for {len(texts)} texts")
+            return dict(zip(texts, vectors))
+        except Exception as e:
+            if len(texts) == 1:
+                return {texts[0]: e}
+            # One bad text must not fail the unrelated queries batched with it:
+            # each text is sent alone and its caller gets its own outcome
+            print(f"[MicroBatch] Batch of {len(texts)} failed ({e!r}), retrying")
+            singles = await asyncio.gather(*(self._embed([text]) for text in texts))
+            return {
+                text: outcome for single in singles for text, outcome in single.items()
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_wait_ms": self.max_wait * 1000,
+            "max_items": self.max_items,
+            "batch_size": self.batch_sizes.snapshot(),
+            "wait_ms": self.wait_ms.snapshot(),
+        }
+
+
+def with_micro_batching(embedder: BaseEmbedder) -> BaseEmbedder:
+    if settings.EMBEDDING_MICRO_BATCH_WAIT_MS <= 0:
+        return embedder
+    return MicroBatchingEmbedder(
+        embedder,
+        max_wait_ms=settings.EMBEDDING_MICRO_BATCH_WAIT_MS,
+        max_items=settings.EMBEDDING_MICRO_BATCH_MAX,
+    )
@@ -7,8 +7,11 @@ from app.core.interfaces import BaseEmbedder
 
 
 class OpenAIEmbedder(BaseEmbedder):
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    def __init__(self, max_retries: int = 2):
+        # The embedding scheduler retries itself: it passes 0 to see every 429
+        self.client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY, max_retries=max_retries
+        )
         self.model = settings.EMBEDDING_MODEL
         self.dimension = settings.EMBEDDING_DIMENSION
 
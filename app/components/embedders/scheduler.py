@@ -0,0 +1,254 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+import openai
+
+from app.components.embedders.batching import get_token_counter
+from app.core.config import settings
+from app.core.interfaces import BaseEmbedder
+
+T = TypeVar("T")
+
+# A request parked until a concurrency slot frees up, with the loop it waits on
+Waiter = Tuple[asyncio.AbstractEventLoop, asyncio.Future]
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units per minute, up to one minute's worth. Callers
+    reserve what they need up front and sleep off any debt, so waiters are served
+    in arrival order and a request larger than the bucket still goes through.
+
+    Uses a threading lock and plain sleeps: the semantic chunker embeds from its
+    own event loop, and it shares the quota with ingestion.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    async def acquire(self, amount: int):
+        if self.rate <= 0:  # unlimited
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class EmbeddingScheduler:
+    """
+    Process-wide gate for embedding requests. Every request takes one unit of the
+    requests-per-minute bucket and its tiktoken count from the tokens-per-minute
+    bucket, then waits for one of `limit` concurrency slots.
+
+    The limit follows AIMD: it grows by 1/limit per success (about +1 per round of
+    requests) up to `max_concurrency` and halves on a 429 or a timeout, at most
+    once per backoff window so one burst of failures counts as one event.
+    Transient failures (connection errors, 5xx) are retried too, but leave the
+    limit alone: they say nothing about the quota. Every retry waits a jittered
+    exponential backoff (or the server's Retry-After), up to `max_retries` times.
+
+    Requests without a slot wait in arrival order, each on a future of its own
+    event loop; a finishing request hands its slot to the first of them.
+    """
+
+    def __init__(
+        self,
+        rpm: int,
+        tpm: int,
+        max_concurrency: int,
+        timeout: float,
+        max_retries: int,
+    ):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: Deque[Waiter] = deque()
+        self._calm_until = 0.0
+        self.sent = 0
+        self.sent_tokens = 0
+        self.throttled = 0
+
+    @staticmethod
+    def count_tokens(texts: List[str]) -> int:
+        return sum(get_token_counter().count(texts))
+
+    async def run(self, tokens: int, call: Callable[[], Awaitable[T]]) -> T:
+        """Runs `call` (one provider request worth `tokens`) within the quota."""
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire(1)
+            await self.tokens.acquire(tokens)
+            await self._enter()
+            try:
+                result = await asyncio.wait_for(call(), self.timeout)
+            except Exception as e:
+                throttled = self._is_throttling(e)
+                retryable = throttled or self._is_transient(e)
+                if not retryable or attempt == self.max_retries:
+                    raise
+                delay = self._back_off(e, attempt, throttled)
+                print(
+                    f"[EmbedScheduler] {type(e).__name__}, retrying in {delay:.1f}s "
+                    f"(concurrency limit now {int(self.limit)})"
+                )
+            else:
+                with self._lock:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                    self.sent += 1
+                    self.sent_tokens += tokens
+                return result
+            finally:
+                self._leave()
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def _enter(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._in_flight < int(self.limit):
+                self._in_flight += 1
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    granted = False
+                else:  # the slot was reserved for us; _grant sees the cancel
+                    granted = future.done() and not future.cancelled()
+            if granted:
+                self._leave()
+            raise
+
+    def _leave(self):
+        """Frees a slot and hands free slots to the longest waiting requests."""
+        with self._lock:
+            self._in_flight -= 1
+            while self._waiters and self._in_flight < int(self.limit):
+                loop, future = self._waiters.popleft()
+                self._in_flight += 1
+                loop.call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future: asyncio.Future):
+        if future.done():  # cancelled before the slot reached it
+            self._leave()
+        else:
+            future.set_result(None)
+
+    @staticmethod
+    def _is_throttling(error: Exception) -> bool:
+        return (
+            isinstance(
+                error,
+                (openai.RateLimitError, openai.APITimeoutError, asyncio.TimeoutError),
+            )
+            or getattr(error, "status_code", None) == 429
+        )
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        # APITimeoutError subclasses APIConnectionError; it is handled as throttling
+        status = getattr(error, "status_code", None)
+        return isinstance(
+            error, (openai.APIConnectionError, openai.InternalServerError)
+        ) or (isinstance(status, int) and status >= 500)
+
+    def _back_off(self, error: Exception, attempt: int, throttled: bool) -> float:
+        response = getattr(error, "response", None)
+        retry_after = (
+            response.headers.get("retry-after") if response is not None else None
+        )
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = min(60.0, 2**attempt) * random.uniform(0.5, 1.5)
+
+        if not throttled:
+            return delay
+        now = time.monotonic()
+        with self._lock:
+            self.throttled += 1
+            if now >= self._calm_until:
+                self.limit = max(1.0, self.limit / 2)
+                self._calm_until = now + delay
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": int(self.limit),
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+            "requests": self.sent,
+            "tokens": self.sent_tokens,
+            "throttled": self.throttled,
+        }
+
+
+class ScheduledEmbedder(BaseEmbedder):
+    """Sends every provider call of `embedder` through the shared scheduler."""
+
+    def __init__(self, embedder: BaseEmbedder, scheduler: EmbeddingScheduler):
+        self.embedder = embedder
+        self.scheduler = scheduler
+        self.model = getattr(embedder, "model", type(embedder).__name__)
+        self.dimension = getattr(embedder, "dimension", settings.EMBEDDING_DIMENSION)
+
+    async def embed_text(self, text: str) -> List[float]:
+        return await self.scheduler.run(
+            self.scheduler.count_tokens([text]), lambda: self.embedder.embed_text(text)
+        )
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return await self.scheduler.run(
+            self.scheduler.count_tokens(texts),
+            lambda: self.embedder.embed_batch(texts),
+        )
+
+
+# One scheduler (one quota) per process, shared by ingestion, chunking and queries
+_scheduler: Optional[EmbeddingScheduler] = None
+
+
+def get_embedding_scheduler() -> EmbeddingScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = EmbeddingScheduler(
+            rpm=settings.EMBEDDING_RPM,
+            tpm=settings.EMBEDDING_TPM,
+            max_concurrency=settings.EMBEDDING_CONCURRENCY,
+            timeout=settings.EMBEDDING_REQUEST_TIMEOUT,
+            max_retries=settings.EMBEDDING_MAX_RETRIES,
+        )
+        print(
+            f"[EmbedScheduler] {settings.EMBEDDING_RPM} RPM / "
+            f"{settings.EMBEDDING_TPM} TPM, up to "
+            f"{settings.EMBEDDING_CONCURRENCY} requests in flight"
+        )
+    return _scheduler
+
+
+def with_embedding_scheduler(embedder: BaseEmbedder) -> BaseEmbedder:
+    return ScheduledEmbedder(embedder, get_embedding_scheduler())
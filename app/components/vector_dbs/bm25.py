@@ -0,0 +1,337 @@
+import asyncio
+import hashlib
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pinecone import SparseValues
+
+from app.core.config import settings
+from app.core.sqlite import open_sqlite
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Identifiers survive as one token ("sku-4411-b", "12.3", "1983(c)" -> "1983"),
+# and are also split into their parts so a query for "4411" still matches
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._/\-][a-z0-9]+)*")
+PART_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    {
+        "a",
+        "an",
+        "and",
+        "are",
+        "as",
+        "at",
+        "be",
+        "but",
+        "by",
+        "for",
+        "from",
+        "has",
+        "have",
+        "if",
+        "in",
+        "into",
+        "is",
+        "it",
+        "its",
+        "of",
+        "on",
+        "or",
+        "that",
+        "the",
+        "their",
+        "then",
+        "there",
+        "these",
+        "this",
+        "to",
+        "was",
+        "were",
+        "will",
+        "with",
+    }
+)
+
+# Stay under SQLite's bound-parameter limit
+SQL_BATCH = 500
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for match in TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        parts = PART_RE.findall(token)
+        if len(parts) > 1:
+            tokens.append(token)
+        tokens.extend(part for part in parts if part not in STOPWORDS)
+    return tokens
+
+
+def term_id(token: str) -> int:
+    """Stable 32-bit sparse index (Pinecone indices are uint32)."""
+    return int.from_bytes(
+        hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "big"
+    )
+
+
+def _sparse(weights: Dict[int, float]) -> Optional[SparseValues]:
+    if not weights:
+        return None
+    indices = sorted(weights)
+    return SparseValues(indices=indices, values=[weights[i] for i in indices])
+
+
+class BM25Encoder:
+    """
+    BM25 split across the two sides of a dot product, so Pinecone can score it:
+    documents carry the saturated, length-normalised term frequency and queries
+    carry the (sum-normalised) IDF. Collection statistics — document count, total
+    length and per-term document frequency — live in a local SQLite file and are
+    updated as sources are ingested or deleted. Each chunk's own contribution is
+    kept too, so upserting a chunk id again replaces it instead of counting twice.
+
+    IDF is applied at query time, so it always reflects the current corpus; the
+    average document length is frozen into each document when it is encoded.
+    """
+
+    def __init__(self, path: str):
+        self._lock, self._conn = open_sqlite(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS bm25_sources (source TEXT PRIMARY KEY, "
+                "docs INTEGER NOT NULL, tokens INTEGER NOT NULL)"
+            )
+            # Per-source document frequencies, so deleting a source can undo them
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS bm25_source_terms "
+                "(source TEXT NOT NULL, term INTEGER NOT NULL, df INTEGER NOT NULL, "
+                "PRIMARY KEY (source, term))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS bm25_terms "
+                "(term INTEGER PRIMARY KEY, df INTEGER NOT NULL)"
+            )
+            # Per-chunk contributions: length and distinct terms (packed uint32s)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS bm25_docs (id TEXT PRIMARY KEY, "
+                "source TEXT NOT NULL, tokens INTEGER NOT NULL, terms BLOB NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS bm25_docs_source ON bm25_docs (source)"
+            )
+
+    @staticmethod
+    def count_terms(texts: List[str]) -> List[Counter]:
+        """Term frequencies per text, keyed by sparse index."""
+        return [Counter(term_id(token) for token in tokenize(text)) for text in texts]
+
+    async def encode_documents(
+        self, counts: List[Counter]
+    ) -> List[Optional[SparseValues]]:
+        """
+        Sparse vectors for documents about to be upserted. The average length
+        includes them, as it will once add_documents has recorded them.
+        """
+
+        def corpus() -> Tuple[int, float]:
+            with self._lock:
+                return self._corpus()
+
+        docs, avgdl = await asyncio.to_thread(corpus)
+        total = docs + len(counts)
+        if total:
+            avgdl = (avgdl * docs + sum(sum(tf.values()) for tf in counts)) / total
+        return [self._encode_document(tf, avgdl or 1.0) for tf in counts]
+
+    async def add_documents(self, documents: List[Tuple[str, str, Counter]]):
+        """
+        Records (chunk id, source, term counts) into the statistics, once the
+        vectors are safely upserted. A chunk id seen before has its previous
+        contribution taken out first, so re-ingesting or importing is idempotent.
+        """
+        documents = list({doc[0]: doc for doc in documents}.values())  # last wins
+
+        def save():
+            with self._lock, self._conn:
+                # source -> [doc delta, token delta, term df deltas]
+                deltas: Dict[str, Tuple[int, int, Counter]] = {}
+
+                def account(source: str, sign: int, tokens: int, terms: Iterable[int]):
+                    docs, total, df = deltas.get(source, (0, 0, Counter()))
+                    for term in terms:
+                        df[term] += sign
+                    deltas[source] = (docs + sign, total + sign * tokens, df)
+
+                ids = [chunk_id for chunk_id, _, _ in documents]
+                for i in range(0, len(ids), SQL_BATCH):
+                    batch = ids[i : i + SQL_BATCH]
+                    for source, tokens, terms in self._conn.execute(
+                        f"SELECT source, tokens, terms FROM bm25_docs "
+                        f"WHERE id IN ({', '.join('?' * len(batch))})",
+                        batch,
+                    ):
+                        account(source, -1, tokens, array("I", terms))
+
+                rows = []
+                for chunk_id, source, tf in documents:
+                    tokens = sum(tf.values())
+                    account(source, 1, tokens, tf.keys())
+                    rows.append(
+                        (chunk_id, source, tokens, array("I", sorted(tf)).tobytes())
+                    )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO bm25_docs (id, source, tokens, terms) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                for source, (docs, tokens, df) in deltas.items():
+                    self._apply(source, docs, tokens, df)
+
+        await asyncio.to_thread(save)
+
+    def _apply(self, source: str, docs: int, tokens: int, df: Counter):
+        """Adds one source's deltas to the statistics. Caller holds the lock."""
+        changed = [(source, term, n) for term, n in df.items() if n]
+        self._conn.execute(
+            "INSERT INTO bm25_sources (source, docs, tokens) "
+            "VALUES (?, ?, ?) ON CONFLICT (source) DO UPDATE "
+            "SET docs = docs + excluded.docs, "
+            "tokens = tokens + excluded.tokens",
+            [source, docs, tokens],
+        )
+        self._conn.executemany(
+            "INSERT INTO bm25_source_terms (source, term, df) "
+            "VALUES (?, ?, ?) ON CONFLICT (source, term) DO UPDATE "
+            "SET df = df + excluded.df",
+            changed,
+        )
+        self._conn.executemany(
+            "INSERT INTO bm25_terms (term, df) VALUES (?, ?) "
+            "ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+            [(term, n) for _, term, n in changed],
+        )
+
+        # Drop what a replacement emptied
+        removed = [(source, term) for _, term, n in changed if n < 0]
+        self._conn.executemany(
+            "DELETE FROM bm25_source_terms WHERE source = ? AND term = ? AND df <= 0",
+            removed,
+        )
+        self._conn.executemany(
+            "DELETE FROM bm25_terms WHERE term = ? AND df <= 0",
+            [(term,) for _, term in removed],
+        )
+        self._conn.execute(
+            "DELETE FROM bm25_sources WHERE source = ? AND docs <= 0", [source]
+        )
+
+    async def delete_source(self, source: str):
+        def delete():
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE bm25_terms SET df = df - ("
+                    "  SELECT s.df FROM bm25_source_terms s"
+                    "  WHERE s.source = ? AND s.term = bm25_terms.term"
+                    ") WHERE term IN ("
+                    "  SELECT term FROM bm25_source_terms WHERE source = ?"
+                    ")",
+                    [source, source],
+                )
+                self._conn.execute("DELETE FROM bm25_terms WHERE df <= 0")
+                self._conn.execute(
+                    "DELETE FROM bm25_source_terms WHERE source = ?", [source]
+                )
+                self._conn.execute(
+                    "DELETE FROM bm25_sources WHERE source = ?", [source]
+                )
+                self._conn.execute("DELETE FROM bm25_docs WHERE source = ?", [source])
+
+        await asyncio.to_thread(delete)
+
+    async def encode_queries(
+        self, texts: Iterable[str]
+    ) -> List[Optional[SparseValues]]:
+        """IDF-weighted query vectors; terms the corpus has never seen are dropped."""
+        terms = [{term_id(token) for token in tokenize(text)} for text in texts]
+        vocabulary = sorted(set().union(*terms))
+
+        def load() -> Tuple[int, Dict[int, int]]:
+            df: Dict[int, int] = {}
+            with self._lock:
+                docs = self._corpus()[0]
+                for i in range(0, len(vocabulary), SQL_BATCH):
+                    batch = vocabulary[i : i + SQL_BATCH]
+                    cur = self._conn.execute(
+                        f"SELECT term, df FROM bm25_terms "
+                        f"WHERE term IN ({', '.join('?' * len(batch))})",
+                        batch,
+                    )
+                    df.update(cur.fetchall())
+            return docs, df
+
+        docs, df = await asyncio.to_thread(load)
+        vectors = []
+        for query_terms in terms:
+            weights = {
+                term: math.log(1 + (docs - df[term] + 0.5) / (df[term] + 0.5))
+                for term in query_terms
+                if term in df
+            }
+            total = sum(weights.values())
+            vectors.append(
+                _sparse({term: w / total for term, w in weights.items()})
+                if total
+                else None
+            )
+        return vectors
+
+    def _corpus(self) -> Tuple[int, float]:
+        """(document count, average document length). Caller holds the lock."""
+        docs, tokens = self._conn.execute(
+            "SELECT coalesce(sum(docs), 0), coalesce(sum(tokens), 0) FROM bm25_sources"
+        ).fetchone()
+        return docs, (tokens / docs if docs else 1.0)
+
+    @staticmethod
+    def _encode_document(tf: Counter, avgdl: float) -> Optional[SparseValues]:
+        length_norm = 1 - BM25_B + BM25_B * sum(tf.values()) / avgdl
+        return _sparse(
+            {
+                term: n * (BM25_K1 + 1) / (n + BM25_K1 * length_norm)
+                for term, n in tf.items()
+            }
+        )
+
+
+def weight_hybrid(
+    dense: List[float], sparse: Optional[SparseValues], alpha: float
+) -> Tuple[List[float], Optional[SparseValues]]:
+    """Convex dense/sparse weighting: alpha=1 is dense only, 0 is sparse only."""
+    if not 0 <= alpha <= 1:
+        raise ValueError(f"alpha must be between 0 and 1, got {alpha}")
+    if sparse is None:
+        return dense, None
+    return (
+        [v * alpha for v in dense],
+        SparseValues(
+            indices=sparse.indices, values=[v * (1 - alpha) for v in sparse.values]
+        ),
+    )
+
+
+# One encoder (one SQLite connection) per process, shared by every PineconeDB instance
+_encoder: Optional[BM25Encoder] = None
+
+
+def get_bm25_encoder() -> BM25Encoder:
+    global _encoder
+    if _encoder is None:
+        _encoder = BM25Encoder(settings.PINECONE_SPARSE_PATH)
+        print(f"[BM25] Sparse statistics in {settings.PINECONE_SPARSE_PATH}")
+    return _encoder
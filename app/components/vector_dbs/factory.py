@@ -0,0 +1,38 @@
+from app.core.config import settings
+from app.core.interfaces import BaseVectorDB
+
+
+def create_vector_db(provider: str) -> BaseVectorDB:
+    """
+    The vector store for `provider` ("numpy", "pgvector" or "pinecone"). Imports
+    are local so scripts only load the client library of the backend they use.
+    """
+    match provider:
+        case "numpy":
+            from app.components.vector_dbs.numpy_db import NumpyVectorDB
+
+            print("Using embedded NumPy store")
+            return NumpyVectorDB()
+
+        case "pgvector" if settings.PGVECTOR_SHARDS:
+            from app.components.vector_dbs.pgvector_sharded import ShardedPGVectorDB
+
+            print(
+                f"Using PGVector sharded over {len(settings.PGVECTOR_SHARDS)} instances"
+            )
+            return ShardedPGVectorDB()
+
+        case "pgvector":
+            from app.components.vector_dbs.pgvector_db import PGVectorDB
+
+            print("Using Local PGVector")
+            return PGVectorDB()
+
+        case "pinecone":
+            from app.components.vector_dbs.pinecone_db import PineconeDB
+
+            print("Using Pinecone")
+            return PineconeDB()
+
+        case _:
+            raise ValueError(f"Unknown vector DB provider: '{provider}'")
@@ -0,0 +1,140 @@
+from typing import Tuple
+
+import numpy as np
+
+PQ_CENTROIDS = 256  # 8-bit codes
+PQ_TRAIN_ROWS = 64 * PQ_CENTROIDS  # residuals per sub-quantizer; more adds little
+COARSE_ITERATIONS = 10
+PQ_ITERATIONS = 25
+
+
+def nearest(x: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    """Index of the closest (L2) centroid per row, in chunks to bound memory."""
+    centroid_norms = (centroids**2).sum(axis=1)
+    out = np.empty(x.shape[0], dtype=np.int32)
+    for start in range(0, x.shape[0], chunk):
+        block = np.asarray(x[start : start + chunk], dtype=np.float32)
+        # argmin ||x - c||^2 == argmin ||c||^2 - 2 x.c
+        distances = block @ centroids.T
+        distances *= -2.0
+        distances += centroid_norms
+        out[start : start + chunk] = np.argmin(distances, axis=1)
+    return out
+
+
+def kmeans(x: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means; empty clusters are re-seeded from random points."""
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    centroids = x[rng.choice(x.shape[0], size=k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = nearest(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        sums = np.add.reduceat(x[order], starts, axis=0)
+        centroids[filled] = sums / counts[filled, None]
+
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = x[rng.choice(x.shape[0], size=len(empty), replace=False)]
+    return centroids
+
+
+class IVFPQQuantizer:
+    """
+    Coarse k-means quantizer (nlist centroids) plus a product quantizer over the
+    residuals: m sub-spaces of dimension / m dims, 256 centroids each, so every
+    vector is stored as one list id and m bytes.
+
+    Scores are inner products (vectors are L2-normalised, so that is cosine):
+    q.x ~= q.c[list] + sum_j q_j . codebook[j][code_j], where the second term is a
+    per-query (m x 256) lookup table shared by every list.
+    """
+
+    def __init__(self, centroids: np.ndarray, codebooks: np.ndarray):
+        self.centroids = centroids.astype(np.float32)  # (nlist, dim)
+        self.codebooks = codebooks.astype(np.float32)  # (m, 256, dim / m)
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def m(self) -> int:
+        return self.codebooks.shape[0]
+
+    @classmethod
+    def train(
+        cls, sample: np.ndarray, nlist: int, m: int, seed: int = 0
+    ) -> "IVFPQQuantizer":
+        dimension = sample.shape[1]
+        if dimension % m:
+            raise ValueError(
+                f"PQ sub-quantizers ({m}) must divide dimension {dimension}"
+            )
+        if sample.shape[0] < max(nlist, PQ_CENTROIDS):
+            raise ValueError(
+                f"Need at least {max(nlist, PQ_CENTROIDS)} vectors to train "
+                f"(nlist={nlist}, 256 PQ centroids); got {sample.shape[0]}"
+            )
+
+        sample = np.asarray(sample, dtype=np.float32)
+        centroids = kmeans(sample, nlist, iterations=COARSE_ITERATIONS, seed=seed)
+        residuals = sample - centroids[nearest(sample, centroids)]
+        if len(residuals) > PQ_TRAIN_ROWS:
+            rng = np.random.default_rng(seed)
+            residuals = residuals[
+                rng.choice(len(residuals), PQ_TRAIN_ROWS, replace=False)
+            ]
+
+        sub = dimension // m
+        codebooks = np.stack(
+            [
+                kmeans(
+                    np.ascontiguousarray(residuals[:, j * sub : (j + 1) * sub]),
+                    PQ_CENTROIDS,
+                    iterations=PQ_ITERATIONS,
+                    seed=seed + j,
+                )
+                for j in range(m)
+            ]
+        )
+        return cls(centroids, codebooks)
+
+    def encode(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(list id per row, (rows, m) uint8 PQ codes of the residuals)."""
+        x = np.asarray(x, dtype=np.float32)
+        assign = nearest(x, self.centroids)
+        residuals = x - self.centroids[assign]
+
+        sub = x.shape[1] // self.m
+        codes = np.empty((x.shape[0], self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = nearest(
+                residuals[:, j * sub : (j + 1) * sub], self.codebooks[j]
+            )
+        return assign, codes
+
+    def probe(self, query: np.ndarray, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The nprobe closest lists and q.c for every list."""
+        coarse = self.centroids @ query
+        distances = (self.centroids**2).sum(axis=1) - 2.0 * coarse
+        nprobe = min(nprobe, self.nlist)
+        return np.argpartition(distances, nprobe - 1)[:nprobe], coarse
+
+    def lookup_table(self, query: np.ndarray) -> np.ndarray:
+        """(m, 256) inner products of each query sub-vector with its codebook."""
+        sub = query.reshape(self.m, -1)
+        return np.einsum("jd,jkd->jk", sub, self.codebooks)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(f, centroids=self.centroids, codebooks=self.codebooks)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQQuantizer":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["codebooks"])
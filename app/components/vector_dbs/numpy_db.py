@@ -0,0 +1,728 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.components.vector_dbs.ivfpq import IVFPQQuantizer
+from app.components.vector_dbs.rerank import normalize_rows
+from app.core.config import settings
+from app.core.interfaces import BaseVectorDB
+from app.models.domain import DocumentChunk, SearchOptions
+
+MANIFEST = "manifest.json"
+
+# Retrieval profile -> multiplier of NUMPY_IVF_NPROBE
+IVF_PROFILE_SCALE: Dict[str, float] = {"fast": 0.5, "balanced": 1.0, "exhaustive": 4.0}
+
+# Encoding batch, so training a large store never holds it all as float32
+ENCODE_BATCH = 65536
+
+# Segment files are immutable (a new generation is written on every upsert) and
+# generation numbers are never reused, not even after a delete, so their memory
+# maps can be shared by every instance in the process.
+_segments: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+# "{segment}-{gen}.q{version}" -> (codes, row order, list offsets), in list order
+_codes: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+# quantizer file -> loaded quantizer (files are never rewritten, only replaced)
+_quantizers: Dict[str, IVFPQQuantizer] = {}
+
+# store dir -> (manifest mtime, parsed manifest)
+_manifests: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+# store dir -> writer lock for this process (files are locked across processes)
+_write_locks: Dict[str, asyncio.Lock] = {}
+
+
+class NumpyVectorDB(BaseVectorDB):
+    """
+    Embedded, file-backed store for single-node deployments and CI.
+
+    Layout under NUMPY_STORE_DIR/rag_vectors_{dim}/:
+      manifest.json            source -> {segment, generation, sidecar, rows}, plus
+                               the last generation used by each segment
+      {segment}-{gen}.jsonl    append-only sidecar: one {id, text, metadata} line per
+                               row, named after the generation that created it
+      {segment}-{gen}.npy      L2-normalised vectors of the source (float32/float16)
+      {segment}-{gen}.off.npy  byte offset of each row's sidecar line
+      {segment}-{gen}.ids.json row ids, read only by writers to replace re-upserted ids
+      ivf-{version}.npz        IVF-PQ quantizer (coarse centroids + PQ codebooks)
+      {segment}-{gen}.q{version}.{codes,order,lists}.npy
+                               the segment's PQ codes grouped by inverted list
+
+    Startup only reads the manifest; segments are memory-mapped on first search,
+    so the OS pages vectors in on demand and shares them between workers.
+    Searches are exact (one matrix-vector product per segment plus argpartition)
+    unless NUMPY_INDEX="ivfpq" and train_index() has run: then only the nprobe
+    closest lists are scored from the PQ codes and the best candidates are
+    re-scored exactly. Once trained, every upsert encodes its new rows, so the
+    index follows the data without retraining.
+    """
+
+    def __init__(self):
+        self.dimension = settings.EMBEDDING_DIMENSION
+        self.dtype = np.dtype(settings.NUMPY_STORE_DTYPE)
+        self.root = os.path.join(
+            settings.NUMPY_STORE_DIR, f"rag_vectors_{self.dimension}"
+        )
+        os.makedirs(self.root, exist_ok=True)
+        self._write_lock = _write_locks.setdefault(self.root, asyncio.Lock())
+
+    # ------------------------------------------------------------------ files
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    @staticmethod
+    def _segment_name(source: str) -> str:
+        return hashlib.md5(source.encode("utf-8")).hexdigest()[:16]
+
+    def _manifest(self) -> Dict[str, Any]:
+        """The current manifest, re-read only when another writer replaced it."""
+        path = self._path(MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return {"dtype": self.dtype.name, "sources": {}}
+
+        cached = _manifests.get(self.root)
+        if cached is None or cached[0] != mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("dtype", self.dtype.name) != self.dtype.name:
+                raise RuntimeError(
+                    f"Store {self.root} holds {manifest['dtype']} vectors but "
+                    f"NUMPY_STORE_DTYPE={self.dtype.name}. Use a fresh NUMPY_STORE_DIR."
+                )
+            cached = (mtime, manifest)
+            _manifests[self.root] = cached
+        return cached[1]
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        tmp = self._path(MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._path(MANIFEST))  # readers see the old or the new one
+
+    def _sidecar(self, entry: Dict[str, Any]) -> str:
+        # Entries written before sidecars were named per incarnation lack the key
+        return self._path(entry.get("sidecar", f"{entry['segment']}.jsonl"))
+
+    def _open_segment(self, entry: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        base = self._path(f"{entry['segment']}-{entry['generation']}")
+        if base not in _segments:
+            _segments[base] = (
+                np.load(base + ".npy", mmap_mode="r"),
+                np.load(base + ".off.npy", mmap_mode="r"),
+            )
+        return _segments[base]
+
+    def _codes_base(self, entry: Dict[str, Any], version: int) -> str:
+        return self._path(f"{entry['segment']}-{entry['generation']}.q{version}")
+
+    def _open_codes(
+        self, entry: Dict[str, Any]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        base = self._codes_base(entry, entry["codes"])
+        if base not in _codes:
+            _codes[base] = (
+                np.load(base + ".codes.npy", mmap_mode="r"),
+                np.load(base + ".order.npy", mmap_mode="r"),
+                np.load(base + ".lists.npy"),
+            )
+        return _codes[base]
+
+    def _quantizer(
+        self, manifest: Dict[str, Any]
+    ) -> Optional[Tuple[int, IVFPQQuantizer]]:
+        """(version, quantizer) once train_index() has run on this store."""
+        ivf = manifest.get("ivf")
+        if ivf is None:
+            return None
+        path = self._path(f"ivf-{ivf['version']}.npz")
+        if path not in _quantizers:
+            _quantizers[path] = IVFPQQuantizer.load(path)
+        return ivf["version"], _quantizers[path]
+
+    def _write_codes(
+        self,
+        entry: Dict[str, Any],
+        version: int,
+        assign: np.ndarray,
+        codes: np.ndarray,
+        nlist: int,
+    ):
+        """Groups a segment's rows by inverted list, so a probe is one slice."""
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        lists = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=lists[1:])
+
+        base = self._codes_base(entry, version)
+        np.save(base + ".codes.npy", codes[order])
+        np.save(base + ".order.npy", order)
+        np.save(base + ".lists.npy", lists)
+
+    def _read_codes(self, entry: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """(list id, PQ code) per row, back in row order."""
+        codes, order, lists = self._open_codes(entry)
+        assign = np.empty(len(order), dtype=np.int32)
+        assign[order] = np.repeat(
+            np.arange(len(lists) - 1, dtype=np.int32), np.diff(lists)
+        )
+        row_codes = np.empty_like(codes)
+        row_codes[order] = codes
+        return assign, row_codes
+
+    def _remove_codes(self, entry: Dict[str, Any], version: int):
+        base = self._codes_base(entry, version)
+        _codes.pop(base, None)
+        for suffix in (".codes.npy", ".order.npy", ".lists.npy"):
+            try:
+                os.remove(base + suffix)
+            except FileNotFoundError:
+                pass
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Serialises writers across processes; readers never take it."""
+        with open(self._path(".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ----------------------------------------------------------------- writes
+
+    async def upsert(self, chunks: List[DocumentChunk], embeddings: List[List[float]]):
+        if len(chunks) != len(embeddings):
+            raise ValueError("Number of chunks and embeddings must match!")
+        await self._upsert_array(chunks, np.asarray(embeddings, dtype=np.float32))
+
+    async def import_rows(
+        self, chunks: List[DocumentChunk], vectors: np.ndarray, batch_rows: int
+    ):
+        # Every upsert rewrites the segments it touches: one write per part keeps
+        # a large source from being copied again for each batch of it
+        await self._upsert_array(chunks, np.asarray(vectors, dtype=np.float32))
+
+    async def _upsert_array(self, chunks: List[DocumentChunk], vectors: np.ndarray):
+        start_time = time.perf_counter()
+        # A segment must not hold an id twice — last write wins, as in pgvector
+        last = {chunk.id: i for i, chunk in enumerate(chunks)}
+        by_source: Dict[str, List[int]] = {}
+        for i in sorted(last.values()):
+            source = str(chunks[i].metadata.get("source", ""))
+            by_source.setdefault(source, []).append(i)
+
+        vectors = normalize_rows(vectors)
+        async with self._write_lock:
+            await asyncio.to_thread(self._write_sources, chunks, vectors, by_source)
+
+        duration = time.perf_counter() - start_time
+        print(
+            f"[NumpyDB] Upserted {len(last)} rows into {len(by_source)} segment(s) "
+            f"in {duration:.2f}s ({len(last) / max(duration, 1e-9):.0f} rows/s)"
+        )
+
+    def _write_sources(
+        self,
+        chunks: List[DocumentChunk],
+        vectors: np.ndarray,
+        by_source: Dict[str, List[int]],
+    ):
+        with self._file_lock():
+            _manifests.pop(self.root, None)  # always merge into the latest manifest
+            manifest = self._manifest()
+            ivf = self._quantizer(manifest)
+            # Kept across deletes: a re-created source must not reuse the paths
+            # (and so the cached maps) of its previous incarnation
+            generations = manifest.setdefault("generations", {})
+            for source, rows in by_source.items():
+                entry = manifest["sources"].get(source)
+                segment = self._segment_name(source)
+                generation = 1 + max(
+                    generations.get(segment, -1), entry["generation"] if entry else -1
+                )
+                generations[segment] = generation
+                manifest["sources"][source] = self._write_segment(
+                    entry,
+                    segment,
+                    generation,
+                    [chunks[i] for i in rows],
+                    vectors[rows],
+                    ivf,
+                )
+            manifest["dtype"] = self.dtype.name
+            self._write_manifest(manifest)
+
+    def _write_segment(
+        self,
+        entry: Optional[Dict[str, Any]],
+        segment: str,
+        generation: int,
+        chunks: List[DocumentChunk],
+        vectors: np.ndarray,
+        ivf: Optional[Tuple[int, IVFPQQuantizer]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Appends the chunks to the source's sidecar and writes the next generation
+        of its vector and offset arrays: surviving old rows + new rows. Re-upserted
+        ids replace their old row; the old sidecar line simply becomes garbage.
+        With a trained index, surviving rows keep their PQ codes and only the new
+        rows are encoded.
+        """
+        new_ids = [chunk.id for chunk in chunks]
+
+        old_vectors = np.empty((0, self.dimension), dtype=self.dtype)
+        old_offsets = np.empty(0, dtype=np.int64)
+        old_ids: List[str] = []
+        sidecar_path = self._path(f"{segment}-{generation}.jsonl")
+        if entry is not None:
+            sidecar_path = self._sidecar(entry)
+            old_vectors, old_offsets = self._open_segment(entry)
+            base = self._path(f"{segment}-{entry['generation']}")
+            with open(base + ".ids.json", "r", encoding="utf-8") as f:
+                old_ids = json.load(f)
+
+        replaced = set(new_ids)
+        keep = [i for i, chunk_id in enumerate(old_ids) if chunk_id not in replaced]
+
+        new_offsets = np.empty(len(chunks), dtype=np.int64)
+        with open(sidecar_path, "ab") as sidecar:
+            sidecar.seek(0, os.SEEK_END)
+            for i, chunk in enumerate(chunks):
+                new_offsets[i] = sidecar.tell()
+                record = {
+                    "id": chunk.id,
+                    "text": chunk.text,
+                    "metadata": chunk.metadata,
+                }
+                sidecar.write(json.dumps(record).encode("utf-8") + b"\n")
+            sidecar.flush()
+            os.fsync(sidecar.fileno())
+
+        base = self._path(f"{segment}-{generation}")
+        np.save(
+            base + ".npy",
+            np.concatenate([old_vectors[keep], vectors.astype(self.dtype)]),
+        )
+        np.save(base + ".off.npy", np.concatenate([old_offsets[keep], new_offsets]))
+        with open(base + ".ids.json", "w", encoding="utf-8") as f:
+            json.dump([old_ids[i] for i in keep] + new_ids, f)
+
+        written = {
+            "segment": segment,
+            "generation": generation,
+            "sidecar": os.path.basename(sidecar_path),
+            "rows": len(keep) + len(new_ids),
+        }
+        if ivf is not None:
+            version, quantizer = ivf
+            assign, codes = quantizer.encode(vectors)
+            if entry is not None and entry.get("codes") == version:
+                old_assign, old_codes = self._read_codes(entry)
+                assign = np.concatenate([old_assign[keep], assign])
+                codes = np.concatenate([old_codes[keep], codes])
+            elif keep:
+                old_assign, old_codes = quantizer.encode(old_vectors[keep])
+                assign = np.concatenate([old_assign, assign])
+                codes = np.concatenate([old_codes, codes])
+            self._write_codes(written, version, assign, codes, quantizer.nlist)
+            written["codes"] = version
+
+        if entry is not None:
+            # Mapped files stay readable for searches still holding them (POSIX)
+            self._remove_generation(entry)
+
+        return written
+
+    def _remove_generation(self, entry: Dict[str, Any]):
+        base = self._path(f"{entry['segment']}-{entry['generation']}")
+        _segments.pop(base, None)
+        for suffix in (".npy", ".off.npy", ".ids.json"):
+            try:
+                os.remove(base + suffix)
+            except FileNotFoundError:
+                pass
+        if "codes" in entry:
+            self._remove_codes(entry, entry["codes"])
+
+    async def delete_source(self, source: str):
+        def delete():
+            with self._file_lock():
+                _manifests.pop(self.root, None)
+                manifest = self._manifest()
+                entry = manifest["sources"].pop(source, None)
+                if entry is None:
+                    return
+                self._write_manifest(manifest)
+                self._remove_generation(entry)
+                os.remove(self._sidecar(entry))
+
+        async with self._write_lock:
+            await asyncio.to_thread(delete)
+        print(f"[NumpyDB] Deleted source '{source}'")
+
+    async def export_page(
+        self, cursor: Optional[str], limit: int
+    ) -> Tuple[List[DocumentChunk], np.ndarray, Optional[str]]:
+        """Walks the segments in source order; the cursor is [source, next row]."""
+
+        def read() -> Tuple[List[DocumentChunk], np.ndarray, Optional[str]]:
+            sources = self._manifest()["sources"]
+            source, row = json.loads(cursor) if cursor else (None, 0)
+            pending = sorted(s for s in sources if source is None or s >= source)
+
+            chunks: List[DocumentChunk] = []
+            parts: List[np.ndarray] = []
+            for name in pending:
+                start = row if name == source else 0
+                entry = sources[name]
+                vectors, offsets = self._open_segment(entry)
+                stop = min(len(vectors), start + limit - len(chunks))
+                with open(self._sidecar(entry), "rb") as sidecar:
+                    for offset in offsets[start:stop]:
+                        sidecar.seek(int(offset))
+                        record = json.loads(sidecar.readline())
+                        chunks.append(
+                            DocumentChunk(
+                                id=record["id"],
+                                text=record["text"],
+                                metadata=record["metadata"],
+                            )
+                        )
+                parts.append(np.asarray(vectors[start:stop], dtype=np.float32))
+                if len(chunks) == limit:
+                    more = stop < len(vectors) or name != pending[-1]
+                    next_cursor = json.dumps([name, stop]) if more else None
+                    return chunks, np.concatenate(parts), next_cursor
+
+            if not parts:
+                return chunks, np.empty((0, self.dimension), dtype=np.float32), None
+            return chunks, np.concatenate(parts), None
+
+        return await asyncio.to_thread(read)
+
+    # ------------------------------------------------------------------ index
+
+    async def train_index(
+        self,
+        nlist: Optional[int] = None,
+        m: Optional[int] = None,
+        sample_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Trains the IVF-PQ quantizer on a uniform sample of the stored vectors and
+        encodes every segment with it. Writers wait while this runs; searches keep
+        using the previous index (or exact scans) until the new manifest lands.
+        Retraining is only worth it when the data distribution has drifted.
+        """
+        async with self._write_lock:
+            return await asyncio.to_thread(
+                self._train,
+                nlist or settings.NUMPY_IVF_NLIST,
+                m or settings.NUMPY_IVF_PQ_M,
+                sample_size or settings.NUMPY_IVF_TRAIN_SAMPLE,
+            )
+
+    def _train(self, nlist: int, m: int, sample_size: int) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        with self._file_lock():
+            _manifests.pop(self.root, None)
+            manifest = self._manifest()
+            entries = [e for e in manifest["sources"].values() if e["rows"]]
+            total = sum(e["rows"] for e in entries)
+
+            # Uniform sample across segments, read row-sorted from each map
+            rng = np.random.default_rng(0)
+            picked = np.sort(
+                rng.choice(total, size=min(sample_size, total), replace=False)
+            )
+            bounds = np.cumsum([0] + [e["rows"] for e in entries])
+            sample = []
+            for entry, lo, hi in zip(entries, bounds[:-1], bounds[1:]):
+                rows = picked[(picked >= lo) & (picked < hi)] - lo
+                if len(rows):
+                    vectors, _ = self._open_segment(entry)
+                    sample.append(np.asarray(vectors[rows], dtype=np.float32))
+            if not sample:
+                raise ValueError(f"Store {self.root} is empty; nothing to train on")
+
+            quantizer = IVFPQQuantizer.train(np.concatenate(sample), nlist, m)
+            train_time = time.perf_counter() - start_time
+
+            previous = manifest.get("ivf")
+            version = previous["version"] + 1 if previous else 0
+            quantizer.save(self._path(f"ivf-{version}.npz"))
+
+            for entry in entries:
+                vectors, _ = self._open_segment(entry)
+                encoded = [
+                    quantizer.encode(vectors[i : i + ENCODE_BATCH])
+                    for i in range(0, len(vectors), ENCODE_BATCH)
+                ]
+                self._write_codes(
+                    entry,
+                    version,
+                    np.concatenate([assign for assign, _ in encoded]),
+                    np.concatenate([codes for _, codes in encoded]),
+                    nlist,
+                )
+                old_version = entry.get("codes")
+                entry["codes"] = version
+                if old_version is not None:
+                    self._remove_codes(entry, old_version)
+
+            manifest["ivf"] = {"version": version, "nlist": nlist, "m": m}
+            self._write_manifest(manifest)
+            if previous:
+                os.remove(self._path(f"ivf-{previous['version']}.npz"))
+
+        stats = {
+            "rows": total,
+            "sample": sum(len(s) for s in sample),
+            "nlist": nlist,
+            "m": m,
+            "train_seconds": round(train_time, 2),
+            "total_seconds": round(time.perf_counter() - start_time, 2),
+        }
+        print(
+            f"[NumpyDB] Trained IVF-PQ (nlist={nlist}, m={m}) on {stats['sample']} "
+            f"of {total} vectors in {train_time:.1f}s; encoded the store in "
+            f"{stats['total_seconds']:.1f}s total"
+        )
+        return stats
+
+    def index_footprint(self) -> Dict[str, int]:
+        """Bytes on disk (and mapped at search time) for vectors vs the IVF-PQ index."""
+        manifest = self._manifest()
+        entries = list(manifest["sources"].values())
+        rows = sum(e["rows"] for e in entries)
+        footprint = {
+            "rows": rows,
+            "vectors": rows * self.dimension * self.dtype.itemsize,
+        }
+        ivf = manifest.get("ivf")
+        if ivf is not None:
+            quantizer = self._quantizer(manifest)[1]
+            footprint["ivfpq"] = (
+                quantizer.centroids.nbytes
+                + quantizer.codebooks.nbytes
+                + sum(
+                    e["rows"] * (ivf["m"] + 4) + (ivf["nlist"] + 1) * 8
+                    for e in entries
+                    if e.get("codes") == ivf["version"]
+                )
+            )
+        return footprint
+
+    # ----------------------------------------------------------------- search
+
+    def describe_retrieval(self, options: SearchOptions, top_k: int) -> Dict[str, Any]:
+        ivf = self._manifest().get("ivf")
+        if settings.NUMPY_INDEX != "ivfpq" or ivf is None:
+            index = f"exact scan (mmap {self.dtype.name})"
+            if settings.NUMPY_INDEX == "ivfpq":
+                index += ", IVF-PQ not trained yet"
+        else:
+            index = (
+                f"ivfpq (nlist={ivf['nlist']}, m={ivf['m']}, "
+                f"nprobe={self._nprobe(options, ivf['nlist'])}, "
+                f"refine x{settings.NUMPY_IVF_REFINE})"
+            )
+        described = {**super().describe_retrieval(options, top_k), "index": index}
+        if options.mode != "vector":
+            # No keyword index here: every search is a pure vector search
+            described["mode"] = "vector"
+            described["mode_wanted"] = options.mode
+        return described
+
+    @staticmethod
+    def _nprobe(options: Optional[SearchOptions], nlist: int) -> int:
+        """Lists probed for the profile; a small index has fewer than asked for."""
+        profile = options.profile if options else settings.RETRIEVAL_PROFILE
+        nprobe = round(settings.NUMPY_IVF_NPROBE * IVF_PROFILE_SCALE[profile])
+        return min(nlist, max(1, nprobe))
+
+    async def search(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        query_text: Optional[str] = None,
+        options: Optional[SearchOptions] = None,
+    ) -> List[DocumentChunk]:
+        # query_text is unused: hybrid requests fall back to vector search
+        return await self.search_many([query_vector], top_k, filters, options=options)
+
+    async def search_many(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        query_texts: Optional[List[str]] = None,
+        options: Optional[SearchOptions] = None,
+    ) -> List[DocumentChunk]:
+        """All queries in one (rows x queries) product per segment, off the event loop."""
+        return await asyncio.to_thread(
+            self._search, query_vectors, top_k, filters, options
+        )
+
+    def _search(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int,
+        filters: Optional[Dict[str, Any]],
+        options: Optional[SearchOptions],
+    ) -> List[DocumentChunk]:
+        try:
+            return self._scan(query_vectors, top_k, filters, options)
+        except FileNotFoundError:
+            # Another process swapped a generation between our manifest read and
+            # the file open; the fresh manifest points at the new files.
+            _manifests.pop(self.root, None)
+            return self._scan(query_vectors, top_k, filters, options)
+
+    def _scan(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int,
+        filters: Optional[Dict[str, Any]],
+        options: Optional[SearchOptions],
+    ) -> List[DocumentChunk]:
+        queries = normalize_rows(np.asarray(query_vectors, dtype=np.float32))
+        if queries.shape[1] != self.dimension:
+            raise ValueError(
+                f"Query vector size {queries.shape[1]} does not match store dimension {self.dimension}"
+            )
+
+        entries = self._entries(filters)
+        ivf = (
+            self._quantizer(self._manifest())
+            if settings.NUMPY_INDEX == "ivfpq"
+            else None
+        )
+        indexed: List[Dict[str, Any]] = []
+        if ivf is not None:
+            indexed = [e for e in entries if e.get("codes") == ivf[0]]
+            entries = [e for e in entries if e.get("codes") != ivf[0]]
+
+        # Per query: (score, segment entry, row) of its best rows so far
+        hits: List[List[Tuple[float, Dict[str, Any], int]]] = [[] for _ in queries]
+        for entry in entries:
+            vectors, _ = self._open_segment(entry)
+            if vectors.shape[0] == 0:
+                continue
+            # (rows, queries)
+            scores = np.asarray(vectors @ queries.T, dtype=np.float32)
+            k = min(top_k, scores.shape[0])
+            top_rows = np.argpartition(-scores, k - 1, axis=0)[:k]
+            for q in range(len(queries)):
+                hits[q].extend(
+                    (float(scores[row, q]), entry, int(row)) for row in top_rows[:, q]
+                )
+
+        if indexed:
+            nprobe = self._nprobe(options, ivf[1].nlist)
+            for q, query in enumerate(queries):
+                hits[q].extend(self._ivf_search(ivf[1], indexed, query, top_k, nprobe))
+
+        results = []
+        for query_hits in hits:
+            query_hits.sort(key=lambda hit: hit[0], reverse=True)
+            results.append(
+                [
+                    self._hydrate(entry, row, score)
+                    for score, entry, row in query_hits[:top_k]
+                ]
+            )
+        return self.merge_results(results)
+
+    def _ivf_search(
+        self,
+        quantizer: IVFPQQuantizer,
+        entries: List[Dict[str, Any]],
+        query: np.ndarray,
+        top_k: int,
+        nprobe: int,
+    ) -> List[Tuple[float, Dict[str, Any], int]]:
+        """
+        ADC over the nprobe closest lists of every segment, then an exact rescore
+        of the top_k * NUMPY_IVF_REFINE best candidates from the mapped vectors.
+        """
+        probed, coarse = quantizer.probe(query, nprobe)
+        table = quantizer.lookup_table(query)
+        subspaces = np.arange(quantizer.m)
+        depth = top_k * max(settings.NUMPY_IVF_REFINE, 1)
+
+        candidates: List[Tuple[float, Dict[str, Any], int]] = []
+        for entry in entries:
+            codes, order, lists = self._open_codes(entry)
+            starts = lists[probed]
+            counts = lists[probed + 1] - starts
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Concatenated row positions of every probed list, without a Python loop
+            positions = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+            positions += np.arange(total)
+            rows = order[positions]
+            scores = coarse[np.repeat(probed, counts)]
+            scores += table[subspaces, codes[positions]].sum(axis=1)
+            k = min(depth, len(rows))
+            for i in np.argpartition(-scores, k - 1)[:k]:
+                candidates.append((float(scores[i]), entry, int(rows[i])))
+
+        candidates.sort(key=lambda hit: hit[0], reverse=True)
+        candidates = candidates[:depth]
+        if settings.NUMPY_IVF_REFINE <= 0:
+            return candidates
+
+        by_segment: Dict[str, List[Tuple[Dict[str, Any], int]]] = {}
+        for _, entry, row in candidates:
+            by_segment.setdefault(entry["segment"], []).append((entry, row))
+        refined = []
+        for picked in by_segment.values():
+            vectors, _ = self._open_segment(picked[0][0])
+            rows = sorted(row for _, row in picked)
+            scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+            refined.extend(
+                (float(score), picked[0][0], row) for score, row in zip(scores, rows)
+            )
+        return refined
+
+    def _entries(self, filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Segments a search must scan; source filters just pick segments."""
+        sources: Dict[str, Dict[str, Any]] = self._manifest()["sources"]
+        source_filter = (filters or {}).get("source")
+        if source_filter is None:
+            return list(sources.values())
+        if isinstance(source_filter, str):
+            source_filter = {"$eq": source_filter}
+
+        if "$ne" in source_filter:
+            return [e for s, e in sources.items() if s != source_filter["$ne"]]
+        wanted = source_filter.get("$in") or [source_filter.get("$eq")]
+        return [sources[s] for s in dict.fromkeys(wanted) if s in sources]
+
+    def _hydrate(self, entry: Dict[str, Any], row: int, score: float) -> DocumentChunk:
+        """Reads just this row's sidecar line."""
+        _, offsets = self._open_segment(entry)
+        with open(self._sidecar(entry), "rb") as sidecar:
+            sidecar.seek(int(offsets[row]))
+            record = json.loads(sidecar.readline())
+
+        return DocumentChunk(
+            id=record["id"],
+            text=record["text"],
+            metadata=record["metadata"],
+            score=score,
+        )
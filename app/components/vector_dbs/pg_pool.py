@@ -0,0 +1,58 @@
+import asyncio
+from typing import Dict
+
+from pgvector.psycopg import register_vector_async
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from app.core.config import settings
+
+# One pool per DSN for the whole process. PGVectorDB is instantiated per request
+# in app/core/dependencies.py, so the pools must live outside the instances.
+_pools: Dict[str, AsyncConnectionPool] = {}
+_pools_lock = asyncio.Lock()
+
+
+async def _configure_connection(conn: AsyncConnection) -> None:
+    """Runs once per physical connection — vector types are registered up front."""
+    await register_vector_async(conn)
+
+
+async def get_async_pool(conninfo: str) -> AsyncConnectionPool:
+    """Returns the shared pool for `conninfo`, opening it on first use."""
+    pool = _pools.get(conninfo)
+    if pool is not None:
+        return pool
+
+    async with _pools_lock:
+        pool = _pools.get(conninfo)
+        if pool is None:
+            pool = AsyncConnectionPool(
+                conninfo,
+                min_size=settings.PG_POOL_MIN_SIZE,
+                max_size=settings.PG_POOL_MAX_SIZE,
+                timeout=settings.PG_POOL_TIMEOUT,
+                max_idle=settings.PG_POOL_MAX_IDLE,
+                max_lifetime=settings.PG_POOL_MAX_LIFETIME,
+                kwargs={"autocommit": True, "row_factory": dict_row},
+                configure=_configure_connection,
+                check=AsyncConnectionPool.check_connection,
+                open=False,
+            )
+            await pool.open(wait=True)
+            _pools[conninfo] = pool
+            print(
+                f"[PGPool] Opened pool (min={settings.PG_POOL_MIN_SIZE}, "
+                f"max={settings.PG_POOL_MAX_SIZE})"
+            )
+    return pool
+
+
+async def close_async_pools() -> None:
+    """Drains and closes every shared pool. Called on application shutdown."""
+    async with _pools_lock:
+        while _pools:
+            _, pool = _pools.popitem()
+            await pool.close()
+    print("[PGPool] All connection pools closed.")
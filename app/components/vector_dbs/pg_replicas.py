@@ -0,0 +1,274 @@
+import asyncio
+import random
+import time
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import psycopg
+from psycopg.rows import dict_row
+from psycopg.sql import SQL, Identifier
+
+from app.components.vector_dbs.pg_pool import get_async_pool
+from app.core.config import settings
+
+WRITES_TABLE = "rag_source_writes"
+
+# A server that is not in recovery has nothing left to replay
+CAUGHT_UP = 2**64
+
+PROBE_SQL = """
+    SELECT pg_is_in_recovery() AS standby,
+           pg_last_wal_replay_lsn()::text AS replay_lsn,
+           CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END AS lag
+"""
+
+
+def parse_lsn(lsn: Optional[str]) -> int:
+    """'16/B374D848' -> byte position, comparable across servers of one cluster."""
+    if not lsn:
+        return 0
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+@dataclass
+class Replica:
+    dsn: str
+    name: str
+    outstanding: int = 0
+    healthy: bool = False
+    lag: float = float("inf")
+    replay_lsn: int = 0
+    probe: Optional[psycopg.AsyncConnection[Any]] = None
+
+
+class ReplicaSet:
+    """
+    Read replicas of one primary. A background probe refreshes each replica's
+    health, lag and replay position every PGVECTOR_REPLICA_CHECK_INTERVAL, and
+    pulls the primary's recent per-source write positions so read-your-writes
+    holds across workers too (within one probe interval).
+
+    A read goes to the healthy replica with the fewest outstanding requests among
+    those within PGVECTOR_REPLICA_MAX_LAG that have replayed every recent write of
+    the sources it reads; if none qualifies, to the primary.
+    """
+
+    def __init__(self, primary: str, replicas: List[str]):
+        self.primary = primary
+        self.replicas = [
+            Replica(dsn=dsn, name=f"replica-{i}") for i, dsn in enumerate(replicas)
+        ]
+        # (table, source) -> (primary LSN after its last write, monotonic time seen)
+        self.writes: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self.routed = {"replica": 0, "primary": 0}
+        self._primary_probe: Optional[psycopg.AsyncConnection[Any]] = None
+        self._checker: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    # ----------------------------------------------------------------- probes
+
+    @staticmethod
+    def _probe_timeout() -> float:
+        return settings.PGVECTOR_REPLICA_CHECK_INTERVAL * 2
+
+    async def _ensure_checker(self):
+        if self._checker is None or self._checker.done():
+            self._checker = asyncio.create_task(self._check_loop())
+        # If the first probe round hangs, no replica is healthy yet: use the primary
+        with suppress(TimeoutError):
+            await asyncio.wait_for(self._ready.wait(), self._probe_timeout())
+
+    async def _check_loop(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:  # keep probing: one bad round must not end the loop
+                print(f"[PGReplicas] Health check failed: {type(e).__name__}: {e}")
+            self._ready.set()
+            await asyncio.sleep(settings.PGVECTOR_REPLICA_CHECK_INTERVAL)
+
+    async def check(self):
+        await asyncio.gather(
+            *[self._probe_replica(replica) for replica in self.replicas],
+            self._load_writes(),
+        )
+
+    async def _connect(self, dsn: str) -> psycopg.AsyncConnection[Any]:
+        timeout = max(1, round(settings.PGVECTOR_REPLICA_CHECK_INTERVAL * 2))
+        return await psycopg.AsyncConnection.connect(
+            dsn, autocommit=True, row_factory=dict_row, connect_timeout=timeout
+        )
+
+    async def _probe_replica(self, replica: Replica):
+        was_healthy = replica.healthy
+        try:
+            if replica.probe is None or replica.probe.closed:
+                replica.probe = await self._connect(replica.dsn)
+            cur = await asyncio.wait_for(
+                replica.probe.execute(PROBE_SQL), timeout=self._probe_timeout()
+            )
+            row = await cur.fetchone()
+        except (psycopg.Error, OSError, TimeoutError) as e:
+            replica.healthy = False
+            if replica.probe is not None:
+                await replica.probe.close()
+                replica.probe = None
+            if was_healthy:
+                print(f"[PGReplicas] {replica.name} unhealthy, reads fall back: {e}")
+            return
+
+        replica.healthy = True
+        if row["standby"]:
+            replica.lag = float(row["lag"])
+            replica.replay_lsn = parse_lsn(row["replay_lsn"])
+        else:
+            replica.lag, replica.replay_lsn = 0.0, CAUGHT_UP
+        if not was_healthy:
+            print(f"[PGReplicas] {replica.name} healthy (lag {replica.lag:.2f}s)")
+
+    async def _load_writes(self):
+        """Recent write positions from every worker, recorded on the primary."""
+        window = 2 * settings.PGVECTOR_REPLICA_MAX_LAG
+        try:
+            if self._primary_probe is None or self._primary_probe.closed:
+                self._primary_probe = await self._connect(self.primary)
+            cur = await asyncio.wait_for(
+                self._primary_probe.execute(
+                    SQL(
+                        "SELECT table_name, source, lsn::text AS lsn FROM {table} "
+                        "WHERE written_at > now() - make_interval(secs => %s)"
+                    ).format(table=Identifier(WRITES_TABLE)),
+                    [window],
+                ),
+                timeout=self._probe_timeout(),
+            )
+            rows = await cur.fetchall()
+        except (psycopg.Error, OSError, TimeoutError):
+            # Table missing until the first write, or primary down: keep what we know
+            if self._primary_probe is not None:
+                await self._primary_probe.close()
+                self._primary_probe = None
+            rows = []
+
+        now = time.monotonic()
+        for row in rows:
+            self._remember(
+                (row["table_name"], row["source"]), parse_lsn(row["lsn"]), now
+            )
+        for key, (_, seen) in list(self.writes.items()):
+            if now - seen > window:
+                del self.writes[key]
+
+    def _remember(self, key: Tuple[str, str], lsn: int, now: float):
+        known = self.writes.get(key)
+        if known is None or lsn > known[0]:
+            self.writes[key] = (lsn, now)
+
+    def record_writes(self, table: str, sources: Iterable[str], lsn: str):
+        """Called by this worker right after a write, before the next probe."""
+        now = time.monotonic()
+        for source in sources:
+            self._remember((table, source), parse_lsn(lsn), now)
+
+    # ---------------------------------------------------------------- routing
+
+    def _pick(self, needed_lsn: int) -> Optional[Replica]:
+        eligible = [
+            r
+            for r in self.replicas
+            if r.healthy
+            and r.lag <= settings.PGVECTOR_REPLICA_MAX_LAG
+            and r.replay_lsn >= needed_lsn
+        ]
+        if not eligible:
+            return None
+        least = min(r.outstanding for r in eligible)
+        return random.choice([r for r in eligible if r.outstanding == least])
+
+    @asynccontextmanager
+    async def connection(
+        self, table: str, sources: Iterable[str] = ()
+    ) -> AsyncIterator[psycopg.AsyncConnection[Any]]:
+        """
+        Pooled read connection. `sources` are the sources the read is scoped to;
+        global reads only need a replica within the lag bound.
+        """
+        await self._ensure_checker()
+        needed = max(
+            (self.writes.get((table, s), (0, 0.0))[0] for s in sources), default=0
+        )
+        replica = self._pick(needed)
+
+        async with AsyncExitStack() as stack:
+            conn = None
+            if replica is not None:
+                replica.outstanding += 1
+                stack.callback(self._release, replica)
+                try:
+                    pool = await get_async_pool(replica.dsn)
+                    conn = await stack.enter_async_context(pool.connection())
+                except psycopg.OperationalError as e:
+                    replica.healthy = False
+                    print(
+                        f"[PGReplicas] {replica.name} unreachable, using primary: {e}"
+                    )
+
+            if conn is None:
+                pool = await get_async_pool(self.primary)
+                conn = await stack.enter_async_context(pool.connection())
+                self.routed["primary"] += 1
+            else:
+                self.routed["replica"] += 1
+
+            try:
+                yield conn
+            except psycopg.OperationalError:
+                if replica is not None and conn is not None:
+                    replica.healthy = False  # the next probe decides if it is back
+                raise
+
+    @staticmethod
+    def _release(replica: Replica):
+        replica.outstanding -= 1
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": r.name,
+                "healthy": r.healthy,
+                "lag_s": round(r.lag, 3),
+                "outstanding": r.outstanding,
+            }
+            for r in self.replicas
+        ]
+
+    async def close(self):
+        if self._checker is not None:
+            self._checker.cancel()
+            self._checker = None
+        for conn in [self._primary_probe, *(r.probe for r in self.replicas)]:
+            if conn is not None:
+                await conn.close()
+
+
+# primary DSN -> its replica set, shared by every PGVectorDB instance
+_replica_sets: Dict[str, ReplicaSet] = {}
+
+
+def get_replica_set(primary: str, replicas: List[str]) -> ReplicaSet:
+    replica_set = _replica_sets.get(primary)
+    if replica_set is None:
+        replica_set = _replica_sets[primary] = ReplicaSet(primary, replicas)
+        print(f"[PGReplicas] Routing searches over {len(replicas)} read replica(s)")
+    return replica_set
+
+
+async def close_replica_sets() -> None:
+    """Stops the probes. Called on application shutdown, before the pools close."""
+    while _replica_sets:
+        _, replica_set = _replica_sets.popitem()
+        await replica_set.close()
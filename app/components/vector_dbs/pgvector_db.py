@@ -1,24 +1,95 @@
+import asyncio
+import hashlib
 import json
-from typing import Any, Dict, List, Optional, cast
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, cast
 
+import numpy as np
 import psycopg
-import psycopg.rows
 from pgvector.psycopg import register_vector
 from psycopg.rows import dict_row
-from psycopg.sql import SQL, Identifier
+from psycopg.sql import SQL, Composable, Identifier, Literal, Placeholder
+from psycopg.types.json import Jsonb
 
+from app.components.vector_dbs.pg_pool import get_async_pool
+from app.components.vector_dbs.pg_replicas import WRITES_TABLE, get_replica_set
+from app.components.vector_dbs.rerank import cosine_rerank
 from app.core.config import settings
 from app.core.interfaces import BaseVectorDB
-from app.models.domain import DocumentChunk
+from app.models.domain import DocumentChunk, SearchOptions
+
+REGISTRY_TABLE = "rag_vector_tables"
+
+# Storage precision -> HNSW operator class and distance operator.
+# halfvec halves index memory; bit stores one bit per dimension (hamming distance).
+PRECISIONS: Dict[str, Dict[str, str]] = {
+    "vector": {"opclass": "vector_cosine_ops", "operator": "<=>"},
+    "halfvec": {"opclass": "halfvec_cosine_ops", "operator": "<=>"},
+    "bit": {"opclass": "bit_hamming_ops", "operator": "<~>"},
+}
+
+# Retrieval profile -> HNSW session settings, applied with SET LOCAL per search.
+# Iterative scans (pgvector >= 0.8.0) keep walking the graph until enough rows
+# pass the WHERE clause, so filtered searches on small sources still fill top_k.
+RETRIEVAL_PROFILES: Dict[str, Dict[str, Any]] = {
+    "fast": {"ef_search": 40, "iterative_scan": "off", "max_scan_tuples": 20000},
+    "balanced": {
+        "ef_search": 100,
+        "iterative_scan": "relaxed_order",
+        "max_scan_tuples": 20000,
+    },
+    "exhaustive": {
+        "ef_search": 400,
+        "iterative_scan": "strict_order",
+        "max_scan_tuples": 100000,
+    },
+}
+
+# pgvector rejects a larger hnsw.ef_search
+EF_SEARCH_MAX = 1000
+
+# (db_url, table) -> server pgvector version, for schemas already verified in this process.
+_initialized_tables: Dict[Tuple[str, str], Tuple[int, ...]] = {}
+
+# (db_url, table) -> sources whose LIST partition is known to exist.
+_known_partitions: Dict[Tuple[str, str], Set[str]] = {}
+
+# (db_url, table) -> open bulk_load() blocks; the HNSW index is down while > 0.
+_bulk_loads: Dict[Tuple[str, str], int] = {}
+_bulk_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+# (db_url, table) -> session holding this process's share of the bulk-load lock
+_bulk_sessions: Dict[Tuple[str, str], psycopg.AsyncConnection[Any]] = {}
 
 
 class PGVectorDB(BaseVectorDB):
-    def __init__(self):
-        self.db_url = settings.DATABASE_URL
+    def __init__(
+        self,
+        table_name: Optional[str] = None,
+        db_url: Optional[str] = None,
+        read_urls: Optional[List[str]] = None,
+    ):
+        self.db_url = db_url or settings.DATABASE_URL
+        if read_urls is None:
+            read_urls = [] if db_url else settings.PGVECTOR_READ_URLS
+        # Writes always go to db_url; searches are spread over its replicas
+        self.replicas = get_replica_set(self.db_url, read_urls) if read_urls else None
         self.dimension = settings.EMBEDDING_DIMENSION
-        self.table_name = f"rag_vectors_{self.dimension}"
-        print(f"rag_vectors_{self.dimension}")
-        self._init_db()
+        self.table_name = table_name or f"rag_vectors_{self.dimension}"
+        self.precision = settings.PGVECTOR_PRECISION
+        self.coarse_index = settings.PGVECTOR_COARSE_INDEX
+        self.coarse_dimension = settings.PGVECTOR_COARSE_DIMENSION
+        self.rerank_candidates = settings.PGVECTOR_RERANK_CANDIDATES
+        self.partitioned = settings.PGVECTOR_PARTITION_BY_SOURCE
+        self.layout = "partitioned" if self.partitioned else "flat"
+
+        table_key = (self.db_url, self.table_name)
+        self._table_key = table_key
+        if table_key not in _initialized_tables:
+            self._init_db()
+            _initialized_tables[table_key] = self.pgvector_version
+        self.pgvector_version = _initialized_tables[table_key]
+        self._partitions = _known_partitions.setdefault(table_key, set())
 
     def _get_sync_connection(self) -> psycopg.Connection[Dict[str, Any]]:
         conn = psycopg.connect(
@@ -28,95 +99,1281 @@ class PGVectorDB(BaseVectorDB):
         )
         return cast(psycopg.Connection[Dict[str, Any]], conn)
 
-    async def _get_async_connection(self) -> psycopg.AsyncConnection[Dict[str, Any]]:
-        conn = await psycopg.AsyncConnection.connect(
-            self.db_url,
-            row_factory=psycopg.rows.dict_row,  # type: ignore[bad-argument-type]
-            autocommit=True,
-        )
-        return cast(psycopg.AsyncConnection[Dict[str, Any]], conn)
+    @asynccontextmanager
+    async def _connection(
+        self,
+    ) -> AsyncIterator[psycopg.AsyncConnection[Dict[str, Any]]]:
+        """Borrows a connection from the process-wide pool for this DSN."""
+        pool = await get_async_pool(self.db_url)
+        async with pool.connection() as conn:
+            yield cast(psycopg.AsyncConnection[Dict[str, Any]], conn)
 
     def _init_db(self):
         """Sync init — only runs once at startup, fine to be blocking."""
         with psycopg.connect(self.db_url, autocommit=True) as conn:
             conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
             register_vector(conn)
+            self._check_pgvector_version(conn)
+            if self.replicas is not None:
+                # Primary WAL position after each source's last write (read-your-writes)
+                conn.execute(
+                    SQL("""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        table_name TEXT NOT NULL,
+                        source TEXT NOT NULL,
+                        lsn pg_lsn NOT NULL,
+                        written_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                        PRIMARY KEY (table_name, source)
+                    )
+                """).format(table=Identifier(WRITES_TABLE))
+                )
             conn.execute(
                 SQL("""
-                CREATE TABLE IF NOT EXISTS {table} (
-                    id TEXT PRIMARY KEY,
-                    text TEXT,
-                    metadata JSONB,
-                    embedding vector
+                CREATE TABLE IF NOT EXISTS {registry} (
+                    table_name TEXT PRIMARY KEY,
+                    dimension INT NOT NULL,
+                    precision TEXT NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """).format(registry=Identifier(REGISTRY_TABLE))
+            )
+            conn.execute(
+                SQL(
+                    "ALTER TABLE {registry} "
+                    "ADD COLUMN IF NOT EXISTS layout TEXT NOT NULL DEFAULT 'flat'"
+                ).format(registry=Identifier(REGISTRY_TABLE))
+            )
+
+            if self._table_exists(conn):
+                self._verify_existing_table(conn)
+            elif self.partitioned:
+                # One LIST partition per source, created on demand at upsert time.
+                # The partition key must be part of the primary key.
+                conn.execute(
+                    SQL("""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id TEXT NOT NULL,
+                        source TEXT NOT NULL,
+                        text TEXT,
+                        metadata JSONB,
+                        embedding {column_type},
+                        PRIMARY KEY (source, id)
+                    ) PARTITION BY LIST (source)
+                """).format(
+                        table=Identifier(self.table_name),
+                        column_type=self._column_type(),
+                    )
+                )
+                self._register_table(conn)
+            else:
+                conn.execute(
+                    SQL("""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id TEXT PRIMARY KEY,
+                        text TEXT,
+                        metadata JSONB,
+                        embedding {column_type}
+                    )
+                """).format(
+                        table=Identifier(self.table_name),
+                        column_type=self._column_type(),
+                    )
+                )
+                self._register_table(conn)
+
+            # Keyword side of hybrid search. ADD COLUMN rewrites pre-existing tables once.
+            conn.execute(
+                SQL("""
+                ALTER TABLE {table} ADD COLUMN IF NOT EXISTS text_tsv tsvector
+                GENERATED ALWAYS AS (to_tsvector({config}, coalesce(text, ''))) STORED
+            """).format(
+                    table=Identifier(self.table_name),
+                    config=Literal(settings.PGVECTOR_FTS_CONFIG),
                 )
-            """).format(table=Identifier(self.table_name))
             )
             conn.execute(
                 SQL("""
                 CREATE INDEX IF NOT EXISTS {idx_name}
-                ON {table} USING hnsw (embedding vector_cosine_ops)
+                ON {table} USING gin (text_tsv)
             """).format(
-                    idx_name=Identifier(f"{self.table_name}_embedding_idx"),
+                    idx_name=Identifier(f"{self.table_name}_text_tsv_idx"),
                     table=Identifier(self.table_name),
                 )
             )
 
+            if not self.partitioned:
+                # Lets the planner filter tiny sources exactly instead of via HNSW
+                conn.execute(
+                    SQL("""
+                    CREATE INDEX IF NOT EXISTS {idx_name}
+                    ON {table} ((metadata->>'source'))
+                """).format(
+                        idx_name=Identifier(f"{self.table_name}_source_idx"),
+                        table=Identifier(self.table_name),
+                    )
+                )
+
+            conn.execute(
+                "SELECT pg_advisory_lock(hashtextextended(%s, 0))",
+                [self._lock_name("ddl")],
+            )
+            try:
+                self._ensure_hnsw_indexes(conn)
+            finally:
+                conn.execute(
+                    "SELECT pg_advisory_unlock(hashtextextended(%s, 0))",
+                    [self._lock_name("ddl")],
+                )
+
+            full_index = self._index_name(self.table_name, "embedding")
+            row = conn.execute("SELECT to_regclass(%s)", [full_index]).fetchone()
+            if self.coarse_index != "none" and row is not None and row[0] is not None:
+                print(
+                    f"[PGVector] Two-stage retrieval no longer uses {full_index}; "
+                    "DROP INDEX it to reclaim its memory."
+                )
+
+    def _ensure_hnsw_indexes(self, conn: psycopg.Connection[Any]):
+        """Creates missing HNSW indexes, unless a bulk load has them down on purpose."""
+        row = conn.execute(
+            "SELECT pg_try_advisory_lock(hashtextextended(%s, 0))",
+            [self._lock_name("load")],
+        ).fetchone()
+        if not (row and row[0]):
+            print(
+                f"[PGVector] A bulk load of {self.table_name} is running elsewhere; "
+                "it rebuilds the HNSW index when it finishes."
+            )
+            return
+        conn.execute(
+            "SELECT pg_advisory_unlock(hashtextextended(%s, 0))",
+            [self._lock_name("load")],
+        )
+
+        # On a partitioned parent this cascades: every partition gets its own HNSW
+        for suffix, key in self._hnsw_indexes().items():
+            index = self._index_name(self.table_name, suffix)
+            conn.execute(self._hnsw_index_sql(self.table_name, index, key))
+
+            row = conn.execute(
+                "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)",
+                [index],
+            ).fetchone()
+            if row and not row[0]:
+                # Left behind by an interrupted concurrent build
+                print(
+                    f"[PGVector] Warning: {index} is INVALID — searches run "
+                    "as exact scans until a bulk load rebuilds it."
+                )
+
+    def _hnsw_indexes(self) -> Dict[str, Composable]:
+        """HNSW indexes the table should carry: index name suffix -> indexed key."""
+        if self.coarse_index == "none":
+            return {
+                "embedding": SQL("embedding {opclass}").format(
+                    opclass=SQL(PRECISIONS[self.precision]["opclass"])
+                )
+            }
+        # Two-stage retrieval only needs the compact index: the rerank reads the
+        # full vectors of the candidates from the heap.
+        return {
+            f"coarse_{self.coarse_index}": SQL("({key}) {opclass}").format(
+                key=self._coarse_key(SQL("embedding")),
+                opclass=SQL(self._coarse_ops()["opclass"]),
+            )
+        }
+
+    @staticmethod
+    def _index_name(table: str, suffix: str) -> str:
+        return f"{table}_{suffix}_idx"
+
+    def _hnsw_index_sql(
+        self,
+        table: str,
+        index: str,
+        key: Composable,
+        concurrently: bool = False,
+        only: bool = False,
+    ) -> Composable:
+        return SQL("""
+            CREATE INDEX {concurrently}IF NOT EXISTS {index}
+            ON {only}{table} USING hnsw ({key})
+        """).format(
+            concurrently=SQL("CONCURRENTLY " if concurrently else ""),
+            index=Identifier(index),
+            only=SQL("ONLY " if only else ""),
+            table=Identifier(table),
+            key=key,
+        )
+
+    def _check_pgvector_version(self, conn: psycopg.Connection):
+        row = conn.execute(
+            "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+        ).fetchone()
+        self.pgvector_version = tuple(int(p) for p in str(row[0]).split(".")[:3])
+
+        if self.precision != "vector" and self.pgvector_version < (0, 7, 0):
+            raise RuntimeError(
+                f"PGVECTOR_PRECISION='{self.precision}' requires pgvector >= 0.7.0, "
+                f"but the server has {row[0]}."
+            )
+
+        if self.coarse_index != "none" and self.precision == "bit":
+            raise RuntimeError(
+                "PGVECTOR_COARSE_INDEX needs full vectors to rerank against; "
+                "it cannot be combined with PGVECTOR_PRECISION='bit'."
+            )
+        if self.coarse_index == "binary" and self.pgvector_version < (0, 7, 0):
+            raise RuntimeError(
+                "PGVECTOR_COARSE_INDEX='binary' requires pgvector >= 0.7.0 "
+                f"(binary_quantize), but the server has {row[0]}."
+            )
+        if self.coarse_index == "reduced" and not (
+            0 < self.coarse_dimension < self.dimension
+        ):
+            raise RuntimeError(
+                f"PGVECTOR_COARSE_DIMENSION must be between 1 and {self.dimension - 1}, "
+                f"got {self.coarse_dimension}."
+            )
+
+    def _table_exists(self, conn: psycopg.Connection) -> bool:
+        row = conn.execute("SELECT to_regclass(%s)", [self.table_name]).fetchone()
+        return row is not None and row[0] is not None
+
+    def _register_table(self, conn: psycopg.Connection):
+        conn.execute(
+            SQL("""
+            INSERT INTO {registry} (table_name, dimension, precision, layout)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (table_name) DO NOTHING
+        """).format(registry=Identifier(REGISTRY_TABLE)),
+            [self.table_name, self.dimension, self.precision, self.layout],
+        )
+
+    def _verify_existing_table(self, conn: psycopg.Connection):
+        """
+        Refuses to run against a table stored in a different precision or layout
+        than the one configured. Tables created before the registry existed are
+        detected from the catalog; the old untyped `vector` column is upgraded in
+        place to vector(N).
+        """
+        row = conn.execute(
+            SQL(
+                "SELECT precision, layout FROM {registry} WHERE table_name = %s"
+            ).format(registry=Identifier(REGISTRY_TABLE)),
+            [self.table_name],
+        ).fetchone()
+
+        if row is not None:
+            stored, layout = row[0], row[1]
+        else:
+            kind_row = conn.execute(
+                "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+                [self.table_name],
+            ).fetchone()
+            layout = "partitioned" if kind_row and kind_row[0] == "p" else "flat"
+
+            type_row = conn.execute(
+                """
+                SELECT format_type(atttypid, atttypmod)
+                FROM pg_attribute
+                WHERE attrelid = to_regclass(%s) AND attname = 'embedding'
+                """,
+                [self.table_name],
+            ).fetchone()
+            column_type = str(type_row[0]) if type_row else "vector"
+            stored = column_type.split("(")[0]
+
+            if column_type == "vector" and self.precision == "vector":
+                print(f"[PGVector] Upgrading {self.table_name}.embedding to vector(N)")
+                conn.execute(
+                    SQL(
+                        "ALTER TABLE {table} ALTER COLUMN embedding TYPE {column_type}"
+                    ).format(
+                        table=Identifier(self.table_name),
+                        column_type=self._column_type(),
+                    )
+                )
+
+            if stored == self.precision and layout == self.layout:
+                self._register_table(conn)
+
+        if layout != self.layout:
+            raise RuntimeError(
+                f"Table '{self.table_name}' uses the '{layout}' layout but "
+                f"PGVECTOR_PARTITION_BY_SOURCE={self.partitioned}. Flip the setting "
+                "back or run reset_db.py and re-ingest."
+            )
+        if stored != self.precision:
+            raise RuntimeError(
+                f"Table '{self.table_name}' stores '{stored}' embeddings but "
+                f"PGVECTOR_PRECISION is '{self.precision}'. Set PGVECTOR_PRECISION="
+                f"{stored} or run reset_db.py and re-ingest."
+            )
+
+    def _column_type(self) -> SQL:
+        return SQL(f"{self.precision}({self.dimension})")
+
+    def _to_storage(self, vector_expr: Composable) -> Composable:
+        """Converts a float `vector` expression into the column's storage type."""
+        if self.precision == "halfvec":
+            return SQL("({expr})::halfvec({dim})").format(
+                expr=vector_expr, dim=Literal(self.dimension)
+            )
+        if self.precision == "bit":
+            return SQL("binary_quantize({expr})::bit({dim})").format(
+                expr=vector_expr, dim=Literal(self.dimension)
+            )
+        return vector_expr
+
+    def _distance(self, vector_expr: Composable) -> Composable:
+        """Distance between the stored embedding and a float `vector` expression."""
+        return SQL("embedding {op} {query}").format(
+            op=SQL(PRECISIONS[self.precision]["operator"]),
+            query=self._to_storage(vector_expr),
+        )
+
+    def _score(self, distance: Composable) -> Composable:
+        """Maps a distance to a similarity score where higher is better."""
+        if self.precision == "bit":
+            return SQL("1 - ({distance}) / {dim}").format(
+                distance=distance, dim=Literal(float(self.dimension))
+            )
+        return SQL("1 - ({distance})").format(distance=distance)
+
+    def _coarse_key(self, vector_expr: Composable) -> Composable:
+        """
+        Compact form of a vector for the coarse stage: sign bits ("binary") or the
+        leading PGVECTOR_COARSE_DIMENSION dimensions ("reduced", meant for
+        Matryoshka-trained models). The array slice works on every pgvector
+        version, unlike subvector(); index and query must use the same expression.
+        """
+        if self.coarse_index == "binary":
+            return SQL("binary_quantize({vector})::bit({dim})").format(
+                vector=vector_expr, dim=Literal(self.dimension)
+            )
+        return SQL("({vector}::real[])[1:{dim}]::{column}({dim})").format(
+            vector=vector_expr,
+            dim=Literal(self.coarse_dimension),
+            column=SQL("halfvec" if self.precision == "halfvec" else "vector"),
+        )
+
+    def _coarse_ops(self) -> Dict[str, str]:
+        if self.coarse_index == "binary":
+            return PRECISIONS["bit"]
+        return PRECISIONS[self.precision]
+
+    def _coarse_distance(self, vector_expr: Composable) -> Composable:
+        return SQL("{key} {operator} {query}").format(
+            key=self._coarse_key(SQL("embedding")),
+            operator=SQL(self._coarse_ops()["operator"]),
+            query=self._coarse_key(vector_expr),
+        )
+
+    def _partition_name(self, source: str) -> str:
+        digest = hashlib.md5(source.encode("utf-8")).hexdigest()[:16]
+        return f"{self.table_name}_p_{digest}"
+
+    async def _ensure_partitions(
+        self, conn: psycopg.AsyncConnection[Dict[str, Any]], sources: Iterable[str]
+    ):
+        """Creates the LIST partition (and, through the parent, its HNSW index) per new source."""
+        for source in set(sources) - self._partitions:
+            try:
+                await conn.execute(
+                    SQL(
+                        "CREATE TABLE IF NOT EXISTS {partition} "
+                        "PARTITION OF {table} FOR VALUES IN ({source})"
+                    ).format(
+                        partition=Identifier(self._partition_name(source)),
+                        table=Identifier(self.table_name),
+                        source=Literal(source),
+                    )
+                )
+            except (psycopg.errors.DuplicateTable, psycopg.errors.UniqueViolation):
+                pass  # Another worker created it between our check and the DDL
+            self._partitions.add(source)
+
+    async def _partition_exists(
+        self, conn: psycopg.AsyncConnection[Dict[str, Any]], source: str
+    ) -> bool:
+        if source in self._partitions:
+            return True
+
+        cur = await conn.execute(
+            "SELECT to_regclass(%s) IS NOT NULL AS found",
+            [self._partition_name(source)],
+        )
+        row = await cur.fetchone()
+        if row and row["found"]:
+            self._partitions.add(source)
+            return True
+        return False
+
+    @staticmethod
+    def _chunk_source(chunk: DocumentChunk) -> str:
+        return str(chunk.metadata.get("source", ""))
+
+    def _upsert_sql(self, incoming: Composable) -> Composable:
+        """
+        INSERT ... ON CONFLICT over `incoming`, a row source producing
+        (id, text, metadata, embedding) with float `vector` embeddings.
+        """
+        if self.partitioned:
+            columns = SQL("id, source, text, metadata, embedding")
+            source = SQL("coalesce(metadata->>'source', ''), ")
+            key = SQL("source, id")
+        else:
+            columns = SQL("id, text, metadata, embedding")
+            source = SQL("")
+            key = SQL("id")
+
+        return SQL("""
+            INSERT INTO {table} ({columns})
+            SELECT id, {source}text, metadata, {embedding}
+            FROM ({incoming}) AS incoming (id, text, metadata, embedding)
+            ON CONFLICT ({key}) DO UPDATE
+            SET text = EXCLUDED.text,
+                metadata = EXCLUDED.metadata,
+                embedding = EXCLUDED.embedding
+        """).format(
+            table=Identifier(self.table_name),
+            columns=columns,
+            source=source,
+            embedding=self._to_storage(SQL("embedding")),
+            incoming=incoming,
+            key=key,
+        )
+
     async def upsert(self, chunks: List[DocumentChunk], embeddings: List[List[float]]):
         if len(chunks) != len(embeddings):
             raise ValueError("Number of chunks and embeddings must match!")
 
-        async with await self._get_async_connection() as conn:
-            async with conn.cursor() as cur:
-                data = [
-                    (chunk.id, chunk.text, json.dumps(chunk.metadata), embedding)
-                    for chunk, embedding in zip(chunks, embeddings)
-                ]
-                await cur.executemany(
-                    SQL("""
-                        INSERT INTO {table} (id, text, metadata, embedding)
-                        VALUES (%s, %s, %s, %s)
-                        ON CONFLICT (id) DO UPDATE
-                        SET text = EXCLUDED.text,
-                            metadata = EXCLUDED.metadata,
-                            embedding = EXCLUDED.embedding
-                    """).format(table=Identifier(self.table_name)),
-                    data,
+        start_time = time.perf_counter()
+        use_copy = len(chunks) >= settings.PGVECTOR_COPY_THRESHOLD
+
+        async with self._connection() as conn:
+            if self.partitioned:
+                await self._ensure_partitions(
+                    conn, (self._chunk_source(chunk) for chunk in chunks)
+                )
+
+            if use_copy:
+                await self._copy_upsert(conn, chunks, embeddings)
+            else:
+                await self._executemany_upsert(conn, chunks, embeddings)
+            await self._record_writes(
+                conn, {self._chunk_source(chunk) for chunk in chunks}
+            )
+
+        duration = time.perf_counter() - start_time
+        print(
+            f"[PGVector] Upserted {len(chunks)} rows via "
+            f"{'binary COPY' if use_copy else 'executemany'} in {duration:.2f}s "
+            f"({len(chunks) / max(duration, 1e-9):.0f} rows/s)"
+        )
+
+    async def delete_source(self, source: str):
+        async with self._connection() as conn:
+            if self.partitioned:
+                # TRUNCATE rather than DROP: other workers cache the partition as existing
+                if await self._partition_exists(conn, source):
+                    await conn.execute(
+                        SQL("TRUNCATE {partition}").format(
+                            partition=Identifier(self._partition_name(source))
+                        )
+                    )
+            else:
+                await conn.execute(
+                    SQL("DELETE FROM {table} WHERE metadata->>'source' = %s").format(
+                        table=Identifier(self.table_name)
+                    ),
+                    [source],
                 )
+            await self._record_writes(conn, [source])
+        print(f"[PGVector] Deleted source '{source}'")
+
+    async def _record_writes(
+        self, conn: psycopg.AsyncConnection[Dict[str, Any]], sources: Iterable[str]
+    ):
+        """
+        Stores the primary's WAL position after a write to `sources`. Reads scoped
+        to them use a replica only once it has replayed past that position.
+        """
+        if self.replicas is None:
+            return
+        sources = list(sources)
+        cur = await conn.execute(
+            SQL("""
+            INSERT INTO {table} (table_name, source, lsn, written_at)
+            SELECT %(table_name)s, source, pg_current_wal_lsn(), now()
+            FROM unnest(%(sources)s::text[]) AS source
+            ON CONFLICT (table_name, source) DO UPDATE
+            SET lsn = EXCLUDED.lsn, written_at = EXCLUDED.written_at
+            RETURNING lsn::text AS lsn
+        """).format(table=Identifier(WRITES_TABLE)),
+            {"table_name": self.table_name, "sources": sources},
+        )
+        row = await cur.fetchone()
+        if row:
+            self.replicas.record_writes(self.table_name, sources, row["lsn"])
+
+    async def export_page(
+        self, cursor: Optional[str], limit: int
+    ) -> Tuple[List[DocumentChunk], np.ndarray, Optional[str]]:
+        """
+        Keyset pagination over the primary key ((source, id) when partitioned), so
+        every page is one index range scan however deep the export is. The cursor
+        is the JSON-encoded key of the last row.
+        """
+        if self.precision == "bit":
+            raise ValueError(
+                "PGVECTOR_PRECISION='bit' keeps only sign bits; the original vectors "
+                "cannot be exported."
+            )
+
+        key = [SQL("source"), SQL("id")] if self.partitioned else [SQL("id")]
+        key_sql = SQL("({})").format(SQL(", ").join(key))
+        where = SQL("")
+        params: Dict[str, Any] = {"limit": limit}
+        if cursor is not None:
+            where = SQL("WHERE {key} > ({values})").format(
+                key=key_sql,
+                values=SQL(", ").join(Placeholder(f"k{i}") for i in range(len(key))),
+            )
+            params.update(
+                {f"k{i}": value for i, value in enumerate(json.loads(cursor))}
+            )
+
+        query = SQL("""
+            SELECT {key_columns}, text, metadata, embedding::vector AS embedding
+            FROM {table}
+            {where}
+            ORDER BY {key_columns}
+            LIMIT %(limit)s
+        """).format(
+            key_columns=SQL(", ").join(key),
+            table=Identifier(self.table_name),
+            where=where,
+        )
+        # Binary results: vectors arrive as raw float4s, not text to parse
+        async with (
+            self._connection() as conn,
+            conn.cursor(row_factory=dict_row, binary=True) as cur,
+        ):
+            await cur.execute(query, params)
+            rows = await cur.fetchall()
+
+        if not rows:
+            return [], np.empty((0, self.dimension), dtype=np.float32), None
+        chunks = [
+            DocumentChunk(
+                id=str(row["id"]), text=str(row["text"]), metadata=row["metadata"]
+            )
+            for row in rows
+        ]
+        vectors = np.stack([row["embedding"].to_numpy() for row in rows])
+        last = rows[-1]
+        next_cursor = json.dumps(
+            [last["source"], last["id"]] if self.partitioned else [last["id"]]
+        )
+        return chunks, vectors, next_cursor if len(rows) == limit else None
+
+    @asynccontextmanager
+    async def bulk_load(self) -> AsyncIterator[None]:
+        """
+        Drops the HNSW index for the duration of the block so rows load without
+        per-row graph inserts, then rebuilds it once. Nested or concurrent blocks
+        in this process share one drop/rebuild, and so do bulk loads of the same
+        table in other workers (see _join_bulk_load). Searches meanwhile are exact
+        sequential scans: correct, just slower on big tables.
+        """
+        key = self._table_key
+        lock = _bulk_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if _bulk_loads.get(key, 0) == 0:
+                _bulk_sessions[key] = await self._join_bulk_load()
+            _bulk_loads[key] = _bulk_loads.get(key, 0) + 1
+
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            try:
+                async with lock:
+                    _bulk_loads[key] -= 1
+                    if _bulk_loads[key] == 0:
+                        await self._leave_bulk_load(_bulk_sessions.pop(key))
+            except Exception as e:
+                if not failed:
+                    raise
+                # The load's own error is the one to report
+                print(f"[PGVector] Bulk load: index rebuild failed as well: {e!r}")
+
+    def _lock_name(self, kind: str) -> str:
+        return f"rag_bulk_{kind}:{self.table_name}"
+
+    async def _join_bulk_load(self) -> psycopg.AsyncConnection[Any]:
+        """
+        Cross-worker coordination through advisory locks on a session held open
+        for the load: every loading process holds the table's "load" lock shared,
+        and "ddl" serialises the drop, the rebuild and _init_db's CREATE INDEX.
+        Only the first loader drops the index and only the last one rebuilds it.
+        A worker that dies mid-load releases its share with its session.
+        """
+        conn = await self._maintenance_connection()
+        try:
+            await conn.execute(
+                "SELECT pg_advisory_lock(hashtextextended(%s, 0))",
+                [self._lock_name("ddl")],
+            )
+            cur = await conn.execute(
+                "SELECT pg_try_advisory_lock(hashtextextended(%s, 0))",
+                [self._lock_name("load")],
+            )
+            row = await cur.fetchone()
+            if row and row[0]:  # nobody else is loading
+                await conn.execute(
+                    "SELECT pg_advisory_unlock(hashtextextended(%s, 0))",
+                    [self._lock_name("load")],
+                )
+                await self._drop_hnsw_index()
+            else:
+                print("[PGVector] Bulk load: joining one already running elsewhere")
+            await conn.execute(
+                "SELECT pg_advisory_lock_shared(hashtextextended(%s, 0)), "
+                "pg_advisory_unlock(hashtextextended(%s, 0))",
+                [self._lock_name("load"), self._lock_name("ddl")],
+            )
+        except BaseException:
+            await conn.close()
+            raise
+        return conn
+
+    async def _leave_bulk_load(self, conn: psycopg.AsyncConnection[Any]):
+        """Releases this worker's share; the last loader out rebuilds the index."""
+        try:
+            await conn.execute(
+                "SELECT pg_advisory_lock(hashtextextended(%s, 0)), "
+                "pg_advisory_unlock_shared(hashtextextended(%s, 0))",
+                [self._lock_name("ddl"), self._lock_name("load")],
+            )
+            cur = await conn.execute(
+                "SELECT pg_try_advisory_lock(hashtextextended(%s, 0))",
+                [self._lock_name("load")],
+            )
+            row = await cur.fetchone()
+            if row and row[0]:
+                await self._build_hnsw_index()
+            else:
+                print("[PGVector] Bulk load: another worker still loading will rebuild")
+        finally:
+            await conn.close()  # releases every advisory lock of the session
+
+    async def _maintenance_connection(self) -> psycopg.AsyncConnection[Any]:
+        """
+        Dedicated autocommit connection for index DDL: CONCURRENTLY cannot run in a
+        transaction, and a long build should not hold a pool slot or leak settings.
+        """
+        conn = await psycopg.AsyncConnection.connect(self.db_url, autocommit=True)
+        await conn.execute(
+            "SELECT set_config('maintenance_work_mem', %s, false), "
+            "set_config('max_parallel_maintenance_workers', %s, false)",
+            [
+                settings.PGVECTOR_BULK_MAINTENANCE_WORK_MEM,
+                str(settings.PGVECTOR_BULK_PARALLEL_WORKERS),
+            ],
+        )
+        return conn
+
+    async def _drop_hnsw_index(self):
+        start_time = time.perf_counter()
+        indexes = [self._index_name(self.table_name, s) for s in self._hnsw_indexes()]
+        async with await self._maintenance_connection() as conn:
+            for index in indexes:
+                # Partitioned indexes cannot be dropped concurrently; this cascades to partitions
+                await conn.execute(
+                    SQL("DROP INDEX {concurrently}IF EXISTS {index}").format(
+                        concurrently=SQL("" if self.partitioned else "CONCURRENTLY "),
+                        index=Identifier(index),
+                    )
+                )
+        print(
+            f"[PGVector] Bulk load: dropped {', '.join(indexes)} in "
+            f"{time.perf_counter() - start_time:.2f}s"
+        )
+
+    async def _build_hnsw_index(self):
+        """
+        CREATE INDEX CONCURRENTLY so searches and writes continue during the build.
+        Partitioned tables cannot do that on the parent: build an ONLY parent index,
+        build each partition's concurrently, and attach them (the parent turns valid
+        once every partition is attached).
+        """
+        start_time = time.perf_counter()
+        indexes = self._hnsw_indexes()
+        async with await self._maintenance_connection() as conn:
+            partitions: List[str] = []
+            if self.partitioned:
+                cur = await conn.execute(
+                    """
+                    SELECT c.relname FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = to_regclass(%s)
+                    """,
+                    [self.table_name],
+                )
+                partitions = [row[0] for row in await cur.fetchall()]
+
+            for suffix, key in indexes.items():
+                index = self._index_name(self.table_name, suffix)
+                if not self.partitioned:
+                    await self._build_index_concurrently(
+                        conn, self.table_name, index, key
+                    )
+                    continue
+
+                await conn.execute(
+                    self._hnsw_index_sql(self.table_name, index, key, only=True)
+                )
+                for partition in partitions:
+                    partition_index = self._index_name(partition, suffix)
+                    await self._build_index_concurrently(
+                        conn, partition, partition_index, key
+                    )
+                    await conn.execute(
+                        SQL("ALTER INDEX {index} ATTACH PARTITION {child}").format(
+                            index=Identifier(index),
+                            child=Identifier(partition_index),
+                        )
+                    )
+        print(
+            f"[PGVector] Bulk load: rebuilt "
+            f"{', '.join(self._index_name(self.table_name, s) for s in indexes)} in "
+            f"{time.perf_counter() - start_time:.2f}s "
+            f"(maintenance_work_mem={settings.PGVECTOR_BULK_MAINTENANCE_WORK_MEM}, "
+            f"workers={settings.PGVECTOR_BULK_PARALLEL_WORKERS})"
+        )
+
+    async def _build_index_concurrently(
+        self,
+        conn: psycopg.AsyncConnection[Any],
+        table: str,
+        index: str,
+        key: Composable,
+    ):
+        try:
+            await conn.execute(
+                self._hnsw_index_sql(table, index, key, concurrently=True)
+            )
+        except psycopg.Error:
+            # A failed concurrent build leaves an INVALID index that IF NOT EXISTS
+            # would keep skipping; drop it so the next start or bulk load retries.
+            await conn.execute(
+                SQL("DROP INDEX CONCURRENTLY IF EXISTS {index}").format(
+                    index=Identifier(index)
+                )
+            )
+            raise
+
+    async def _executemany_upsert(
+        self,
+        conn: psycopg.AsyncConnection[Dict[str, Any]],
+        chunks: List[DocumentChunk],
+        embeddings: List[List[float]],
+    ):
+        """Row-by-row path — cheapest for the small batches served by /ingest/custom."""
+        async with conn.cursor() as cur:
+            data = [
+                (chunk.id, chunk.text, json.dumps(chunk.metadata), embedding)
+                for chunk, embedding in zip(chunks, embeddings)
+            ]
+            await cur.executemany(
+                self._upsert_sql(SQL("VALUES (%s, %s, %s::jsonb, %s::vector)")),
+                data,
+            )
+
+    async def _copy_upsert(
+        self,
+        conn: psycopg.AsyncConnection[Dict[str, Any]],
+        chunks: List[DocumentChunk],
+        embeddings: List[List[float]],
+    ):
+        """
+        Bulk path: stream rows with binary COPY into a session-local staging table,
+        then merge into the real table with a single INSERT ... SELECT.
+        """
+        # ON CONFLICT cannot touch the same row twice in one statement — last write wins
+        rows = {
+            chunk.id: (chunk, embedding) for chunk, embedding in zip(chunks, embeddings)
+        }
+        staging = Identifier(f"{self.table_name}_staging")
+
+        async with conn.transaction(), conn.cursor() as cur:
+            await cur.execute(
+                SQL("""
+                    CREATE TEMP TABLE {staging} (
+                        id TEXT,
+                        text TEXT,
+                        metadata JSONB,
+                        embedding vector({dim})
+                    ) ON COMMIT DROP
+                """).format(staging=staging, dim=Literal(self.dimension))
+            )
+
+            async with cur.copy(
+                SQL(
+                    "COPY {staging} (id, text, metadata, embedding) "
+                    "FROM STDIN (FORMAT BINARY)"
+                ).format(staging=staging)
+            ) as copy:
+                copy.set_types(["text", "text", "jsonb", "vector"])
+                for chunk, embedding in rows.values():
+                    await copy.write_row(
+                        (
+                            chunk.id,
+                            chunk.text,
+                            Jsonb(chunk.metadata),
+                            np.asarray(embedding, dtype=np.float32),
+                        )
+                    )
+
+            await cur.execute(
+                self._upsert_sql(
+                    SQL("SELECT id, text, metadata, embedding FROM {staging}").format(
+                        staging=staging
+                    )
+                )
+            )
+
+    @staticmethod
+    def _source_filter(
+        filters: Optional[Dict[str, Any]],
+    ) -> Tuple[str, List[str]]:
+        """
+        Normalises a Pinecone-style source filter to (operator, sources):
+        ("all", []), ("$in", [...]) or ("$ne", [source]). $eq becomes a one-item $in.
+        """
+        condition = (filters or {}).get("source")
+        if condition is None:
+            return "all", []
+        if isinstance(condition, str):
+            return "$in", [condition]
+        if "$eq" in condition:
+            return "$in", [str(condition["$eq"])]
+        if "$in" in condition:
+            return "$in", [str(source) for source in condition["$in"]]
+        if "$ne" in condition:
+            return "$ne", [str(condition["$ne"])]
+        raise ValueError(f"Unsupported source filter: {condition}")
+
+    async def _scope(
+        self,
+        conn: psycopg.AsyncConnection[Dict[str, Any]],
+        filters: Optional[Dict[str, Any]],
+    ) -> Optional[Tuple[Identifier, List[Composable], Dict[str, Any]]]:
+        """
+        Resolves filters into (table to scan, WHERE conditions, their params).
+        Returns None when nothing can match.
+
+        - no filter: no WHERE at all, a plain ORDER BY ... LIMIT over the HNSW index.
+        - one source, partitioned: the source's partition, again with no WHERE.
+        - several sources: `= ANY(...)`. Partitioned tables prune to those
+          partitions; flat tables let the planner pick between HNSW + filter
+          (iterative scans fill top_k) and the source B-tree for tiny sources.
+        - $ne: HNSW scan filtered on the excluded source.
+        """
+        operator, sources = self._source_filter(filters)
+        source_column = (
+            SQL("source") if self.partitioned else SQL("metadata->>'source'")
+        )
+
+        if operator == "all":
+            return Identifier(self.table_name), [], {}
+
+        if operator == "$ne":
+            return (
+                Identifier(self.table_name),
+                [
+                    SQL("{column} IS DISTINCT FROM %(excluded_source)s").format(
+                        column=source_column
+                    )
+                ],
+                {"excluded_source": sources[0]},
+            )
+
+        if not sources:
+            return None
+
+        if self.partitioned and len(sources) == 1:
+            # Address the source's partition directly: no WHERE clause, so the
+            # planner has nothing to weigh against the partition's HNSW index.
+            if not await self._partition_exists(conn, sources[0]):
+                return None
+            return Identifier(self._partition_name(sources[0])), [], {}
+
+        return (
+            Identifier(self.table_name),
+            [SQL("{column} = ANY(%(sources)s)").format(column=source_column)],
+            {"sources": sources},
+        )
+
+    def describe_retrieval(self, options: SearchOptions, top_k: int) -> Dict[str, Any]:
+        profile = RETRIEVAL_PROFILES[options.profile]
+        # HNSW can never return more than ef_search rows
+        candidates = top_k * settings.PGVECTOR_HYBRID_CANDIDATES
+        ann_limit = candidates if options.mode == "hybrid" else top_k
+        if self.coarse_index != "none":
+            ann_limit *= self.rerank_candidates
+
+        ef_search = max(profile["ef_search"], ann_limit)
+        described: Dict[str, Any] = {
+            **super().describe_retrieval(options, top_k),
+            "hnsw.ef_search": min(ef_search, EF_SEARCH_MAX),
+        }
+        if ef_search > EF_SEARCH_MAX:
+            # Past the cap only an iterative scan can still fill all the candidates
+            described["hnsw.ef_search_wanted"] = ef_search
+        if self.coarse_index != "none":
+            described["coarse_index"] = self.coarse_index
+            described["rerank_candidates"] = ann_limit
+        if _bulk_loads.get(self._table_key, 0):
+            described["hnsw.index"] = "rebuilding (exact scan)"
+        if self.pgvector_version >= (0, 8, 0):
+            described["hnsw.iterative_scan"] = profile["iterative_scan"]
+            described["hnsw.max_scan_tuples"] = profile["max_scan_tuples"]
+        else:
+            version = ".".join(str(p) for p in self.pgvector_version)
+            described["hnsw.iterative_scan"] = f"unsupported (pgvector {version})"
+        return described
+
+    async def _apply_profile(
+        self,
+        conn: psycopg.AsyncConnection[Dict[str, Any]],
+        options: SearchOptions,
+        top_k: int,
+    ):
+        """SET LOCAL the profile's HNSW settings; must run inside the search transaction."""
+        described = self.describe_retrieval(options, top_k)
+        settings_sql = [SQL("set_config('hnsw.ef_search', %(ef_search)s, true)")]
+        params = {"ef_search": str(described["hnsw.ef_search"])}
+
+        if "hnsw.max_scan_tuples" in described:
+            settings_sql += [
+                SQL("set_config('hnsw.iterative_scan', %(iterative_scan)s, true)"),
+                SQL("set_config('hnsw.max_scan_tuples', %(max_scan_tuples)s, true)"),
+            ]
+            params["iterative_scan"] = described["hnsw.iterative_scan"]
+            params["max_scan_tuples"] = str(described["hnsw.max_scan_tuples"])
+
+        await conn.execute(SQL("SELECT ") + SQL(", ").join(settings_sql), params)
+
+    @asynccontextmanager
+    async def _read_connection(
+        self, filters: Optional[Dict[str, Any]]
+    ) -> AsyncIterator[psycopg.AsyncConnection[Dict[str, Any]]]:
+        """A replica connection when replicas are configured, else the primary pool."""
+        if self.replicas is None:
+            async with self._connection() as conn:
+                yield conn
+            return
+
+        operator, sources = self._source_filter(filters)
+        async with self.replicas.connection(
+            self.table_name, sources if operator == "$in" else []
+        ) as conn:
+            yield cast(psycopg.AsyncConnection[Dict[str, Any]], conn)
+
+    @asynccontextmanager
+    async def _search_session(
+        self,
+        options: SearchOptions,
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[psycopg.AsyncConnection[Dict[str, Any]]]:
+        """
+        Pooled connection inside a transaction carrying the profile's HNSW settings.
+        Pipeline mode sends BEGIN, the SET LOCALs and the search in one flush.
+        """
+        async with (
+            self._read_connection(filters) as conn,
+            conn.pipeline(),
+            conn.transaction(),
+        ):
+            await self._apply_profile(conn, options, top_k)
+            yield conn
 
     async def search(
         self,
         query_vector: List[float],
         top_k: int,
         filters: Optional[Dict[str, Any]] = None,
+        query_text: Optional[str] = None,
+        options: Optional[SearchOptions] = None,
     ) -> List[DocumentChunk]:
-        if not filters or "source" not in filters:
-            return []
+        options = options or SearchOptions()
+
+        async with self._search_session(options, top_k, filters) as conn:
+            scope = await self._scope(conn, filters)
+            if scope is None:
+                return []
+            table, conditions, params = scope
+            params.update(query_vector=query_vector, top_k=top_k)
+
+            if options.mode == "hybrid" and query_text:
+                final_query = self._hybrid_query(table, conditions)
+                params.update(
+                    query_text=query_text,
+                    fts_config=settings.PGVECTOR_FTS_CONFIG,
+                    candidates=top_k * settings.PGVECTOR_HYBRID_CANDIDATES,
+                    rrf_k=settings.PGVECTOR_RRF_K,
+                )
+            elif self.coarse_index != "none":
+                params["candidates"] = top_k * self.rerank_candidates
+                candidates_query = self._coarse_query(table, conditions)
+                return await self._fetch_reranked(
+                    conn, candidates_query, params, [query_vector], top_k
+                )
+            else:
+                final_query = self._vector_query(table, conditions)
+
+            return await self._fetch_chunks(conn, final_query, params)
+
+    async def search_many(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        query_texts: Optional[List[str]] = None,
+        options: Optional[SearchOptions] = None,
+    ) -> List[DocumentChunk]:
+        """
+        All query vectors in one statement: unnest() feeds each vector to a LATERAL
+        ANN subquery (one HNSW scan each) and DISTINCT ON keeps each chunk's best hit.
+        """
+        options = options or SearchOptions()
+        if options.mode == "hybrid" and query_texts:
+            # Fused rankings are per query text; run those concurrently instead.
+            return await super().search_many(
+                query_vectors, top_k, filters, query_texts, options
+            )
+
+        async with self._search_session(options, top_k, filters) as conn:
+            scope = await self._scope(conn, filters)
+            if scope is None:
+                return []
+            table, conditions, params = scope
+            params.update(
+                query_vectors=[np.asarray(v, dtype=np.float32) for v in query_vectors],
+                top_k=top_k,
+            )
+
+            if self.coarse_index != "none":
+                params["candidates"] = top_k * self.rerank_candidates
+                candidates_query = SQL("""
+                    SELECT DISTINCT ON (hit.id) hit.id, hit.text, hit.metadata, hit.embedding
+                    FROM unnest(%(query_vectors)s::vector[]) AS queries (query_vector)
+                    CROSS JOIN LATERAL ({coarse}) AS hit
+                """).format(
+                    coarse=self._coarse_query(
+                        table, conditions, SQL("queries.query_vector")
+                    )
+                )
+                return await self._fetch_reranked(
+                    conn, candidates_query, params, query_vectors, top_k
+                )
+
+            distance = self._distance(SQL("queries.query_vector"))
+            final_query = SQL("""
+                SELECT id, text, metadata, score
+                FROM (
+                    SELECT DISTINCT ON (hit.id) hit.id, hit.text, hit.metadata, hit.score
+                    FROM unnest(%(query_vectors)s::vector[]) AS queries (query_vector)
+                    CROSS JOIN LATERAL (
+                        SELECT id, text, metadata, {score} AS score
+                        FROM {table}
+                        {where}
+                        ORDER BY {distance}
+                        LIMIT %(top_k)s
+                    ) AS hit
+                    ORDER BY hit.id, hit.score DESC
+                ) AS unique_hits
+                ORDER BY score DESC
+            """).format(
+                table=table,
+                where=self._where(conditions),
+                score=self._score(distance),
+                distance=distance,
+            )
+
+            return await self._fetch_chunks(conn, final_query, params)
+
+    async def _fetch_chunks(
+        self,
+        conn: psycopg.AsyncConnection[Dict[str, Any]],
+        query: Composable,
+        params: Dict[str, Any],
+    ) -> List[DocumentChunk]:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(query, params)
+            rows = await cur.fetchall()
 
-        source_file = filters["source"].get("$eq")
-        if not source_file:
+            return [
+                DocumentChunk(
+                    id=str(row["id"]),
+                    text=str(row["text"]),
+                    metadata=row["metadata"],
+                    score=float(row["score"]),
+                )
+                for row in rows
+            ]
+
+    async def _fetch_reranked(
+        self,
+        conn: psycopg.AsyncConnection[Dict[str, Any]],
+        candidates_query: Composable,
+        params: Dict[str, Any],
+        query_vectors: List[List[float]],
+        top_k: int,
+    ) -> List[DocumentChunk]:
+        """Second stage: exact cosine rerank of the coarse candidates in NumPy."""
+        # Binary results: candidate vectors arrive as raw float4s, not text to parse
+        async with conn.cursor(row_factory=dict_row, binary=True) as cur:
+            await cur.execute(candidates_query, params)
+            rows = await cur.fetchall()
+
+        if not rows:
             return []
+        matrix = np.stack([row["embedding"].to_numpy() for row in rows])
+
+        return [
+            DocumentChunk(
+                id=str(rows[i]["id"]),
+                text=str(rows[i]["text"]),
+                metadata=rows[i]["metadata"],
+                score=score,
+            )
+            for i, score in cosine_rerank(query_vectors, matrix, top_k)
+        ]
+
+    @staticmethod
+    def _where(conditions: List[Composable]) -> Composable:
+        if not conditions:
+            return SQL("")
+        return SQL("WHERE ") + SQL(" AND ").join(conditions)
+
+    def _vector_query(
+        self, table: Identifier, conditions: List[Composable]
+    ) -> Composable:
+        distance = self._distance(SQL("%(query_vector)s::vector"))
+        return SQL("""
+            SELECT id, text, metadata, {score} AS score
+            FROM {table}
+            {where}
+            ORDER BY {distance}
+            LIMIT %(top_k)s
+        """).format(
+            table=table,
+            where=self._where(conditions),
+            score=self._score(distance),
+            distance=distance,
+        )
 
-        final_query = SQL("""
-            SELECT id, text, metadata, 1 - (embedding <=> %s::vector) AS score 
+    def _coarse_query(
+        self,
+        table: Identifier,
+        conditions: List[Composable],
+        query_vector: Optional[Composable] = None,
+    ) -> Composable:
+        """First stage: candidates off the compact index, with their full vectors."""
+        if query_vector is None:
+            query_vector = SQL("%(query_vector)s::vector")
+        return SQL("""
+            SELECT id, text, metadata, embedding::vector AS embedding
             FROM {table}
-            WHERE metadata->>'source' = %s
-            ORDER BY embedding <=> %s::vector 
-            LIMIT %s
-        """).format(table=Identifier(self.table_name))
-
-        params = [query_vector, source_file, query_vector, top_k]
-
-        async with await self._get_async_connection() as conn:
-            async with conn.cursor(row_factory=dict_row) as cur:
-                await cur.execute(final_query, params)
-                rows = await cur.fetchall()
-
-                return [
-                    DocumentChunk(
-                        id=str(row["id"]),
-                        text=str(row["text"]),
-                        metadata=row["metadata"],
-                        score=float(row["score"]),
-                    )
-                    for row in rows
-                ]
+            {where}
+            ORDER BY {distance}
+            LIMIT %(candidates)s
+        """).format(
+            table=table,
+            where=self._where(conditions),
+            distance=self._coarse_distance(query_vector),
+        )
+
+    def _hybrid_query(
+        self, table: Identifier, conditions: List[Composable]
+    ) -> Composable:
+        """
+        ANN and full-text rankings fused with reciprocal rank fusion, server-side,
+        in one statement. Query terms are OR-ed so a chunk matching "HS-01" alone
+        still ranks; ts_rank's length normalisation (flag 1) keeps long chunks
+        from winning on raw term counts, BM25-style.
+        """
+        distance = self._distance(SQL("%(query_vector)s::vector"))
+        nearest = SQL("""
+            SELECT id, {distance} AS distance
+            FROM {table}
+            {where}
+            ORDER BY {order_by}
+            LIMIT {limit}
+        """)
+        semantic = nearest.format(
+            distance=distance,
+            table=table,
+            where=self._where(conditions),
+            order_by=distance,
+            limit=SQL("%(candidates)s"),
+        )
+        if self.coarse_index != "none":
+            # Over-fetch from the compact index, then keep the exact nearest
+            semantic = nearest.format(
+                distance=SQL("distance"),
+                table=SQL("({coarse}) AS coarse").format(
+                    coarse=nearest.format(
+                        distance=distance,
+                        table=table,
+                        where=self._where(conditions),
+                        order_by=self._coarse_distance(SQL("%(query_vector)s::vector")),
+                        limit=SQL("%(candidates)s * {n}").format(
+                            n=Literal(self.rerank_candidates)
+                        ),
+                    )
+                ),
+                where=SQL(""),
+                order_by=SQL("distance"),
+                limit=SQL("%(candidates)s"),
+            )
+
+        return SQL("""
+            WITH semantic AS (
+                SELECT id, row_number() OVER (ORDER BY distance) AS rank
+                FROM ({semantic}) AS nearest
+            ),
+            keyword AS (
+                SELECT id, row_number() OVER (ORDER BY ts_rank(text_tsv, query, 1) DESC) AS rank
+                FROM {table}, (
+                    SELECT replace(
+                        plainto_tsquery(%(fts_config)s::regconfig, %(query_text)s)::text,
+                        ' & ', ' | '
+                    )::tsquery AS query
+                ) AS terms
+                {keyword_where}
+                ORDER BY ts_rank(text_tsv, query, 1) DESC
+                LIMIT %(candidates)s
+            ),
+            fused AS (
+                SELECT id,
+                       coalesce(1.0 / (%(rrf_k)s + semantic.rank), 0)
+                     + coalesce(1.0 / (%(rrf_k)s + keyword.rank), 0) AS score
+                FROM semantic FULL OUTER JOIN keyword USING (id)
+            )
+            SELECT chunks.id, chunks.text, chunks.metadata, fused.score
+            FROM fused JOIN {table} AS chunks USING (id)
+            ORDER BY fused.score DESC
+            LIMIT %(top_k)s
+        """).format(
+            semantic=semantic,
+            table=table,
+            keyword_where=self._where([*conditions, SQL("text_tsv @@ query")]),
+        )
@@ -0,0 +1,453 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import psycopg
+from psycopg.sql import SQL, Identifier, Literal
+
+from app.components.vector_dbs.pg_pool import get_async_pool
+from app.components.vector_dbs.pgvector_db import PGVectorDB
+from app.core.config import settings
+from app.core.interfaces import BaseVectorDB
+from app.models.domain import DocumentChunk, SearchOptions
+
+PLACEMENT_TABLE = "rag_source_shards"
+
+# (shard holding the source, shard it is being copied to during a move)
+Placement = Tuple[str, Optional[str]]
+
+# (directory DSN, table) -> (loaded at, source -> placement), shared by every instance
+_placements: Dict[Tuple[str, str], Tuple[float, Dict[str, Placement]]] = {}
+
+# (directory DSN, table) pairs whose placement table is known to exist
+_initialized_directories: Set[Tuple[str, str]] = set()
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ShardRing:
+    """
+    Consistent hashing: every shard owns PGVECTOR_SHARD_VNODES points on a 64-bit
+    ring and a source belongs to the first point clockwise from its hash. Adding a
+    shard only takes over ~1/N of the sources; the rest keep their owner.
+    """
+
+    def __init__(self, shards: Iterable[str], vnodes: int):
+        points = sorted(
+            (_ring_hash(f"{shard}#{i}"), shard)
+            for shard in shards
+            for i in range(vnodes)
+        )
+        if not points:
+            raise ValueError("The shard ring needs at least one non-draining shard")
+        self._hashes = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def owner(self, source: str) -> str:
+        i = bisect.bisect(self._hashes, _ring_hash(source)) % len(self._hashes)
+        return self._owners[i]
+
+
+class ShardedPGVectorDB(BaseVectorDB):
+    """
+    PGVectorDB spread over several Postgres instances (PGVECTOR_SHARDS), one
+    source per shard.
+
+    A source is placed on its ring owner the first time it is upserted and the
+    placement is recorded in `rag_source_shards` on DATABASE_URL, so changing the
+    shard list never silently re-routes existing data: rebalance() moves it.
+    Workers cache the directory for PGVECTOR_PLACEMENT_TTL seconds.
+
+    - single- or multi-source queries go only to the shards holding those sources
+    - global and $ne queries scatter to every shard concurrently; the per-shard
+      top_k lists are merged by score (hybrid RRF scores are per-shard ranks, so
+      there the merge is approximate)
+    """
+
+    def __init__(
+        self, table_name: Optional[str] = None, shards: Optional[Dict[str, str]] = None
+    ):
+        shards = shards or settings.PGVECTOR_SHARDS
+        if not shards:
+            raise ValueError("PGVECTOR_SHARDS is empty; use PGVectorDB instead")
+
+        self.shards: Dict[str, PGVectorDB] = {
+            name: PGVectorDB(
+                table_name,
+                db_url=dsn,
+                read_urls=settings.PGVECTOR_SHARD_READ_URLS.get(name, []),
+            )
+            for name, dsn in shards.items()
+        }
+        self.table_name = next(iter(self.shards.values())).table_name
+        self.ring = ShardRing(
+            (name for name in shards if name not in settings.PGVECTOR_DRAINING_SHARDS),
+            settings.PGVECTOR_SHARD_VNODES,
+        )
+
+        self.directory_url = settings.DATABASE_URL
+        self._directory_key = (self.directory_url, self.table_name)
+        if self._directory_key not in _initialized_directories:
+            self._init_directory()
+            _initialized_directories.add(self._directory_key)
+
+    def _init_directory(self):
+        """Sync init — only runs once at startup, fine to be blocking."""
+        with psycopg.connect(self.directory_url, autocommit=True) as conn:
+            conn.execute(
+                SQL("""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    table_name TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    shard TEXT NOT NULL,
+                    moving_to TEXT,
+                    PRIMARY KEY (table_name, source)
+                )
+            """).format(table=Identifier(PLACEMENT_TABLE))
+            )
+            cur = conn.execute(
+                SQL("SELECT DISTINCT shard FROM {table} WHERE table_name = %s").format(
+                    table=Identifier(PLACEMENT_TABLE)
+                ),
+                [self.table_name],
+            )
+            unknown = {row[0] for row in cur.fetchall()} - set(self.shards)
+            if unknown:
+                raise RuntimeError(
+                    f"Sources of '{self.table_name}' live on shards missing from "
+                    f"PGVECTOR_SHARDS: {sorted(unknown)}. List them in "
+                    "PGVECTOR_DRAINING_SHARDS and rebalance before removing them."
+                )
+
+    # -------------------------------------------------------------- directory
+
+    @asynccontextmanager
+    async def _directory(self) -> AsyncIterator[psycopg.AsyncConnection[Any]]:
+        pool = await get_async_pool(self.directory_url)
+        async with pool.connection() as conn:
+            yield conn
+
+    async def _placement_map(self, fresh: bool = False) -> Dict[str, Placement]:
+        cached = _placements.get(self._directory_key)
+        if (
+            not fresh
+            and cached is not None
+            and time.monotonic() - cached[0] < settings.PGVECTOR_PLACEMENT_TTL
+        ):
+            return cached[1]
+
+        async with self._directory() as conn:
+            cur = await conn.execute(
+                SQL(
+                    "SELECT source, shard, moving_to FROM {table} WHERE table_name = %s"
+                ).format(table=Identifier(PLACEMENT_TABLE)),
+                [self.table_name],
+            )
+            placements = {
+                row["source"]: (row["shard"], row["moving_to"])
+                for row in await cur.fetchall()
+            }
+        _placements[self._directory_key] = (time.monotonic(), placements)
+        return placements
+
+    async def _locate(self, sources: Iterable[str]) -> Dict[str, Placement]:
+        """Placements of `sources`, re-reading the directory once if any is unknown."""
+        sources = list(dict.fromkeys(sources))
+        placements = await self._placement_map()
+        if any(source not in placements for source in sources):
+            placements = await self._placement_map(fresh=True)
+        return {s: placements[s] for s in sources if s in placements}
+
+    async def _place(self, sources: Iterable[str]) -> Dict[str, Placement]:
+        """Like _locate, but first-seen sources are assigned to their ring owner."""
+        sources = list(dict.fromkeys(sources))
+        placements = await self._locate(sources)
+        new = [source for source in sources if source not in placements]
+        if not new:
+            return placements
+
+        async with self._directory() as conn, conn.cursor() as cur:
+            # Another worker may place the same source concurrently: first one wins
+            await cur.executemany(
+                SQL("""
+                INSERT INTO {table} (table_name, source, shard) VALUES (%s, %s, %s)
+                ON CONFLICT (table_name, source) DO NOTHING
+            """).format(table=Identifier(PLACEMENT_TABLE)),
+                [(self.table_name, source, self.ring.owner(source)) for source in new],
+            )
+        return await self._locate(sources)
+
+    async def _update_placement(
+        self, source: str, expected: str, shard: str, moving_to: Optional[str]
+    ) -> bool:
+        """Compare-and-set on the source's row; False if it changed or was deleted."""
+        async with self._directory() as conn:
+            cur = await conn.execute(
+                SQL("""
+                UPDATE {table} SET shard = %s, moving_to = %s
+                WHERE table_name = %s AND source = %s AND shard = %s
+            """).format(table=Identifier(PLACEMENT_TABLE)),
+                [shard, moving_to, self.table_name, source, expected],
+            )
+            updated = cur.rowcount == 1
+        _placements.pop(self._directory_key, None)
+        return updated
+
+    @staticmethod
+    def _write_targets(placement: Placement) -> List[str]:
+        """While a source moves, every write goes to both shards."""
+        shard, moving_to = placement
+        return [shard] if moving_to is None else [shard, moving_to]
+
+    # ----------------------------------------------------------------- writes
+
+    async def upsert(self, chunks: List[DocumentChunk], embeddings: List[List[float]]):
+        if len(chunks) != len(embeddings):
+            raise ValueError("Number of chunks and embeddings must match!")
+
+        by_source: Dict[str, List[int]] = {}
+        for i, chunk in enumerate(chunks):
+            by_source.setdefault(PGVectorDB._chunk_source(chunk), []).append(i)
+        placements = await self._place(by_source)
+
+        by_shard: Dict[str, List[int]] = {}
+        for source, rows in by_source.items():
+            for shard in self._write_targets(placements[source]):
+                by_shard.setdefault(shard, []).extend(rows)
+
+        await asyncio.gather(
+            *[
+                self.shards[shard].upsert(
+                    [chunks[i] for i in rows], [embeddings[i] for i in rows]
+                )
+                for shard, rows in by_shard.items()
+            ]
+        )
+
+    async def delete_source(self, source: str):
+        placement = (await self._locate([source])).get(source)
+        if placement is None:
+            return
+        await asyncio.gather(
+            *[
+                self.shards[s].delete_source(source)
+                for s in self._write_targets(placement)
+            ]
+        )
+        async with self._directory() as conn:
+            await conn.execute(
+                SQL("DELETE FROM {table} WHERE table_name = %s AND source = %s").format(
+                    table=Identifier(PLACEMENT_TABLE)
+                ),
+                [self.table_name, source],
+            )
+        _placements.pop(self._directory_key, None)
+
+    @asynccontextmanager
+    async def bulk_load(self) -> AsyncIterator[None]:
+        async with AsyncExitStack() as stack:
+            for shard in self.shards.values():
+                await stack.enter_async_context(shard.bulk_load())
+            yield
+
+    async def export_page(
+        self, cursor: Optional[str], limit: int
+    ) -> Tuple[List[DocumentChunk], np.ndarray, Optional[str]]:
+        """Shards one after another (by name); the cursor is [shard, shard cursor]."""
+        names = sorted(self.shards)
+        name, inner = json.loads(cursor) if cursor else (names[0], None)
+        chunks, vectors, inner = await self.shards[name].export_page(inner, limit)
+
+        if inner is not None:
+            return chunks, vectors, json.dumps([name, inner])
+        if name != names[-1]:
+            return chunks, vectors, json.dumps([names[names.index(name) + 1], None])
+        return chunks, vectors, None
+
+    # ----------------------------------------------------------------- search
+
+    def describe_retrieval(self, options: SearchOptions, top_k: int) -> Dict[str, Any]:
+        described = next(iter(self.shards.values())).describe_retrieval(options, top_k)
+        described["shards"] = len(self.shards)
+        return described
+
+    async def _route(
+        self, filters: Optional[Dict[str, Any]]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Shard -> filters to send it. Source lists are split by owning shard."""
+        operator, sources = PGVectorDB._source_filter(filters)
+        if operator != "$in":
+            return {name: filters for name in self.shards}
+
+        by_shard: Dict[str, List[str]] = {}
+        for source, (shard, _) in (await self._locate(sources)).items():
+            by_shard.setdefault(shard, []).append(source)
+        return {
+            shard: {**(filters or {}), "source": {"$in": shard_sources}}
+            for shard, shard_sources in by_shard.items()
+        }
+
+    async def search(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        query_text: Optional[str] = None,
+        options: Optional[SearchOptions] = None,
+    ) -> List[DocumentChunk]:
+        routes = await self._route(filters)
+        results = await asyncio.gather(
+            *[
+                self.shards[shard].search(
+                    query_vector, top_k, shard_filters, query_text, options
+                )
+                for shard, shard_filters in routes.items()
+            ]
+        )
+        return self.merge_results(list(results), top_k)
+
+    async def search_many(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        query_texts: Optional[List[str]] = None,
+        options: Optional[SearchOptions] = None,
+    ) -> List[DocumentChunk]:
+        """One search_many per shard; the union is capped at what one database returns."""
+        routes = await self._route(filters)
+        results = await asyncio.gather(
+            *[
+                self.shards[shard].search_many(
+                    query_vectors, top_k, shard_filters, query_texts, options
+                )
+                for shard, shard_filters in routes.items()
+            ]
+        )
+        return self.merge_results(list(results), top_k * len(query_vectors))
+
+    # -------------------------------------------------------------- rebalance
+
+    async def rebalance(
+        self, dry_run: bool = False, grace: Optional[float] = None
+    ) -> List[Tuple[str, str, str]]:
+        """
+        Moves every source that is not on its ring owner (new shards take over
+        their arc, draining shards are emptied). Returns (source, from, to) moves.
+        """
+        placements = await self._placement_map(fresh=True)
+        moves = [
+            (source, shard, self.ring.owner(source))
+            for source, (shard, _) in sorted(placements.items())
+            if shard != self.ring.owner(source)
+        ]
+        if not dry_run:
+            for source, _, target in moves:
+                await self.move_source(source, target, grace)
+        return moves
+
+    async def move_source(
+        self, source: str, target: str, grace: Optional[float] = None
+    ):
+        """
+        Online move of one source:
+          1. mark it moving -> workers write to both shards once their cache expires
+          2. stream its rows to the target (binary COPY), keeping rows dual-written
+          3. flip the placement -> reads go to the target after the next expiry
+          4. delete it from the old shard
+        `grace` (default 2 x PGVECTOR_PLACEMENT_TTL) must also cover the longest
+        upsert already in flight when the move starts.
+        """
+        grace = 2 * settings.PGVECTOR_PLACEMENT_TTL if grace is None else grace
+        placement = (await self._placement_map(fresh=True)).get(source)
+        if placement is None:
+            raise ValueError(f"Unknown source '{source}'")
+        current, stale_target = placement
+        if current == target:
+            return
+
+        start_time = time.perf_counter()
+        if not await self._update_placement(source, current, current, target):
+            raise RuntimeError(f"Placement of '{source}' changed during the move")
+        if stale_target not in (None, target):
+            # Leftover of an interrupted move to another shard
+            await self.shards[stale_target].delete_source(source)
+        await asyncio.sleep(grace)
+
+        copied = await self._copy_source(
+            source, self.shards[current], self.shards[target]
+        )
+
+        if not await self._update_placement(source, current, target, None):
+            # Deleted while we copied
+            await self.shards[target].delete_source(source)
+            return
+        await asyncio.sleep(grace)
+        await self.shards[current].delete_source(source)
+
+        print(
+            f"[PGShards] Moved '{source}' {current} -> {target} "
+            f"({copied} rows) in {time.perf_counter() - start_time:.2f}s"
+        )
+
+    async def _copy_source(self, source: str, src: PGVectorDB, dst: PGVectorDB) -> int:
+        """
+        Streams the source's rows from one shard to the other with binary COPY,
+        through a staging table. Rows already on the target were dual-written
+        during the move and are newer, so conflicts keep the target's version.
+        """
+        if src.partitioned:
+            columns = SQL("id, source, text, metadata, embedding")
+            source_column = SQL("source")
+        else:
+            columns = SQL("id, text, metadata, embedding")
+            source_column = SQL("metadata->>'source'")
+        table = Identifier(self.table_name)
+        staging = Identifier(f"{self.table_name}_rebalance")
+
+        async with src._connection() as src_conn, dst._connection() as dst_conn:
+            if dst.partitioned:
+                await dst._ensure_partitions(dst_conn, [source])
+
+            async with dst_conn.transaction():
+                await dst_conn.execute(
+                    SQL(
+                        "CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+                        "SELECT {columns} FROM {table} WITH NO DATA"
+                    ).format(staging=staging, columns=columns, table=table)
+                )
+                copy_out = SQL(
+                    "COPY (SELECT {columns} FROM {table} WHERE {column} = {source}) "
+                    "TO STDOUT (FORMAT BINARY)"
+                ).format(
+                    columns=columns,
+                    table=table,
+                    column=source_column,
+                    source=Literal(source),
+                )
+                copy_in = SQL(
+                    "COPY {staging} ({columns}) FROM STDIN (FORMAT BINARY)"
+                ).format(staging=staging, columns=columns)
+                async with (
+                    src_conn.cursor() as src_cur,
+                    dst_conn.cursor() as dst_cur,
+                    src_cur.copy(copy_out) as rows_out,
+                    dst_cur.copy(copy_in) as rows_in,
+                ):
+                    async for data in rows_out:
+                        await rows_in.write(data)
+
+                cur = await dst_conn.execute(
+                    SQL(
+                        "INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+                        "ON CONFLICT DO NOTHING"
+                    ).format(table=table, columns=columns, staging=staging)
+                )
+                return cur.rowcount
@@ -1,31 +1,94 @@
+import asyncio
+import hashlib
+import json
+import random
 import time
-from typing import Any, Dict, List, Optional, cast
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, cast
 
-from pinecone import ServerlessSpec, Vector
+import numpy as np
+from pinecone import ServerlessSpec, SparseValues, Vector
+from pinecone.grpc import GRPCIndex
 from pinecone.grpc import PineconeGRPC as Pinecone
 
+from app.components.vector_dbs.bm25 import get_bm25_encoder, weight_hybrid
+from app.components.vector_dbs.text_store import get_text_store
 from app.core.config import settings
 from app.core.interfaces import BaseVectorDB
-from app.models.domain import DocumentChunk
+from app.models.domain import DocumentChunk, SearchOptions
+
+# index name -> gRPC index handle, created (and the index provisioned) once per process
+# so requests share one channel instead of dialing Pinecone each time.
+_indexes: Dict[str, GRPCIndex] = {}
+
+NAMESPACE_PREFIX = "src-"
+
+# index name -> (monotonic time listed, source namespaces), so $ne and global searches
+# do not pay a describe_index_stats round trip each
+_namespaces: Dict[str, Tuple[float, Set[str]]] = {}
+
+# (dense vector, sparse vector, namespace, metadata filter) — one Pinecone query
+QueryRequest = Tuple[
+    List[float], Optional[SparseValues], Optional[str], Optional[Dict[str, Any]]
+]
+
+# Dedicated pool for blocking query calls, sized independently of asyncio's default.
+_query_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_query_pool() -> ThreadPoolExecutor:
+    global _query_pool
+    if _query_pool is None:
+        _query_pool = ThreadPoolExecutor(
+            max_workers=settings.PINECONE_QUERY_WORKERS,
+            thread_name_prefix="pinecone-query",
+        )
+    return _query_pool
+
+
+def shutdown_query_pool():
+    global _query_pool
+    if _query_pool is not None:
+        _query_pool.shutdown(wait=True)
+        _query_pool = None
+        print("[Pinecone] Query pool shut down.")
 
 
 class PineconeDB(BaseVectorDB):
     def __init__(self):
-        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
         self.index_name = settings.PINECONE_INDEX_NAME
-        self._initialize_index()
-        self.index = self.pc.Index(self.index_name)
+        if self.index_name not in _indexes:
+            self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+            self._initialize_index()
+            _indexes[self.index_name] = self.pc.Index(self.index_name)
+        self.index = _indexes[self.index_name]
+        self.namespaced = settings.PINECONE_NAMESPACE_BY_SOURCE
+        self.text_store = get_text_store()
+        self.sparse = get_bm25_encoder() if settings.PINECONE_SPARSE else None
 
     def _initialize_index(self):
-        existing_indexes = [i.name for i in self.pc.list_indexes()]
+        existing_indexes = {i.name: i for i in self.pc.list_indexes()}
+        # Sparse values are only accepted by dotproduct indexes. For normalized
+        # embeddings (OpenAI's are) dotproduct ranks exactly like cosine.
+        metric = "dotproduct" if settings.PINECONE_SPARSE else "cosine"
 
-        if self.index_name not in existing_indexes:
+        if self.index_name in existing_indexes:
+            existing_metric = existing_indexes[self.index_name].metric
+            if settings.PINECONE_SPARSE and existing_metric != "dotproduct":
+                raise ValueError(
+                    f"PINECONE_SPARSE needs a dotproduct index, but "
+                    f"'{self.index_name}' uses {existing_metric}. Point "
+                    f"PINECONE_INDEX_NAME at a new index and re-ingest."
+                )
+        else:
             spec = ServerlessSpec(cloud=settings.CLOUD, region=settings.REGION)
 
             self.pc.create_index(
                 name=self.index_name,
                 dimension=settings.EMBEDDING_DIMENSION,
-                metric="cosine",
+                metric=metric,
                 spec=spec,
             )
 
@@ -44,43 +107,414 @@ class PineconeDB(BaseVectorDB):
         if len(chunks) != len(embeddings):
             raise ValueError("Number of chunks and embeddings must match!")
 
-        vectors: List[Vector] = []
+        by_namespace: Dict[Optional[str], List[Vector]] = {}
+
+        term_counts: List[Counter] = []
+        sparse_vectors: List[Optional[SparseValues]] = [None] * len(chunks)
+        if self.sparse is not None:
+            # The BM25 statistics only take these chunks in once the upsert succeeds
+            term_counts = self.sparse.count_terms([chunk.text for chunk in chunks])
+            sparse_vectors = await self.sparse.encode_documents(term_counts)
 
-        for chunk, embedding in zip(chunks, embeddings):
+        for chunk, embedding, sparse_values in zip(chunks, embeddings, sparse_vectors):
             meta: dict[str, float | int | list[float] | list[int] | list[str] | str] = (
                 chunk.metadata.copy() if chunk.metadata else {}
             )
-            meta["text"] = chunk.text
+            if self.text_store is None:
+                meta["text"] = chunk.text
 
-            vectors.append(
+            namespace = (
+                self._namespace(str(chunk.metadata.get("source", "")))
+                if self.namespaced
+                else None
+            )
+            by_namespace.setdefault(namespace, []).append(
                 Vector(
                     id=chunk.id,
                     values=embedding,
                     metadata=meta,
+                    sparse_values=sparse_values,
                 )
             )
 
-        self.index.upsert(vectors=vectors)
+        start_time = time.perf_counter()
+        if self.text_store is not None:
+            # Texts land first, so a query can never return an id it cannot hydrate
+            await self.text_store.put_many(
+                [
+                    (chunk.id, str(chunk.metadata.get("source", "")), chunk.text)
+                    for chunk in chunks
+                ]
+            )
+
+        batches = [
+            (namespace, batch)
+            for namespace, vectors in by_namespace.items()
+            for batch in self._batches(vectors)
+        ]
+        semaphore = asyncio.Semaphore(settings.PINECONE_UPSERT_CONCURRENCY)
+
+        async def send(namespace: Optional[str], batch: List[Vector]):
+            async with semaphore:
+                await self._upsert_batch(batch, namespace)
+
+        await asyncio.gather(*[send(namespace, batch) for namespace, batch in batches])
+        if self.sparse is not None:
+            await self.sparse.add_documents(
+                [
+                    (chunk.id, str(chunk.metadata.get("source", "")), tf)
+                    for chunk, tf in zip(chunks, term_counts)
+                ]
+            )
+        cached = _namespaces.get(self.index_name)
+        if cached is not None:
+            cached[1].update(ns for ns in by_namespace if ns is not None)
+
+        duration = time.perf_counter() - start_time
+        print(
+            f"[Pinecone] Upserted {len(chunks)} vectors in {len(batches)} batches "
+            f"across {len(by_namespace)} namespace(s) in {duration:.2f}s "
+            f"({len(chunks) / max(duration, 1e-9):.0f} vectors/s)"
+        )
+
+    @staticmethod
+    def _namespace(source: str) -> str:
+        """Stable, charset-safe namespace for a source (file names, URLs, ...)."""
+        return NAMESPACE_PREFIX + hashlib.md5(source.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _batches(vectors: List[Vector]) -> Iterator[List[Vector]]:
+        """Splits vectors into requests under both the count and the byte limit."""
+        batch: List[Vector] = []
+        batch_bytes = 0
+
+        for vector in vectors:
+            # float32 values + uint32/float32 sparse pairs + id + metadata,
+            # plus a little protobuf framing
+            size = (
+                4 * len(vector.values)
+                + (8 * len(vector.sparse_values.indices) if vector.sparse_values else 0)
+                + len(vector.id.encode("utf-8"))
+                + len(json.dumps(vector.metadata or {}).encode("utf-8"))
+                + 64
+            )
+            if batch and (
+                len(batch) >= settings.PINECONE_UPSERT_BATCH_SIZE
+                or batch_bytes + size > settings.PINECONE_UPSERT_MAX_BYTES
+            ):
+                yield batch
+                batch, batch_bytes = [], 0
+
+            batch.append(vector)
+            batch_bytes += size
+
+        if batch:
+            yield batch
+
+    async def _upsert_batch(self, batch: List[Vector], namespace: Optional[str] = None):
+        """
+        One upsert request as a gRPC future awaited on the event loop. Upserts are
+        idempotent, so a failed batch is simply resent with exponential backoff.
+        """
+        for attempt in range(settings.PINECONE_UPSERT_RETRIES + 1):
+            try:
+                # Building the protobuf request is CPU work; keep it off the loop
+                future = await asyncio.to_thread(
+                    self.index.upsert,
+                    vectors=batch,
+                    namespace=namespace,
+                    async_req=True,
+                    show_progress=False,
+                )
+                await asyncio.wrap_future(future)
+                return
+            except (ValueError, TypeError):
+                raise  # Malformed vectors: retrying cannot help
+            except Exception as e:
+                if attempt == settings.PINECONE_UPSERT_RETRIES:
+                    raise
+                delay = 2**attempt * 0.5 + random.uniform(0, 0.25)
+                print(
+                    f"[Pinecone] Upsert of {len(batch)} vectors failed ({e}); "
+                    f"retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def delete_source(self, source: str):
+        if self.namespaced:
+            # The whole source is one namespace: drop it in a single call
+            request = partial(
+                self.index.delete, delete_all=True, namespace=self._namespace(source)
+            )
+        else:
+            request = partial(self.index.delete, filter={"source": {"$eq": source}})
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(get_query_pool(), request)
+        cached = _namespaces.get(self.index_name)
+        if cached is not None:
+            cached[1].discard(self._namespace(source))
+        if self.text_store is not None:
+            await self.text_store.delete_source(source)
+        if self.sparse is not None:
+            await self.sparse.delete_source(source)
+        print(f"[Pinecone] Deleted source '{source}'")
+
+    async def export_page(
+        self, cursor: Optional[str], limit: int
+    ) -> Tuple[List[DocumentChunk], np.ndarray, Optional[str]]:
+        """
+        One page of ids from list_paginated, then one fetch for their values. The
+        cursor is [namespace, pagination token]; namespaces are walked in order.
+        Texts come back from metadata or the side store.
+        """
+        loop = asyncio.get_running_loop()
+        namespaces = (
+            sorted(await self._source_namespaces()) if self.namespaced else [""]
+        )
+
+        namespace, token = json.loads(cursor) if cursor else (None, None)
+        pending = [ns for ns in namespaces if namespace is None or ns >= namespace]
+        for ns in pending:
+            listed = await loop.run_in_executor(
+                get_query_pool(),
+                partial(
+                    self.index.list_paginated,
+                    namespace=ns or None,
+                    limit=min(limit, 100),  # Pinecone's cap per list page
+                    pagination_token=token if ns == namespace else None,
+                ),
+            )
+            listed = cast(Any, listed)
+            ids = [item.id for item in listed.vectors or []]
+            next_token = listed.pagination.next if listed.pagination else None
+            if not ids and next_token is None:
+                continue
+
+            records: Dict[str, Any] = {}
+            if ids:  # a page can come back empty with more to follow
+                fetched = await loop.run_in_executor(
+                    get_query_pool(),
+                    partial(self.index.fetch, ids, namespace=ns or None),
+                )
+                records = cast(Any, fetched).vectors
+            chunks = []
+            for chunk_id in ids:
+                if chunk_id not in records:
+                    continue  # deleted between list and fetch
+                metadata = dict(records[chunk_id].metadata or {})
+                chunks.append(
+                    DocumentChunk(
+                        id=chunk_id,
+                        text=str(metadata.pop("text", "")),
+                        metadata=metadata,
+                    )
+                )
+            vectors = np.asarray(
+                [records[chunk.id].values for chunk in chunks], dtype=np.float32
+            ).reshape(len(chunks), settings.EMBEDDING_DIMENSION)
+
+            if next_token is not None:
+                next_cursor: Optional[str] = json.dumps([ns, next_token])
+            elif ns != pending[-1]:
+                next_cursor = json.dumps([pending[pending.index(ns) + 1], None])
+            else:
+                next_cursor = None
+            return await self._hydrate(chunks), vectors, next_cursor
+
+        return [], np.empty((0, settings.EMBEDDING_DIMENSION), dtype=np.float32), None
 
     async def search(
         self,
         query_vector: List[float],
         top_k: int,
         filters: Optional[Dict[str, Any]] = None,
+        query_text: Optional[str] = None,
+        options: Optional[SearchOptions] = None,
+    ) -> List[DocumentChunk]:
+        self._check_dimensions([query_vector])
+
+        # 1. Execute the query on the query pool; the event loop keeps serving
+        targets = await self._targets(filters)
+        [(dense, sparse)] = await self._hybrid_queries(
+            [query_vector], [query_text] if query_text else None, options
+        )
+        responses = await self._run_queries(
+            [(dense, sparse, namespace, where) for namespace, where in targets], top_k
+        )
+
+        print(f"[Pinecone Search]{' (sparse-dense)' if sparse else ''}")
+        return await self._hydrate(
+            self.merge_results([self._to_chunks(res) for res in responses], top_k)
+        )
+
+    async def search_many(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        query_texts: Optional[List[str]] = None,
+        options: Optional[SearchOptions] = None,
     ) -> List[DocumentChunk]:
-        if len(query_vector) != settings.EMBEDDING_DIMENSION:
-            raise ValueError(
-                f"Query vector size {len(query_vector)} does not match Index dimension {settings.EMBEDDING_DIMENSION}"
+        """
+        Query batching: a single pool task fires every (query, namespace) pair as a
+        gRPC future over the shared channel and waits for all of them, so a batch
+        costs one worker thread instead of one per query.
+        """
+        self._check_dimensions(query_vectors)
+
+        targets = await self._targets(filters)
+        if not targets:
+            return []
+        queries = await self._hybrid_queries(query_vectors, query_texts, options)
+        responses = await self._run_queries(
+            [
+                (dense, sparse, namespace, where)
+                for dense, sparse in queries
+                for namespace, where in targets
+            ],
+            top_k,
+        )
+
+        print(f"[Pinecone Search] Batch of {len(query_vectors)} queries")
+        per_query = [
+            self.merge_results(
+                [self._to_chunks(res) for res in responses[i : i + len(targets)]], top_k
+            )
+            for i in range(0, len(responses), len(targets))
+        ]
+        return await self._hydrate(self.merge_results(per_query))
+
+    async def _hybrid_queries(
+        self,
+        query_vectors: List[List[float]],
+        query_texts: Optional[List[str]],
+        options: Optional[SearchOptions],
+    ) -> List[Tuple[List[float], Optional[SparseValues]]]:
+        """
+        Hybrid mode adds a BM25 query vector to each dense one, weighted by the
+        request's alpha (PINECONE_HYBRID_ALPHA by default). Otherwise dense only.
+        """
+        options = options or SearchOptions()
+        if self.sparse is None or options.mode != "hybrid" or not query_texts:
+            return [(query_vector, None) for query_vector in query_vectors]
+
+        alpha = (
+            settings.PINECONE_HYBRID_ALPHA if options.alpha is None else options.alpha
+        )
+        sparse_vectors = await self.sparse.encode_queries(query_texts)
+        return [
+            weight_hybrid(query_vector, sparse, alpha)
+            for query_vector, sparse in zip(query_vectors, sparse_vectors)
+        ]
+
+    async def _hydrate(self, chunks: List[DocumentChunk]) -> List[DocumentChunk]:
+        """Fills in texts kept in the side store: one lookup for the final hits only."""
+        if self.text_store is None:
+            return chunks
+
+        missing = [chunk.id for chunk in chunks if not chunk.text]
+        if missing:
+            texts = await self.text_store.get_many(missing)
+            for chunk in chunks:
+                if not chunk.text:
+                    chunk.text = texts.get(chunk.id, "")
+        return chunks
+
+    @staticmethod
+    def _check_dimensions(query_vectors: List[List[float]]):
+        for query_vector in query_vectors:
+            if len(query_vector) != settings.EMBEDDING_DIMENSION:
+                raise ValueError(
+                    f"Query vector size {len(query_vector)} does not match Index dimension {settings.EMBEDDING_DIMENSION}"
+                )
+
+    async def _targets(
+        self, filters: Optional[Dict[str, Any]]
+    ) -> List[Tuple[Optional[str], Optional[Dict[str, Any]]]]:
+        """
+        (namespace, metadata filter) pairs a search must query. With one namespace
+        per source the source filter turns into namespace selection: $eq/$in hit
+        only those namespaces; $ne and global searches fan out over all of them.
+        """
+        if not self.namespaced:
+            return [(None, filters or None)]
+
+        source_filter = (filters or {}).get("source")
+        rest = {k: v for k, v in (filters or {}).items() if k != "source"} or None
+        if isinstance(source_filter, str):
+            source_filter = {"$eq": source_filter}
+
+        if source_filter and ("$eq" in source_filter or "$in" in source_filter):
+            # An empty $in matches nothing, so there is nothing to query
+            sources = (
+                source_filter["$in"]
+                if "$in" in source_filter
+                else [source_filter["$eq"]]
             )
+            return [(self._namespace(s), rest) for s in dict.fromkeys(sources)]
+
+        excluded = (
+            self._namespace(source_filter["$ne"])
+            if source_filter and "$ne" in source_filter
+            else None
+        )
+        return [
+            (namespace, rest)
+            for namespace in await self._source_namespaces()
+            if namespace != excluded
+        ]
+
+    async def _source_namespaces(self) -> Set[str]:
+        """
+        Per-source namespaces from describe_index_stats, reused for
+        PINECONE_NAMESPACE_CACHE_TTL. This worker's own upserts and deletes update
+        the cached set; other workers' show up once it expires.
+        """
+        cached = _namespaces.get(self.index_name)
+        now = time.monotonic()
+        ttl = settings.PINECONE_NAMESPACE_CACHE_TTL
+        if cached is not None and now - cached[0] < ttl:
+            return set(cached[1])
 
-        # 1. Execute the query
-        raw_res = self.index.query(
-            vector=query_vector,
-            top_k=top_k,
-            include_metadata=True,
-            filter=filters,
+        loop = asyncio.get_running_loop()
+        stats = await loop.run_in_executor(
+            get_query_pool(), self.index.describe_index_stats
         )
+        namespaces = {
+            ns
+            for ns in (cast(Any, stats).namespaces or {})
+            if ns.startswith(NAMESPACE_PREFIX)
+        }
+        _namespaces[self.index_name] = (now, namespaces)
+        return set(namespaces)
+
+    async def _run_queries(self, requests: List[QueryRequest], top_k: int) -> List[Any]:
+        if not requests:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            get_query_pool(), self._query_batch, requests, top_k
+        )
+
+    def _query_batch(self, requests: List[QueryRequest], top_k: int) -> List[Any]:
+        futures = [
+            self.index.query(
+                vector=query_vector,
+                sparse_vector=sparse_vector,
+                namespace=namespace,
+                top_k=top_k,
+                include_metadata=True,
+                filter=where,
+                async_req=True,
+                timeout=settings.PINECONE_QUERY_TIMEOUT,
+            )
+            for query_vector, sparse_vector, namespace, where in requests
+        ]
+        return [future.result() for future in futures]
 
+    @staticmethod
+    def _to_chunks(raw_res: Any) -> List[DocumentChunk]:
         res = cast(Any, raw_res)
 
         results = []
@@ -96,5 +530,4 @@ class PineconeDB(BaseVectorDB):
                     score=float(match.score) if match.score is not None else 0.0,
                 )
             )
-        print("[Pinecone Search]")
         return results
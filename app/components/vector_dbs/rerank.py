@@ -0,0 +1,32 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalises each row so dot products become cosine similarities."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def cosine_rerank(
+    query_vectors: Sequence[Sequence[float]] | np.ndarray,
+    candidates: np.ndarray,
+    top_k: int,
+) -> List[Tuple[int, float]]:
+    """
+    Exact cosine rerank of coarse-stage candidates. One (queries x candidates)
+    matmul scores everything; each query keeps its own top_k and the union is
+    returned as (candidate row, best score) pairs, best first.
+    """
+    if candidates.shape[0] == 0:
+        return []
+
+    queries = normalize_rows(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+    scores = queries @ normalize_rows(candidates.astype(np.float32, copy=False)).T
+
+    k = min(top_k, candidates.shape[0])
+    top_rows = np.unique(np.argpartition(-scores, k - 1, axis=1)[:, :k])
+    best = scores[:, top_rows].max(axis=0)
+    order = np.argsort(-best, kind="stable")
+    return [(int(top_rows[i]), float(best[i])) for i in order]
@@ -0,0 +1,213 @@
+import asyncio
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import psycopg
+from psycopg.sql import SQL, Identifier
+
+from app.components.vector_dbs.pg_pool import get_async_pool
+from app.core.config import settings
+from app.core.sqlite import open_sqlite
+
+TEXT_STORE_TABLE = "rag_chunk_texts"
+
+# (id, source, text)
+TextRow = Tuple[str, str, str]
+
+
+class ChunkTextStore(ABC):
+    """
+    Chunk texts kept outside the vector index, keyed by chunk id. Lookups go
+    through an in-process LRU so hot chunks skip the round trip entirely.
+    """
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+
+    async def put_many(self, rows: List[TextRow]):
+        if not rows:
+            return
+        await self._save(rows)
+        for chunk_id, _, text in rows:
+            self._remember(chunk_id, text)
+
+    async def get_many(self, ids: List[str]) -> Dict[str, str]:
+        """One batched lookup for every id the cache does not hold."""
+        found: Dict[str, str] = {}
+        missing: List[str] = []
+        for chunk_id in dict.fromkeys(ids):
+            if chunk_id in self._cache:
+                self._cache.move_to_end(chunk_id)
+                found[chunk_id] = self._cache[chunk_id]
+            else:
+                missing.append(chunk_id)
+
+        if missing:
+            loaded = await self._load(missing)
+            for chunk_id, text in loaded.items():
+                self._remember(chunk_id, text)
+            found.update(loaded)
+        return found
+
+    async def delete_source(self, source: str):
+        await self._delete_source(source)
+        # The cache is keyed by id only; deletes are rare, so start it cold
+        self._cache.clear()
+
+    def _remember(self, chunk_id: str, text: str):
+        if self.cache_size <= 0:
+            return
+        self._cache[chunk_id] = text
+        self._cache.move_to_end(chunk_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    @abstractmethod
+    async def _save(self, rows: List[TextRow]):
+        pass
+
+    @abstractmethod
+    async def _load(self, ids: List[str]) -> Dict[str, str]:
+        pass
+
+    @abstractmethod
+    async def _delete_source(self, source: str):
+        pass
+
+
+class SQLiteTextStore(ChunkTextStore):
+    """Single-file store next to the app; calls run in a worker thread."""
+
+    def __init__(self, path: str, cache_size: int):
+        super().__init__(cache_size)
+        self._lock, self._conn = open_sqlite(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {TEXT_STORE_TABLE} "
+                "(id TEXT PRIMARY KEY, source TEXT NOT NULL, text TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {TEXT_STORE_TABLE}_source_idx "
+                f"ON {TEXT_STORE_TABLE} (source)"
+            )
+
+    async def _save(self, rows: List[TextRow]):
+        def save():
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO {TEXT_STORE_TABLE} (id, source, text) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+
+        await asyncio.to_thread(save)
+
+    async def _load(self, ids: List[str]) -> Dict[str, str]:
+        def load() -> Dict[str, str]:
+            found: Dict[str, str] = {}
+            with self._lock:
+                # Stay under SQLite's bound-parameter limit
+                for i in range(0, len(ids), 500):
+                    batch = ids[i : i + 500]
+                    cur = self._conn.execute(
+                        f"SELECT id, text FROM {TEXT_STORE_TABLE} "
+                        f"WHERE id IN ({', '.join('?' * len(batch))})",
+                        batch,
+                    )
+                    found.update(cur.fetchall())
+            return found
+
+        return await asyncio.to_thread(load)
+
+    async def _delete_source(self, source: str):
+        def delete():
+            with self._lock, self._conn:
+                self._conn.execute(
+                    f"DELETE FROM {TEXT_STORE_TABLE} WHERE source = ?", [source]
+                )
+
+        await asyncio.to_thread(delete)
+
+
+class PostgresTextStore(ChunkTextStore):
+    """Shared store on DATABASE_URL, through the process-wide connection pool."""
+
+    def __init__(self, db_url: str, cache_size: int):
+        super().__init__(cache_size)
+        self.db_url = db_url
+        with psycopg.connect(db_url, autocommit=True) as conn:
+            conn.execute(
+                SQL("""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    text TEXT NOT NULL
+                )
+            """).format(table=Identifier(TEXT_STORE_TABLE))
+            )
+            conn.execute(
+                SQL("CREATE INDEX IF NOT EXISTS {idx} ON {table} (source)").format(
+                    idx=Identifier(f"{TEXT_STORE_TABLE}_source_idx"),
+                    table=Identifier(TEXT_STORE_TABLE),
+                )
+            )
+
+    async def _save(self, rows: List[TextRow]):
+        pool = await get_async_pool(self.db_url)
+        async with pool.connection() as conn, conn.cursor() as cur:
+            await cur.executemany(
+                SQL("""
+                INSERT INTO {table} (id, source, text) VALUES (%s, %s, %s)
+                ON CONFLICT (id) DO UPDATE
+                SET source = EXCLUDED.source, text = EXCLUDED.text
+            """).format(table=Identifier(TEXT_STORE_TABLE)),
+                rows,
+            )
+
+    async def _load(self, ids: List[str]) -> Dict[str, str]:
+        pool = await get_async_pool(self.db_url)
+        async with pool.connection() as conn:
+            cur = await conn.execute(
+                SQL("SELECT id, text FROM {table} WHERE id = ANY(%s)").format(
+                    table=Identifier(TEXT_STORE_TABLE)
+                ),
+                [ids],
+            )
+            return {row["id"]: row["text"] for row in await cur.fetchall()}
+
+    async def _delete_source(self, source: str):
+        pool = await get_async_pool(self.db_url)
+        async with pool.connection() as conn:
+            await conn.execute(
+                SQL("DELETE FROM {table} WHERE source = %s").format(
+                    table=Identifier(TEXT_STORE_TABLE)
+                ),
+                [source],
+            )
+
+
+# One store (and so one LRU) per process, shared by every PineconeDB instance.
+_text_store: Optional[ChunkTextStore] = None
+
+
+def get_text_store() -> Optional[ChunkTextStore]:
+    """The configured side store, or None when texts live in Pinecone metadata."""
+    global _text_store
+    if settings.PINECONE_TEXT_STORE == "metadata":
+        return None
+    if _text_store is None:
+        if settings.PINECONE_TEXT_STORE == "sqlite":
+            _text_store = SQLiteTextStore(
+                settings.PINECONE_TEXT_STORE_PATH, settings.PINECONE_TEXT_CACHE_SIZE
+            )
+        else:
+            _text_store = PostgresTextStore(
+                settings.DATABASE_URL, settings.PINECONE_TEXT_CACHE_SIZE
+            )
+        print(
+            f"[TextStore] Chunk texts stored in {settings.PINECONE_TEXT_STORE} "
+            f"(LRU: {settings.PINECONE_TEXT_CACHE_SIZE} chunks)"
+        )
+    return _text_store
@@ -1,27 +1,50 @@
+from functools import lru_cache
+
+from app.components.embedders.embedding_cache import with_embedding_cache
+from app.components.embedders.micro_batcher import with_micro_batching
 from app.components.embedders.openai_embedder import OpenAIEmbedder
+from app.components.embedders.scheduler import with_embedding_scheduler
 from app.components.llms.factory import get_llm_provider
-from app.components.vector_dbs.pgvector_db import PGVectorDB
-from app.components.vector_dbs.pinecone_db import PineconeDB
+from app.components.vector_dbs.factory import create_vector_db
 from app.core.config import settings
 from app.core.prompt_loader import load_prompt
 from app.services.ingestion import IngestionService
 from app.services.rag_engine import RAGEngine
 
-USE_LOCAL_DB: bool = settings.USE_LOCAL_DB
+VECTOR_DB: str = settings.ACTIVE_VECTOR_DB
 
 
 def get_db():
-    if USE_LOCAL_DB:
-        print("Using Local PGVector")
-        return PGVectorDB()
-    else:
-        print("Using Pinecone")
-        return PineconeDB()
+    return create_vector_db(VECTOR_DB)
+
+
+def get_embedder(task: str = "document"):
+    """Embedder for chunks, or for queries with task="query"."""
+    if settings.EMBEDDING_PROVIDER == "llamacpp":
+        from app.components.embedders.llamacpp_embedder import (
+            get_llamacpp_embedder,
+            with_task_prefix,
+        )
+
+        prefix = (
+            settings.LOCAL_EMBEDDING_QUERY_PREFIX
+            if task == "query"
+            else settings.LOCAL_EMBEDDING_DOCUMENT_PREFIX
+        )
+        return with_task_prefix(with_embedding_cache(get_llamacpp_embedder()), prefix)
+    # Cache hits never reach the scheduler, so they cost no quota
+    return with_embedding_cache(with_embedding_scheduler(OpenAIEmbedder(max_retries=0)))
+
+
+@lru_cache(maxsize=1)
+def get_query_embedder():
+    # One per process, so concurrent /query requests share its micro-batches
+    return with_micro_batching(get_embedder(task="query"))
 
 
 # --- Dependency Injection ---
 def get_ingestion_service() -> IngestionService:
-    return IngestionService(embedder=OpenAIEmbedder(), vector_db=get_db())
+    return IngestionService(embedder=get_embedder(), vector_db=get_db())
 
 
 llm_backend = get_llm_provider()
@@ -31,7 +54,7 @@ def get_rag_engine() -> RAGEngine:
     system_prompt = load_prompt(settings.SYSTEM_PROMPT_FILE)
     return RAGEngine(
         vector_db=get_db(),
-        embedder=OpenAIEmbedder(),
+        embedder=get_query_embedder(),
         llm=llm_backend,
         system_prompt=system_prompt,
     )
@@ -1,7 +1,11 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from app.models.domain import DocumentChunk
+import numpy as np
+
+from app.models.domain import DocumentChunk, SearchOptions
 
 
 class BaseEmbedder(ABC):
@@ -20,15 +24,98 @@ class BaseVectorDB(ABC):
         """Insert or update chunks and their corresponding vector embeddings."""
         pass
 
+    @abstractmethod
+    async def delete_source(self, source: str):
+        """Remove every chunk ingested under `source`."""
+        pass
+
     @abstractmethod
     async def search(
         self,
         query_vector: List[float],
         top_k: int,
         filters: Dict[str, Any] | None = None,
+        query_text: Optional[str] = None,
+        options: Optional[SearchOptions] = None,
+    ) -> List[DocumentChunk]:
+        """
+        Return the top_k chunks closest to query_vector. query_text is the raw
+        query, used by keyword-aware modes such as options.mode == "hybrid".
+        """
+        pass
+
+    async def search_many(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int,
+        filters: Dict[str, Any] | None = None,
+        query_texts: Optional[List[str]] = None,
+        options: Optional[SearchOptions] = None,
     ) -> List[DocumentChunk]:
+        """
+        Search several query vectors (e.g. translated queries) and return the union
+        of their top_k hits, de-duplicated by id, best score first. The default runs
+        the searches concurrently; backends override it to save round trips.
+        """
+        texts: List[Optional[str]] = list(query_texts or [None] * len(query_vectors))
+        results = await asyncio.gather(
+            *[
+                self.search(vector, top_k, filters, query_text=text, options=options)
+                for vector, text in zip(query_vectors, texts)
+            ]
+        )
+        return self.merge_results(results)
+
+    @asynccontextmanager
+    async def bulk_load(self) -> AsyncIterator[None]:
+        """
+        Wraps a large load: backends may suspend index maintenance inside the block
+        and rebuild once on exit. Searches keep working meanwhile. No-op by default.
+        """
+        yield
+
+    @abstractmethod
+    async def export_page(
+        self, cursor: Optional[str], limit: int
+    ) -> Tuple[List[DocumentChunk], np.ndarray, Optional[str]]:
+        """
+        Up to `limit` chunks and their float32 vectors, in a stable order, for
+        streaming exports. `cursor` is the opaque position returned by the previous
+        page (None to start from the beginning); None is returned after the last.
+        """
         pass
 
+    async def import_rows(
+        self, chunks: List[DocumentChunk], vectors: np.ndarray, batch_rows: int
+    ):
+        """
+        Upserts one part of an export (float32 `vectors`, one row per chunk). The
+        default sends upserts of up to `batch_rows` rows; backends that rewrite
+        files on every call override it to write the part at once.
+        """
+        for i in range(0, len(chunks), batch_rows):
+            batch = np.asarray(vectors[i : i + batch_rows])
+            embeddings = await asyncio.to_thread(batch.tolist)
+            await self.upsert(chunks[i : i + batch_rows], embeddings)
+
+    def describe_retrieval(self, options: SearchOptions, top_k: int) -> Dict[str, Any]:
+        """Effective retrieval settings for `options`, reported back to API clients."""
+        return {"mode": options.mode, "profile": options.profile, "top_k": top_k}
+
+    @staticmethod
+    def merge_results(
+        results: List[List[DocumentChunk]], top_k: Optional[int] = None
+    ) -> List[DocumentChunk]:
+        """Union of several result lists, keeping each chunk's best score."""
+        best: Dict[str, DocumentChunk] = {}
+        for chunk in (chunk for batch in results for chunk in batch):
+            current = best.get(chunk.id)
+            if current is None or (chunk.score or 0.0) > (current.score or 0.0):
+                best[chunk.id] = chunk
+
+        merged = sorted(best.values(), key=lambda c: c.score or 0.0, reverse=True)
+        return merged[:top_k] if top_k is not None else merged
+
 
 class BaseLLM(ABC):
     @abstractmethod
@@ -0,0 +1,19 @@
+import os
+import sqlite3
+import threading
+from typing import Tuple
+
+
+def open_sqlite(path: str) -> Tuple[threading.Lock, sqlite3.Connection]:
+    """
+    Opens a WAL-mode SQLite file for the local stores (embedding cache, chunk
+    texts, BM25 stats). The connection is shared by worker threads, so callers
+    run every statement under the returned lock: `with lock, conn:`.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock = threading.Lock()
+    conn = sqlite3.connect(path, check_same_thread=False)
+    with lock, conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+    return lock, conn
@@ -1,14 +1,28 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
 from app.components.query_translation import QueryTranslationStrategyType
+from app.models.domain import RetrievalProfile, SearchMode
 
 
 class IngestRequest(BaseModel):
     texts: List[str] = Field(..., description="List of text strings to ingest")
 
 
+class BulkIngestRequest(BaseModel):
+    documents: Dict[str, List[str]] = Field(
+        ..., description="Source name -> list of text strings to ingest under it"
+    )
+    bulk_load: bool = Field(
+        True,
+        description=(
+            "Suspend the vector index while rows load and rebuild it once at the end. "
+            "Searches stay available (as slower exact scans) during the rebuild."
+        ),
+    )
+
+
 class UrlIngestRequest(BaseModel):
     url: str = Field(..., description="URL of the website to scrape and ingest")
 
@@ -16,9 +30,15 @@ class UrlIngestRequest(BaseModel):
 class ChatRequest(BaseModel):
     message: str = Field(..., description="User question or message")
 
-    file_name: str = Field(
-        ...,
-        description="The EXACT file name to search within. Strictly required for query isolation.",
+    file_name: Optional[str] = Field(
+        None,
+        description="The EXACT file name to search within. Omit (with file_names) "
+        "to search the whole knowledge base.",
+    )
+    file_names: Optional[List[str]] = Field(
+        None,
+        description="Several EXACT file names to search within, in one request. "
+        "Combined with file_name when both are given.",
     )
 
     translation_strategy: Optional[QueryTranslationStrategyType] = Field(
@@ -27,3 +47,21 @@ class ChatRequest(BaseModel):
     prompt_name: Optional[str] = Field(
         None, description="Name of the system prompt to use"
     )
+    search_mode: Optional[SearchMode] = Field(
+        None,
+        description="'vector' or 'hybrid' (full-text + vector, fused with RRF; "
+        "BM25 sparse-dense on Pinecone). "
+        "Defaults to the server's SEARCH_MODE.",
+    )
+    retrieval_profile: Optional[RetrievalProfile] = Field(
+        None,
+        description="Recall/latency trade-off: 'fast', 'balanced' or 'exhaustive'. "
+        "Defaults to the server's RETRIEVAL_PROFILE.",
+    )
+    hybrid_alpha: Optional[float] = Field(
+        None,
+        ge=0,
+        le=1,
+        description="Pinecone hybrid search weight: 1 is dense only, 0 is BM25 only. "
+        "Defaults to the server's PINECONE_HYBRID_ALPHA.",
+    )
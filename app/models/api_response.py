@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -11,6 +11,10 @@ class QueryResponse(BaseModel):
     generated_queries: List[str] = Field(
         default_factory=list, description="List of queries generated for retrieval"
     )
+    retrieval: Dict[str, Any] = Field(
+        default_factory=dict,
+        description="Effective retrieval settings (search mode, profile, HNSW params)",
+    )
 
 
 class IngestResponse(BaseModel):
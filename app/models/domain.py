@@ -1,11 +1,23 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
+SearchMode = Literal["vector", "hybrid"]
+RetrievalProfile = Literal["fast", "balanced", "exhaustive"]
+
 
 class DocumentChunk(BaseModel):
     id: str
     text: str
     vector: Optional[List[float]] = None
     metadata: Dict = Field(default_factory=dict)
-    score: Optional[float] = None
\ No newline at end of file
+    score: Optional[float] = None
+
+
+class SearchOptions(BaseModel):
+    """Per-request retrieval knobs, passed through to the vector DB."""
+
+    mode: SearchMode = "vector"
+    profile: RetrievalProfile = "balanced"
+    # Pinecone sparse-dense weight: 1 = dense only, 0 = BM25 only (None = default)
+    alpha: Optional[float] = Field(None, ge=0, le=1)
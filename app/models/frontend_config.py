@@ -7,6 +7,7 @@ class FrontendConfig(BaseModel):
     APP_PORT: int
     DEBUG: bool
     USE_LOCAL_DB: bool
+    VECTOR_DB_PROVIDER: Literal["pgvector", "pinecone", "numpy"]
     
     # Provider Matrix
     LLM_PROVIDER: Literal["openai", "ollama", "llamacpp"]
@@ -33,6 +34,8 @@ class FrontendConfig(BaseModel):
     CHUNKING_STRATEGY: Literal["paragraph", "recursive", "semantic"]
     ENABLE_TABLE_PARSING: bool
     TOP_K: int
+    SEARCH_MODE: Literal["vector", "hybrid"]
+    RETRIEVAL_PROFILE: Literal["fast", "balanced", "exhaustive"]
     INDEX_NAME: str
     CLOUD: str
     REGION: str
@@ -1,8 +1,11 @@
+import asyncio
 import time
 import uuid
-from typing import List
+from contextlib import AsyncExitStack
+from typing import Dict, List, Tuple
 
 from app.components.chunking.factory import ChunkingFactory
+from app.components.embedders.batching import get_token_counter, pack_batches
 from app.components.embedders.langchain_wrapper import LangChainEmbeddingsWrapper
 from app.core.config import settings
 from app.core.interfaces import BaseEmbedder, BaseVectorDB
@@ -14,10 +17,68 @@ class IngestionService:
         self.embedder = embedder
         self.vector_db = vector_db
 
-    async def ingest_texts(self, texts: List[str], source_name: str):
+    async def ingest_texts(
+        self, texts: List[str], source_name: str, bulk_load: bool = False
+    ):
         start_time = time.time()
         print(f"[Start] Ingesting {len(texts)} texts from: {source_name}")
 
+        all_chunks, vectors = await self._chunk_and_embed(texts, source_name)
+        if not all_chunks:
+            return
+
+        # 3. Storage
+        print(f"Upserting to Vector DB{' (bulk load)' if bulk_load else ''}...")
+        async with AsyncExitStack() as stack:
+            if bulk_load:
+                await stack.enter_async_context(self.vector_db.bulk_load())
+            await self.vector_db.upsert(all_chunks, vectors)
+
+        duration = time.time() - start_time
+        print(f"Done Ingestion finished in {duration:.2f}s.")
+
+    async def ingest_sources(
+        self, documents: Dict[str, List[str]], bulk_load: bool = True
+    ):
+        """
+        Ingest many sources at once. Everything is chunked and embedded first, so
+        the vector index is only suspended for the storage phase, not for the
+        (much slower) embedding calls.
+        """
+        start_time = time.time()
+        print(f"[Start] Ingesting {len(documents)} sources")
+
+        prepared: List[Tuple[List[DocumentChunk], List[List[float]]]] = []
+        for source_name, texts in documents.items():
+            chunks, vectors = await self._chunk_and_embed(texts, source_name)
+            if chunks:
+                prepared.append((chunks, vectors))
+
+        total_rows = sum(len(chunks) for chunks, _ in prepared)
+        print(
+            f"Upserting {total_rows} chunks to Vector DB"
+            f"{' (bulk load)' if bulk_load else ''}..."
+        )
+        storage_start = time.time()
+        async with AsyncExitStack() as stack:
+            if bulk_load:
+                await stack.enter_async_context(self.vector_db.bulk_load())
+            for chunks, vectors in prepared:
+                await self.vector_db.upsert(chunks, vectors)
+
+        print(
+            f" ↳ Storage (incl. index build) took {time.time() - storage_start:.2f}s."
+        )
+        duration = time.time() - start_time
+        print(f"Done Ingestion of {len(prepared)} sources finished in {duration:.2f}s.")
+
+    async def delete_source(self, source_name: str):
+        print(f"[Start] Deleting every chunk of: {source_name}")
+        await self.vector_db.delete_source(source_name)
+
+    async def _chunk_and_embed(
+        self, texts: List[str], source_name: str
+    ) -> Tuple[List[DocumentChunk], List[List[float]]]:
         # 1. Chunking
         print(f"Chunking strategy: {settings.CHUNKING_STRATEGY}...")
 
@@ -27,7 +88,6 @@ class IngestionService:
         )
 
         all_chunks: List[DocumentChunk] = []
-        total_tokens = 0
 
         for text in texts:
             raw_chunks = chunker.chunk(text)
@@ -48,35 +108,39 @@ class IngestionService:
                     },
                 )
                 all_chunks.append(doc_chunk)
-                total_tokens += len(chunk_text.split())
 
         if not all_chunks:
             print("[Error] No chunks generated.")
-            return
+            return [], []
 
         print(f"Chunking complete. Total chunks: {len(all_chunks)}")
 
-        # 2. Embedding
-        print(f"Generating Embeddings (Batch Size: {settings.BATCH_SIZE})...")
-        vectors = []
-
+        # 2. Embedding: batches are packed by token budget (the counts come from
+        # the token-safe chunker) and submitted at once; the embedding scheduler
+        # decides how many are in flight, and gather keeps them in order
+        token_counts = get_token_counter().count([c.text for c in all_chunks])
+        ranges = pack_batches(
+            token_counts, settings.EMBEDDING_BATCH_TOKENS, settings.BATCH_SIZE
+        )
+        print(
+            f"Generating Embeddings: {sum(token_counts)} tokens in {len(ranges)} "
+            f"batches (max {settings.EMBEDDING_BATCH_TOKENS} tokens / "
+            f"{settings.BATCH_SIZE} chunks each)..."
+        )
         total = len(all_chunks)
-        for i in range(0, total, settings.BATCH_SIZE):
-            batch = all_chunks[i : i + settings.BATCH_SIZE]
-            batch_texts = [c.text for c in batch]
+        embedded = 0
 
-            batch_vectors = await self.embedder.embed_batch(batch_texts)
-            vectors.extend(batch_vectors)
+        async def embed(batch: List[DocumentChunk]) -> List[List[float]]:
+            nonlocal embedded
+            batch_vectors = await self.embedder.embed_batch([c.text for c in batch])
+            embedded += len(batch)
+            print(f" ↳ Embedded {embedded}/{total} chunks...")
+            return batch_vectors
 
-            print(
-                f" ↳ Embedded {min(i + settings.BATCH_SIZE, total)}/{total} chunks..."
-            )
+        batches = await asyncio.gather(
+            *(embed(all_chunks[start:end]) for start, end in ranges)
+        )
+        vectors = [vector for batch_vectors in batches for vector in batch_vectors]
 
         print(f"[Debug] Chunks count: {len(all_chunks)}, Vectors count: {len(vectors)}")
-
-        # 3. Storage
-        print("Upserting to Vector DB...")
-        await self.vector_db.upsert(all_chunks, vectors)
-
-        duration = time.time() - start_time
-        print(f"Done Ingestion finished in {duration:.2f}s.")
+        return all_chunks, vectors
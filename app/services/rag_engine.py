@@ -1,4 +1,3 @@
-import asyncio
 import time
 from typing import Dict, List, Optional
 
@@ -9,7 +8,12 @@ from app.components.query_translation import (
 )
 from app.core.config import settings
 from app.core.interfaces import BaseEmbedder, BaseVectorDB
-from app.models.domain import DocumentChunk
+from app.models.domain import (
+    DocumentChunk,
+    RetrievalProfile,
+    SearchMode,
+    SearchOptions,
+)
 
 
 class RAGEngine:
@@ -27,21 +31,33 @@ class RAGEngine:
 
     async def _embed_and_search(
         self,
-        query: str,
+        queries: List[str],
         filters: dict,
+        options: SearchOptions,
     ) -> List[DocumentChunk]:
-        """Embed a single query and search — designed to run concurrently."""
-        vector = await self.embedder.embed_text(query)
-        return await self.vector_db.search(
-            vector, top_k=settings.TOP_K, filters=filters
+        """Embed all queries in one call, then retrieve for all of them in one search."""
+        if len(queries) == 1:
+            vectors = [await self.embedder.embed_text(queries[0])]
+        else:
+            vectors = await self.embedder.embed_batch(queries)
+
+        return await self.vector_db.search_many(
+            vectors,
+            top_k=settings.TOP_K,
+            filters=filters,
+            query_texts=queries,
+            options=options,
         )
 
     async def answer_question(
         self,
         query: str,
-        file_filter: Optional[str] = None,
+        file_filter: Optional[str | List[str]] = None,
         translation_strategy: Optional[QueryTranslationStrategyType] = None,
         system_prompt: Optional[str] = None,
+        search_mode: Optional[SearchMode] = None,
+        retrieval_profile: Optional[RetrievalProfile] = None,
+        hybrid_alpha: Optional[float] = None,
     ) -> Dict:
         """
         Orchestrates: Translate -> Embed -> Retrieve -> Augment -> Generate
@@ -69,21 +85,32 @@ class RAGEngine:
 
         # 2. Construct Filter
         db_filters: dict = {}
-        if file_filter:
+        if isinstance(file_filter, list) and file_filter:
+            db_filters = {"source": {"$in": file_filter}}
+            print(f"Filter applied: searching in {len(file_filter)} files")
+        elif isinstance(file_filter, str) and file_filter:
             db_filters = {"source": {"$eq": file_filter}}
             print(f"Filter applied: searching only in '{file_filter}'")
+        else:
+            print("No filter applied: searching the whole knowledge base")
 
-        # 3. Embed + Search ALL queries concurrently ← key optimization
-        print("Retrieving context from Vector DB...")
-        results = await asyncio.gather(
-            *[self._embed_and_search(q, db_filters) for q in queries_to_embed]
+        # 3. Embed + Search ALL queries in one round trip ← key optimization
+        options = SearchOptions(
+            mode=search_mode or settings.SEARCH_MODE,
+            profile=retrieval_profile or settings.RETRIEVAL_PROFILE,
+            alpha=hybrid_alpha,
+        )
+        print(
+            f"Retrieving context from Vector DB "
+            f"({options.mode} search, {options.profile} profile)..."
+        )
+        # search_many returns the de-duplicated union, best score first
+        unique_chunks = await self._embed_and_search(
+            queries_to_embed, db_filters, options
         )
         print(f"[TIMER] Embed+Search:  {time.time() - start_time:.2f}s")
         start_time = time.time()
 
-        # Flatten + deduplicate
-        all_chunks = [chunk for batch in results for chunk in batch]
-        unique_chunks = list({chunk.id: chunk for chunk in all_chunks}.values())
         print(
             f"      ↳ Found {len(unique_chunks)} unique context chunks across all queries."
         )
@@ -116,4 +143,5 @@ class RAGEngine:
             "answer": answer.content if hasattr(answer, "content") else answer,
             "citations": [c.metadata for c in unique_chunks],
             "generated_queries": queries_to_embed,
+            "retrieval": self.vector_db.describe_retrieval(options, settings.TOP_K),
         }
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.interfaces import BaseVectorDB
+from app.models.domain import DocumentChunk
+
+MANIFEST = "manifest.json"
+EXPORT_FORMAT = 1
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)  # a crash leaves the old file or the new one
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_part(base: str) -> Tuple[List[DocumentChunk], np.ndarray]:
+    vectors = np.load(base + ".npy", mmap_mode="r")
+    with open(base + ".jsonl", "r", encoding="utf-8") as f:
+        chunks = [DocumentChunk(**json.loads(line)) for line in f]
+    return chunks, vectors
+
+
+class VectorTransferService:
+    """
+    Streams a collection to disk and back without re-embedding anything.
+
+    An export directory holds numbered parts — `part-NNNNN.npy` (float32 vectors)
+    and `part-NNNNN.jsonl` (one {id, text, metadata} line per row, same order) —
+    plus `manifest.json`, rewritten after every finished part with the backend
+    cursor to continue from. Memory stays at one part however large the
+    collection, and an interrupted export or import picks up at the first part
+    it had not finished. Exports are not snapshots: export a quiescent collection.
+    File reads and writes run in worker threads, off the event loop.
+    """
+
+    def __init__(self, vector_db: BaseVectorDB):
+        self.vector_db = vector_db
+
+    async def export_to(self, out_dir: str, part_rows: int, page_size: int) -> int:
+        os.makedirs(out_dir, exist_ok=True)
+        manifest_path = os.path.join(out_dir, MANIFEST)
+
+        if os.path.exists(manifest_path):
+            manifest = await asyncio.to_thread(_read_json, manifest_path)
+            if manifest["complete"]:
+                print(f"[Export] {out_dir} already holds a complete export")
+                return manifest["rows"]
+            print(
+                f"[Export] Resuming after {len(manifest['parts'])} parts "
+                f"({manifest['rows']} rows)"
+            )
+        else:
+            manifest = {
+                "format": EXPORT_FORMAT,
+                "source": self._collection(),
+                "dimension": settings.EMBEDDING_DIMENSION,
+                "parts": [],
+                "rows": 0,
+                "cursor": None,
+                "complete": False,
+            }
+
+        start_time = time.perf_counter()
+        exported = 0
+        cursor = manifest["cursor"]
+        chunks: List[DocumentChunk] = []
+        vectors: List[np.ndarray] = []
+        done = False
+
+        while not done:
+            page_chunks, page_vectors, cursor = await self.vector_db.export_page(
+                cursor, min(page_size, part_rows - len(chunks))
+            )
+            chunks.extend(page_chunks)
+            vectors.append(page_vectors)
+            done = cursor is None
+
+            if len(chunks) >= part_rows or (done and chunks):
+                matrix = np.concatenate(vectors)
+                await asyncio.to_thread(
+                    self._write_part, out_dir, manifest, chunks, matrix, cursor
+                )
+                exported += len(chunks)
+                print(f" ↳ Exported {manifest['rows']} rows...")
+                chunks, vectors = [], []
+
+        manifest["complete"] = True
+        await asyncio.to_thread(_write_json, manifest_path, manifest)
+        duration = time.perf_counter() - start_time
+        print(
+            f"[Export] {manifest['rows']} rows in {len(manifest['parts'])} parts "
+            f"({exported} this run, {exported / max(duration, 1e-9):.0f} rows/s)"
+        )
+        return manifest["rows"]
+
+    def _collection(self) -> str:
+        """e.g. "PGVectorDB:rag_vectors_512", to tell import targets apart."""
+        name = next(
+            getattr(self.vector_db, attr)
+            for attr in ("table_name", "index_name", "root")
+            if hasattr(self.vector_db, attr)
+        )
+        return f"{type(self.vector_db).__name__}:{name}"
+
+    @staticmethod
+    def _write_part(
+        out_dir: str,
+        manifest: Dict[str, Any],
+        chunks: List[DocumentChunk],
+        vectors: np.ndarray,
+        cursor: Any,
+    ):
+        name = f"part-{len(manifest['parts']):05d}"
+        base = os.path.join(out_dir, name)
+
+        with open(base + ".npy.tmp", "wb") as f:
+            np.save(f, vectors.astype(np.float32, copy=False))
+        with open(base + ".jsonl.tmp", "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                record = chunk.model_dump(include={"id", "text", "metadata"})
+                f.write(json.dumps(record) + "\n")
+        os.replace(base + ".npy.tmp", base + ".npy")
+        os.replace(base + ".jsonl.tmp", base + ".jsonl")
+
+        # The part only counts once the manifest names it
+        manifest["parts"].append({"name": name, "rows": len(chunks)})
+        manifest["rows"] += len(chunks)
+        manifest["cursor"] = cursor
+        _write_json(os.path.join(out_dir, MANIFEST), manifest)
+
+    async def import_from(
+        self, in_dir: str, batch_rows: int, bulk_load: bool = True
+    ) -> int:
+        """
+        Upserts every part through the backend's own write path (binary COPY,
+        concurrent gRPC batches, one segment write per part), inside bulk_load()
+        unless told otherwise. Finished parts are recorded in `import-state.json`;
+        upserts are idempotent, so a part cut short is simply loaded again.
+        """
+        manifest = await asyncio.to_thread(_read_json, os.path.join(in_dir, MANIFEST))
+        if not manifest["complete"]:
+            raise ValueError(f"{in_dir} holds an unfinished export; resume it first")
+        if manifest["dimension"] != settings.EMBEDDING_DIMENSION:
+            raise ValueError(
+                f"Export has {manifest['dimension']}-d vectors but "
+                f"EMBEDDING_DIMENSION={settings.EMBEDDING_DIMENSION}"
+            )
+
+        state_path = os.path.join(in_dir, "import-state.json")
+        target = self._collection()
+        state = (
+            await asyncio.to_thread(_read_json, state_path)
+            if os.path.exists(state_path)
+            else {}
+        )
+        finished = set(state.get(target, []))
+        pending = [part for part in manifest["parts"] if part["name"] not in finished]
+        if finished:
+            print(f"[Import] Skipping {len(finished)} parts already loaded")
+
+        start_time = time.perf_counter()
+        imported = 0
+        async with AsyncExitStack() as stack:
+            if bulk_load and pending:
+                await stack.enter_async_context(self.vector_db.bulk_load())
+
+            for part in pending:
+                base = os.path.join(in_dir, part["name"])
+                chunks, vectors = await asyncio.to_thread(_read_part, base)
+                await self.vector_db.import_rows(chunks, vectors, batch_rows)
+
+                imported += len(chunks)
+                finished.add(part["name"])
+                state[target] = sorted(finished)
+                await asyncio.to_thread(_write_json, state_path, state)
+                print(f" ↳ Imported {part['name']} ({imported} rows this run)")
+
+        duration = time.perf_counter() - start_time
+        print(
+            f"[Import] {imported} rows into {target} in {duration:.2f}s "
+            f"({imported / max(duration, 1e-9):.0f} rows/s)"
+        )
+        return imported
@@ -4,6 +4,7 @@ Module for the RAG Framework API.
 This module initializes the FastAPI application and includes the necessary routes.
 """
 
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
 import uvicorn
@@ -11,7 +12,27 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1.api import api_router
+from app.components.embedders.embedding_cache import get_embedding_cache
+from app.components.embedders.micro_batcher import MicroBatchingEmbedder
+from app.components.embedders.scheduler import get_embedding_scheduler
+from app.components.vector_dbs.pg_pool import close_async_pools
+from app.components.vector_dbs.pg_replicas import close_replica_sets
 from app.core.config import settings
+from app.core.dependencies import get_query_embedder
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Graceful shutdown: let in-flight queries finish and release DB connections
+    await close_replica_sets()
+    await close_async_pools()
+    if settings.ACTIVE_VECTOR_DB == "pinecone":
+        # Imported here so other backends never load the Pinecone client
+        from app.components.vector_dbs.pinecone_db import shutdown_query_pool
+
+        shutdown_query_pool()
+
 
 # Initialize FastAPI
 app = FastAPI(
@@ -19,6 +40,7 @@ app = FastAPI(
     description="Modular RAG engine",
     version="1.0.0",
     debug=settings.DEBUG,
+    lifespan=lifespan,
 )
 app.add_middleware(
     CORSMiddleware,
@@ -54,10 +76,20 @@ def health_check():
         },
         "models": {
             "llm_model": settings.LLM_PROVIDER,
-            "embedding_model": settings.EMBEDDING_MODEL,
+            "embedding_provider": settings.EMBEDDING_PROVIDER,
+            "embedding_model": settings.LOCAL_EMBEDDING_MODEL
+            if settings.EMBEDDING_PROVIDER == "llamacpp"
+            else settings.EMBEDDING_MODEL,
             "embedding_dimension": settings.EMBEDDING_DIMENSION,
             "local_model": settings.LOCAL_MODEL if settings.USE_LOCAL_DB else None,
         },
+        "embedding_cache": cache.stats() if (cache := get_embedding_cache()) else None,
+        "embedding_scheduler": get_embedding_scheduler().stats(),
+        # Only once a query built it: creating it here would load a local model
+        "query_micro_batching": query_embedder.stats()
+        if get_query_embedder.cache_info().currsize
+        and isinstance(query_embedder := get_query_embedder(), MicroBatchingEmbedder)
+        else None,
         "rag_settings": {
             "chunking_strategy": settings.CHUNKING_STRATEGY,
             "batch_size": settings.BATCH_SIZE,
@@ -65,12 +97,25 @@ def health_check():
             "table_parsing_enabled": settings.ENABLE_TABLE_PARSING,
         },
         "vector_db": {
-            "provider": "pgvector" if settings.USE_LOCAL_DB else "pinecone",
+            "provider": settings.ACTIVE_VECTOR_DB,
             "index_name": settings.PINECONE_INDEX_NAME
-            if not settings.USE_LOCAL_DB
+            if settings.ACTIVE_VECTOR_DB == "pinecone"
+            else None,
+            "cloud": settings.CLOUD
+            if settings.ACTIVE_VECTOR_DB == "pinecone"
+            else None,
+            "region": settings.REGION
+            if settings.ACTIVE_VECTOR_DB == "pinecone"
+            else None,
+            "store_dir": settings.NUMPY_STORE_DIR
+            if settings.ACTIVE_VECTOR_DB == "numpy"
+            else None,
+            "shards": sorted(settings.PGVECTOR_SHARDS)
+            if settings.ACTIVE_VECTOR_DB == "pgvector"
+            else None,
+            "read_replicas": len(settings.PGVECTOR_READ_URLS)
+            if settings.ACTIVE_VECTOR_DB == "pgvector"
             else None,
-            "cloud": settings.CLOUD if not settings.USE_LOCAL_DB else None,
-            "region": settings.REGION if not settings.USE_LOCAL_DB else None,
         },
     }
 
@@ -20,6 +20,12 @@ def reset_vector_table():
         conn.execute(
             SQL("DROP TABLE IF EXISTS {table}").format(table=Identifier(table_name))
         )
+        # Forget the recorded storage precision so the next start can pick a new one
+        registry = conn.execute("SELECT to_regclass('rag_vector_tables')").fetchone()
+        if registry and registry[0]:
+            conn.execute(
+                "DELETE FROM rag_vector_tables WHERE table_name = %s", [table_name]
+            )
 
         print("Table dropped. Restart your app to recreate it with new dimensions.")
 
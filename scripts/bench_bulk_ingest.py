@@ -0,0 +1,104 @@
+"""
+bench_bulk_ingest.py
+─────────────────────────────────────────────────────────────────────────────
+End-to-end load time of the two PGVectorDB ingest modes:
+
+  online   ──── upserts with the HNSW index live (every row updates the graph)
+  bulk     ──── bulk_load(): drop HNSW, upsert everything, rebuild once
+                with CREATE INDEX CONCURRENTLY
+
+Runs against a scratch table (rag_vectors_bench_{dim}) in DATABASE_URL so the
+real index is never touched; the table is dropped at the end:
+
+    python -m scripts.bench_bulk_ingest --rows 20000 --batch 1000
+─────────────────────────────────────────────────────────────────────────────
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from psycopg.sql import SQL, Identifier
+
+from app.components.vector_dbs.pg_pool import close_async_pools
+from app.components.vector_dbs.pgvector_db import REGISTRY_TABLE, PGVectorDB
+from app.core.config import settings
+from app.models.domain import DocumentChunk
+
+BENCH_SOURCE = "bench-bulk"
+
+
+def make_rows(n: int, dimension: int):
+    rng = np.random.default_rng(7)
+    chunks = [
+        DocumentChunk(
+            id=f"{BENCH_SOURCE}-{i}",
+            text=f"Synthetic bulk ingest chunk {i} " * 20,
+            metadata={"source": BENCH_SOURCE, "chunk_index": i},
+        )
+        for i in range(n)
+    ]
+    embeddings = rng.standard_normal((n, dimension), dtype=np.float32).tolist()
+    return chunks, embeddings
+
+
+async def load(db: PGVectorDB, chunks, embeddings, batch: int):
+    for i in range(0, len(chunks), batch):
+        await db.upsert(chunks[i : i + batch], embeddings[i : i + batch])
+
+
+async def time_mode(db: PGVectorDB, mode: str, rows: int, batch: int) -> float:
+    chunks, embeddings = make_rows(rows, db.dimension)
+    async with db._connection() as conn:
+        await conn.execute(
+            SQL("TRUNCATE {table}").format(table=Identifier(db.table_name))
+        )
+
+    start = time.perf_counter()
+    if mode == "bulk":
+        async with db.bulk_load():
+            await load(db, chunks, embeddings, batch)
+    else:
+        await load(db, chunks, embeddings, batch)
+    return time.perf_counter() - start
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = PGVectorDB(table_name=f"rag_vectors_bench_{settings.EMBEDDING_DIMENSION}")
+    print(
+        f"\nLoading {args.rows} rows in batches of {args.batch} into {db.table_name}\n"
+    )
+
+    results = {}
+    try:
+        for mode in ("online", "bulk"):
+            results[mode] = await time_mode(db, mode, args.rows, args.batch)
+
+        print()
+        for mode, duration in results.items():
+            print(f"  {mode:<8} {duration:8.2f}s   {args.rows / duration:10.0f} rows/s")
+        print(f"\n  speedup  {results['online'] / results['bulk']:8.2f}x")
+    finally:
+        async with db._connection() as conn:
+            await conn.execute(
+                SQL("DROP TABLE IF EXISTS {table}").format(
+                    table=Identifier(db.table_name)
+                )
+            )
+            await conn.execute(
+                SQL("DELETE FROM {registry} WHERE table_name = %s").format(
+                    registry=Identifier(REGISTRY_TABLE)
+                ),
+                [db.table_name],
+            )
+        await close_async_pools()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+"""
+bench_ivfpq.py
+─────────────────────────────────────────────────────────────────────────────
+Memory, recall@k and QPS of NumpyVectorDB's two search paths:
+
+  exact   ──── one matrix-vector product per segment over the mapped vectors
+  ivfpq   ──── nprobe inverted lists scored from 8-bit PQ codes (ADC), then an
+               exact rescore of top_k * NUMPY_IVF_REFINE candidates
+
+The store is filled in two steps: most rows before train_index(), the rest
+after it, so the numbers include rows encoded incrementally on upsert. Ground
+truth is a brute-force NumPy cosine scan; vectors are synthetic, clustered and
+with variance decaying across dimensions, so recall on real embeddings depends
+on the model. Runs in a temporary
+NUMPY_STORE_DIR, removed at the end:
+
+    python -m scripts.bench_ivfpq --rows 200000 --nlist 1024 --nprobes 2,4,8,16
+─────────────────────────────────────────────────────────────────────────────
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from app.components.vector_dbs.numpy_db import NumpyVectorDB
+from app.components.vector_dbs.rerank import normalize_rows
+from app.core.config import settings
+from app.models.domain import DocumentChunk
+
+BENCH_SOURCES = 8
+
+
+def make_vectors(rows: int, queries: int, dimension: int):
+    rng = np.random.default_rng(11)
+    decay = 1.0 / np.sqrt(1.0 + np.arange(dimension) / 32.0)
+    centers = rng.standard_normal((256, dimension)) * decay
+    data = centers[rng.integers(0, 256, rows)]
+    data += 0.6 * rng.standard_normal((rows, dimension)) * decay
+    picks = data[rng.integers(0, rows, queries)]
+    query_vectors = picks + 0.4 * rng.standard_normal((queries, dimension)) * decay
+    return data.astype(np.float32), query_vectors.astype(np.float32)
+
+
+def exact_top_k(data: np.ndarray, query_vectors: np.ndarray, top_k: int):
+    data = normalize_rows(data)
+    truth = []
+    for q in normalize_rows(query_vectors):
+        scores = data @ q
+        truth.append(set(np.argpartition(-scores, top_k - 1)[:top_k].tolist()))
+    return truth
+
+
+async def load(db: NumpyVectorDB, data: np.ndarray, start: int, stop: int):
+    for source in range(BENCH_SOURCES):
+        rows = range(start + source, stop, BENCH_SOURCES)
+        chunks = [
+            DocumentChunk(
+                id=f"bench-{i}",
+                text=f"Synthetic chunk {i}",
+                metadata={"source": f"bench-{source}"},
+            )
+            for i in rows
+        ]
+        if chunks:
+            await db.upsert(chunks, data[list(rows)].tolist())
+
+
+async def run(db: NumpyVectorDB, query_vectors, truth, top_k: int):
+    for q in query_vectors[:5]:  # page the maps in
+        await db.search(q.tolist(), top_k)
+
+    recalls: List[float] = []
+    start = time.perf_counter()
+    for q, expected in zip(query_vectors, truth):
+        hits = await db.search(q.tolist(), top_k)
+        found = {int(hit.id.rsplit("-", 1)[1]) for hit in hits}
+        recalls.append(len(found & expected) / top_k)
+    qps = len(query_vectors) / (time.perf_counter() - start)
+    return float(np.mean(recalls)), qps
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=settings.NUMPY_IVF_NLIST)
+    parser.add_argument("--m", type=int, default=settings.NUMPY_IVF_PQ_M)
+    parser.add_argument("--nprobes", default="2,4,8,16,32")
+    parser.add_argument("--refine", type=int, default=settings.NUMPY_IVF_REFINE)
+    parser.add_argument(
+        "--incremental",
+        type=float,
+        default=0.2,
+        help="share of rows added after training",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        settings.NUMPY_STORE_DIR = store_dir
+        settings.NUMPY_INDEX = "exact"
+        db = NumpyVectorDB()
+
+        data, query_vectors = make_vectors(args.rows, args.queries, db.dimension)
+        truth = exact_top_k(data, query_vectors, args.top_k)
+
+        trained_rows = int(args.rows * (1 - args.incremental))
+        print(f"\nLoading {trained_rows} rows into {BENCH_SOURCES} sources...")
+        await load(db, data, 0, trained_rows)
+        await db.train_index(nlist=args.nlist, m=args.m)
+        print(f"Loading {args.rows - trained_rows} more rows (encoded on upsert)...")
+        await load(db, data, trained_rows, args.rows)
+
+        footprint = db.index_footprint()
+        print(
+            f"\n  vectors ({db.dtype.name}) {footprint['vectors'] / 2**20:10.1f} MiB"
+            f"\n  ivfpq codes + lists     {footprint['ivfpq'] / 2**20:10.1f} MiB"
+            f"  ({footprint['vectors'] / footprint['ivfpq']:.1f}x smaller)"
+        )
+
+        print(f"\n{'path':<26} {'recall@' + str(args.top_k):>10} {'QPS':>9}")
+        recall, qps = await run(db, query_vectors, truth, args.top_k)
+        print(f"{'exact':<26} {recall:10.3f} {qps:9.1f}")
+
+        settings.NUMPY_INDEX = "ivfpq"
+        for refine in dict.fromkeys([0, args.refine]):
+            settings.NUMPY_IVF_REFINE = refine
+            for nprobe in (int(n) for n in args.nprobes.split(",")):
+                settings.NUMPY_IVF_NPROBE = nprobe
+                recall, qps = await run(db, query_vectors, truth, args.top_k)
+                label = f"ivfpq nprobe={nprobe} refine x{refine}"
+                print(f"{label:<26} {recall:10.3f} {qps:9.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+bench_local_embedder.py
+─────────────────────────────────────────────────────────────────────────────
+Chunks/sec of LlamaCppEmbedder on this machine's CPU, for each thread count
+and embed_batch size:
+
+  load      ──── the GGUF is loaded once per thread count (LOCAL_EMBEDDING_MODEL
+                 from MODELS_DIR unless --model is given)
+  embed     ──── --chunks synthetic chunks of about --words words each, sent in
+                 batches of --batch-sizes after one warm-up batch
+
+Chunk text is generated prose, so throughput on real documents depends on
+their token counts; --words 150 is close to a recursive-chunker chunk.
+
+    python -m scripts.bench_local_embedder --threads 4,8 --batch-sizes 8,32
+─────────────────────────────────────────────────────────────────────────────
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import List
+
+import numpy as np
+
+from app.components.embedders.llamacpp_embedder import LlamaCppEmbedder
+from app.core.config import settings
+
+WORDS = [
+    "revenue",
+    "margin",
+    "quarter",
+    "growth",
+    "customer",
+    "contract",
+    "liability",
+    "asset",
+    "segment",
+    "operating",
+    "income",
+    "forecast",
+    "risk",
+    "capital",
+    "table",
+    "report",
+    "statement",
+    "cash",
+    "flow",
+    "memory",
+    "cache",
+    "latency",
+    "throughput",
+    "vector",
+    "index",
+    "query",
+    "retrieval",
+    "document",
+]
+
+
+def make_chunks(count: int, words: int) -> List[str]:
+    rng = np.random.default_rng(5)
+    return [" ".join(rng.choice(WORDS, words)) + f" ({i})" for i in range(count)]
+
+
+async def run(embedder: LlamaCppEmbedder, chunks: List[str], batch_size: int):
+    await embedder.embed_batch(chunks[:batch_size])  # warm-up
+
+    start = time.perf_counter()
+    for i in range(0, len(chunks), batch_size):
+        await embedder.embed_batch(chunks[i : i + batch_size])
+    return len(chunks) / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=settings.LOCAL_EMBEDDING_MODEL)
+    parser.add_argument("--chunks", type=int, default=256)
+    parser.add_argument("--words", type=int, default=150)
+    parser.add_argument("--threads", default=str(os.cpu_count() or 1))
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks, args.words)
+    print(f"\n{args.chunks} chunks of ~{args.words} words, model {args.model}")
+    print(f"\n{'threads':>8} {'batch':>6} {'chunks/s':>10}")
+    for threads in (int(n) for n in args.threads.split(",")):
+        embedder = LlamaCppEmbedder(
+            args.model,
+            n_ctx=settings.LOCAL_EMBEDDING_N_CTX,
+            n_threads=threads,
+            truncate=settings.LOCAL_EMBEDDING_MATRYOSHKA,
+            layer_norm=settings.LOCAL_EMBEDDING_LAYER_NORM,
+        )
+        for batch_size in (int(n) for n in args.batch_sizes.split(",")):
+            rate = await run(embedder, chunks, batch_size)
+            print(f"{threads:>8} {batch_size:>6} {rate:10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+bench_pgvector_upsert.py
+─────────────────────────────────────────────────────────────────────────────
+Races the two PGVectorDB write paths against each other:
+
+  executemany   ──── INSERT ... ON CONFLICT per row (small batches)
+  binary COPY   ──── COPY FROM STDIN (FORMAT BINARY) into a staging table,
+                     merged with one INSERT ... SELECT ON CONFLICT
+
+Rows are synthetic and tagged with source "bench-upsert"; they are deleted at
+the end. Run from the repo root against the DB in DATABASE_URL:
+
+    python -m scripts.bench_pgvector_upsert --rows 5000
+─────────────────────────────────────────────────────────────────────────────
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from psycopg.sql import SQL, Identifier
+
+from app.components.vector_dbs.pg_pool import close_async_pools
+from app.components.vector_dbs.pgvector_db import PGVectorDB
+from app.models.domain import DocumentChunk
+
+BENCH_SOURCE = "bench-upsert"
+
+
+def make_rows(n: int, dimension: int, tag: str):
+    rng = np.random.default_rng(42)
+    chunks = [
+        DocumentChunk(
+            id=f"{BENCH_SOURCE}-{tag}-{i}",
+            text=f"Synthetic benchmark chunk {i} " * 20,
+            metadata={"source": BENCH_SOURCE, "chunk_index": i},
+        )
+        for i in range(n)
+    ]
+    embeddings = rng.standard_normal((n, dimension), dtype=np.float32).tolist()
+    return chunks, embeddings
+
+
+async def time_path(db: PGVectorDB, path: str, rows: int) -> float:
+    chunks, embeddings = make_rows(rows, db.dimension, path)
+    writer = db._copy_upsert if path == "copy" else db._executemany_upsert
+
+    async with db._connection() as conn:
+        start = time.perf_counter()
+        await writer(conn, chunks, embeddings)
+        return time.perf_counter() - start
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    db = PGVectorDB()
+    print(f"\nUpserting {args.rows} rows into {db.table_name}\n")
+
+    try:
+        for path in ("executemany", "copy"):
+            duration = await time_path(db, path, args.rows)
+            print(
+                f"  {path:<12} {duration:8.2f}s   {args.rows / duration:10.0f} rows/s"
+            )
+    finally:
+        async with db._connection() as conn:
+            await conn.execute(
+                SQL("DELETE FROM {table} WHERE metadata->>'source' = %s").format(
+                    table=Identifier(db.table_name)
+                ),
+                [BENCH_SOURCE],
+            )
+        await close_async_pools()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
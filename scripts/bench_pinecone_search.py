@@ -0,0 +1,97 @@
+"""
+bench_pinecone_search.py
+─────────────────────────────────────────────────────────────────────────────
+Throughput of PineconeDB at N concurrent /query-style requests, each searching
+Q translated query vectors:
+
+  blocking  ──── index.query() called inline in the coroutine (the old path:
+                 every request in the worker queues behind the one running)
+  pool      ──── one search() per vector on the dedicated query pool
+  batched   ──── search_many(): all Q vectors as gRPC futures in one pool task
+
+Needs PINECONE_API_KEY and uses PINECONE_INDEX_NAME; query vectors are random,
+so result quality is irrelevant here:
+
+    python -m scripts.bench_pinecone_search --concurrency 50 --queries-per-request 3
+─────────────────────────────────────────────────────────────────────────────
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+import numpy as np
+
+from app.components.vector_dbs.pinecone_db import PineconeDB, shutdown_query_pool
+from app.core.config import settings
+from app.core.interfaces import BaseVectorDB
+
+
+async def blocking_request(db: PineconeDB, vectors: List[List[float]], top_k: int):
+    for vector in vectors:
+        db.index.query(vector=vector, top_k=top_k, include_metadata=True)
+
+
+async def pool_request(db: PineconeDB, vectors: List[List[float]], top_k: int):
+    await BaseVectorDB.search_many(db, vectors, top_k)
+
+
+async def batched_request(db: PineconeDB, vectors: List[List[float]], top_k: int):
+    await db.search_many(vectors, top_k)
+
+
+MODES = {"blocking": blocking_request, "pool": pool_request, "batched": batched_request}
+
+
+async def run_mode(db: PineconeDB, mode: str, requests, top_k: int):
+    handler = MODES[mode]
+    latencies: List[float] = []
+
+    async def timed(vectors):
+        start = time.perf_counter()
+        await handler(db, vectors, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[timed(vectors) for vectors in requests])
+    wall = time.perf_counter() - start
+    return wall, np.percentile(latencies, [50, 95])
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--queries-per-request", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=settings.TOP_K)
+    args = parser.parse_args()
+
+    db = PineconeDB()
+    rng = np.random.default_rng(3)
+    requests = [
+        rng.standard_normal(
+            (args.queries_per_request, settings.EMBEDDING_DIMENSION)
+        ).tolist()
+        for _ in range(args.concurrency)
+    ]
+
+    await run_mode(db, "batched", requests[:2], args.top_k)  # warm the channel
+    print(
+        f"\n{args.concurrency} concurrent requests x {args.queries_per_request} "
+        f"queries against '{settings.PINECONE_INDEX_NAME}' "
+        f"(query pool: {settings.PINECONE_QUERY_WORKERS} workers)\n"
+    )
+    print(f"{'mode':<10} {'wall s':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9}")
+    try:
+        for mode in MODES:
+            wall, (p50, p95) = await run_mode(db, mode, requests, args.top_k)
+            print(
+                f"{mode:<10} {wall:8.2f} {args.concurrency / wall:8.1f} "
+                f"{p50:9.1f} {p95:9.1f}"
+            )
+    finally:
+        shutdown_query_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""
+bench_two_stage.py
+─────────────────────────────────────────────────────────────────────────────
+Recall@k and latency of PGVectorDB's two retrieval paths:
+
+  single-stage  ──── ORDER BY embedding <=> q over the full-precision HNSW
+  two-stage     ──── ANN over the compact expression index (binary / reduced),
+                     top_k * N candidates, exact NumPy cosine rerank
+
+Ground truth is a brute-force NumPy cosine scan. Vectors are synthetic and
+clustered, with variance decaying across dimensions like a Matryoshka-trained
+model; recall on real embeddings depends on the model. Runs on a scratch
+table (rag_vectors_bench_{dim}) in DATABASE_URL, dropped at the end:
+
+    python -m scripts.bench_two_stage --rows 20000 --coarse reduced
+    python -m scripts.bench_two_stage --coarse binary     # pgvector >= 0.7.0
+─────────────────────────────────────────────────────────────────────────────
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+import numpy as np
+from psycopg.sql import SQL, Identifier
+
+from app.components.vector_dbs.pg_pool import close_async_pools
+from app.components.vector_dbs.pgvector_db import REGISTRY_TABLE, PGVectorDB
+from app.components.vector_dbs.rerank import normalize_rows
+from app.core.config import settings
+from app.models.domain import DocumentChunk
+
+BENCH_SOURCE = "bench-two-stage"
+
+
+def make_vectors(rows: int, queries: int, dimension: int):
+    rng = np.random.default_rng(11)
+    decay = 1.0 / np.sqrt(1.0 + np.arange(dimension) / 32.0)
+    centers = rng.standard_normal((64, dimension)) * decay
+    data = centers[rng.integers(0, 64, rows)]
+    data += 0.6 * rng.standard_normal((rows, dimension)) * decay
+    picks = data[rng.integers(0, rows, queries)]
+    query_vectors = picks + 0.4 * rng.standard_normal((queries, dimension)) * decay
+    return data.astype(np.float32), query_vectors.astype(np.float32)
+
+
+def exact_top_k(data: np.ndarray, query_vectors: np.ndarray, top_k: int):
+    scores = normalize_rows(query_vectors) @ normalize_rows(data).T
+    return [set(np.argsort(-row)[:top_k].tolist()) for row in scores]
+
+
+async def run(db: PGVectorDB, query_vectors, truth, top_k: int):
+    for q in query_vectors[:5]:  # warm the pool and the index pages
+        await db.search(q.tolist(), top_k)
+
+    latencies: List[float] = []
+    recalls: List[float] = []
+    for q, expected in zip(query_vectors, truth):
+        start = time.perf_counter()
+        hits = await db.search(q.tolist(), top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {int(hit.id.rsplit("-", 1)[1]) for hit in hits}
+        recalls.append(len(found & expected) / top_k)
+    return float(np.mean(recalls)), np.percentile(latencies, [50, 95])
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--coarse", choices=["binary", "reduced"], default="reduced")
+    parser.add_argument("--coarse-dimension", type=int, default=128)
+    parser.add_argument("--multipliers", default="1,2,4,8")
+    args = parser.parse_args()
+
+    table = f"rag_vectors_bench_{settings.EMBEDDING_DIMENSION}"
+    settings.PGVECTOR_COARSE_INDEX = "none"
+    single = PGVectorDB(table_name=table)
+
+    data, query_vectors = make_vectors(args.rows, args.queries, single.dimension)
+    truth = exact_top_k(data, query_vectors, args.top_k)
+
+    try:
+        print(f"\nLoading {args.rows} rows into {table}...")
+        chunks = [
+            DocumentChunk(
+                id=f"{BENCH_SOURCE}-{i}",
+                text=f"Synthetic chunk {i}",
+                metadata={"source": BENCH_SOURCE},
+            )
+            for i in range(args.rows)
+        ]
+        async with single.bulk_load():
+            for i in range(0, args.rows, 2000):
+                await single.upsert(chunks[i : i + 2000], data[i : i + 2000].tolist())
+
+        # Same table, second instance that adds (and searches) the compact index
+        settings.PGVECTOR_COARSE_INDEX = args.coarse
+        settings.PGVECTOR_COARSE_DIMENSION = args.coarse_dimension
+        two_stage = PGVectorDB(table_name=table)
+        two_stage._init_db()
+
+        async with single._connection() as conn:
+            cur = await conn.execute(
+                """
+                SELECT c.relname AS index, pg_size_pretty(pg_relation_size(c.oid)) AS size
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                JOIN pg_am am ON am.oid = c.relam
+                WHERE i.indrelid = to_regclass(%s) AND am.amname = 'hnsw'
+                """,
+                [table],
+            )
+            print()
+            for row in await cur.fetchall():
+                print(f"  {row['index']:<44} {row['size']:>10}")
+
+        print(
+            f"\n{'path':<28} {'recall@' + str(args.top_k):>10} {'p50 ms':>9} {'p95 ms':>9}"
+        )
+        recall, (p50, p95) = await run(single, query_vectors, truth, args.top_k)
+        print(f"{'single-stage':<28} {recall:10.3f} {p50:9.2f} {p95:9.2f}")
+
+        for multiplier in (int(m) for m in args.multipliers.split(",")):
+            two_stage.rerank_candidates = multiplier
+            recall, (p50, p95) = await run(two_stage, query_vectors, truth, args.top_k)
+            label = f"two-stage {args.coarse} x{multiplier}"
+            print(f"{label:<28} {recall:10.3f} {p50:9.2f} {p95:9.2f}")
+    finally:
+        async with single._connection() as conn:
+            await conn.execute(
+                SQL("DROP TABLE IF EXISTS {table}").format(table=Identifier(table))
+            )
+            await conn.execute(
+                SQL("DELETE FROM {registry} WHERE table_name = %s").format(
+                    registry=Identifier(REGISTRY_TABLE)
+                ),
+                [table],
+            )
+        await close_async_pools()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
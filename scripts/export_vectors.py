@@ -0,0 +1,45 @@
+"""
+export_vectors.py
+─────────────────────────────────────────────────────────────────────────────
+Streams a vector collection to disk as numbered .npy + .jsonl parts, one part
+in memory at a time. Rerunning after an interruption resumes from the last
+finished part. Load the result into any backend with scripts.import_vectors —
+no parsing or embedding calls needed:
+
+    python -m scripts.export_vectors exports/rag_512
+    python -m scripts.export_vectors exports/rag_512 --backend pinecone
+─────────────────────────────────────────────────────────────────────────────
+"""
+
+import argparse
+import asyncio
+
+from app.components.vector_dbs.factory import create_vector_db
+from app.components.vector_dbs.pg_pool import close_async_pools
+from app.core.config import settings
+from app.services.vector_transfer import VectorTransferService
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("out_dir", help="export directory (created if missing)")
+    parser.add_argument(
+        "--backend",
+        choices=["pgvector", "pinecone", "numpy"],
+        default=settings.ACTIVE_VECTOR_DB,
+    )
+    parser.add_argument("--part-rows", type=int, default=50_000, help="rows per part")
+    parser.add_argument(
+        "--page-size", type=int, default=1000, help="rows per backend read"
+    )
+    args = parser.parse_args()
+
+    service = VectorTransferService(create_vector_db(args.backend))
+    try:
+        await service.export_to(args.out_dir, args.part_rows, args.page_size)
+    finally:
+        await close_async_pools()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+"""
+import_vectors.py
+─────────────────────────────────────────────────────────────────────────────
+Bulk-loads an export written by scripts.export_vectors into a backend through
+its fastest write path (binary COPY with the HNSW build deferred for pgvector,
+concurrent gRPC batches for Pinecone). Rerunning after an interruption skips
+the parts already loaded:
+
+    python -m scripts.import_vectors exports/rag_512 --backend pgvector
+─────────────────────────────────────────────────────────────────────────────
+"""
+
+import argparse
+import asyncio
+
+from app.components.vector_dbs.factory import create_vector_db
+from app.components.vector_dbs.pg_pool import close_async_pools
+from app.core.config import settings
+from app.services.vector_transfer import VectorTransferService
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("in_dir", help="directory written by scripts.export_vectors")
+    parser.add_argument(
+        "--backend",
+        choices=["pgvector", "pinecone", "numpy"],
+        default=settings.ACTIVE_VECTOR_DB,
+    )
+    parser.add_argument("--batch", type=int, default=5000, help="rows per upsert call")
+    parser.add_argument(
+        "--online",
+        action="store_true",
+        help="keep indexes live while loading instead of bulk_load()",
+    )
+    args = parser.parse_args()
+
+    service = VectorTransferService(create_vector_db(args.backend))
+    try:
+        await service.import_from(args.in_dir, args.batch, bulk_load=not args.online)
+    finally:
+        await close_async_pools()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""
+rebalance_shards.py
+─────────────────────────────────────────────────────────────────────────────
+Moves pgvector sources onto their consistent-hash owner after PGVECTOR_SHARDS
+changed: a new shard takes over its arc of the ring, shards listed in
+PGVECTOR_DRAINING_SHARDS are emptied. Each move is online (dual writes, binary
+COPY, placement flip, delete) so the app keeps serving reads and writes:
+
+    python -m scripts.rebalance_shards --dry-run
+    python -m scripts.rebalance_shards
+─────────────────────────────────────────────────────────────────────────────
+"""
+
+import argparse
+import asyncio
+
+from app.components.vector_dbs.pg_pool import close_async_pools
+from app.components.vector_dbs.pgvector_sharded import ShardedPGVectorDB
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dry-run", action="store_true", help="only print the plan")
+    parser.add_argument(
+        "--grace",
+        type=float,
+        default=None,
+        help="seconds to wait for workers to see each placement change "
+        "(default: 2 x PGVECTOR_PLACEMENT_TTL)",
+    )
+    args = parser.parse_args()
+
+    db = ShardedPGVectorDB()
+    try:
+        moves = await db.rebalance(dry_run=True)
+        for source, current, target in moves:
+            print(f"  {source}: {current} -> {target}")
+        print(f"{len(moves)} source(s) to move across {len(db.shards)} shards")
+        if moves and not args.dry_run:
+            await db.rebalance(grace=args.grace)
+            print("Rebalance complete.")
+    finally:
+        await close_async_pools()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
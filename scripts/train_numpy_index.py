@@ -0,0 +1,37 @@
+"""
+train_numpy_index.py
+─────────────────────────────────────────────────────────────────────────────
+Trains the IVF-PQ index of the embedded NumPy store (NUMPY_STORE_DIR) on its
+current vectors and encodes every segment. Later upserts are encoded with the
+same quantizer, so rerun this only after the data has drifted a lot. Searches
+use the index once NUMPY_INDEX=ivfpq:
+
+    python -m scripts.train_numpy_index --nlist 1024 --m 64
+─────────────────────────────────────────────────────────────────────────────
+"""
+
+import argparse
+import asyncio
+
+from app.components.vector_dbs.numpy_db import NumpyVectorDB
+from app.core.config import settings
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nlist", type=int, default=settings.NUMPY_IVF_NLIST)
+    parser.add_argument("--m", type=int, default=settings.NUMPY_IVF_PQ_M)
+    parser.add_argument("--sample", type=int, default=settings.NUMPY_IVF_TRAIN_SAMPLE)
+    args = parser.parse_args()
+
+    db = NumpyVectorDB()
+    await db.train_index(nlist=args.nlist, m=args.m, sample_size=args.sample)
+    footprint = db.index_footprint()
+    print(
+        f"{footprint['rows']} rows: vectors {footprint['vectors'] / 2**20:.1f} MiB, "
+        f"IVF-PQ {footprint['ivfpq'] / 2**20:.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""Unit tests for token-budget batch packing and the shared token counter."""
+
+import asyncio
+import random
+from typing import List
+
+import pytest
+import tiktoken
+
+from app.components.embedders import batching
+from app.components.embedders.batching import TokenCounter, pack_batches
+from app.components.embedders.langchain_wrapper import LangChainEmbeddingsWrapper
+from app.core.config import settings
+from app.core.interfaces import BaseEmbedder
+
+
+class WordEncoder:
+    """Stands in for the tiktoken encoding: one token per word."""
+
+    def __init__(self):
+        self.encoded: List[str] = []
+
+    def encode_batch(self, texts: List[str]) -> List[List[str]]:
+        self.encoded.extend(texts)
+        return [text.split() for text in texts]
+
+
+@pytest.fixture
+def encoder(monkeypatch: pytest.MonkeyPatch) -> WordEncoder:
+    """Counts words instead of loading a tiktoken vocabulary."""
+    word_encoder = WordEncoder()
+    monkeypatch.setattr(tiktoken, "encoding_for_model", lambda model: word_encoder)
+    monkeypatch.setattr(batching, "_counter", None)
+    return word_encoder
+
+
+def sizes(ranges: List[tuple]) -> List[int]:
+    return [end - start for start, end in ranges]
+
+
+def test_batches_respect_the_item_limit():
+    ranges = pack_batches([1] * 10, max_tokens=100, max_items=4)
+    assert ranges == [(0, 4), (4, 8), (8, 10)]
+
+
+def test_batches_respect_the_token_budget():
+    ranges = pack_batches([40, 40, 40, 10, 90], max_tokens=100, max_items=32)
+    assert ranges == [(0, 2), (2, 4), (4, 5)]
+
+
+def test_oversized_text_gets_a_batch_of_its_own():
+    ranges = pack_batches([10, 500, 10, 10], max_tokens=100, max_items=32)
+    assert ranges == [(0, 1), (1, 2), (2, 4)]
+
+
+def test_packing_covers_every_text_in_order():
+    counts = [random.Random(i).randint(1, 60) for i in range(200)]
+    ranges = pack_batches(counts, max_tokens=100, max_items=5)
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(counts)
+    assert [end for _, end in ranges[:-1]] == [start for start, _ in ranges[1:]]
+    assert max(sizes(ranges)) <= 5
+    assert all(sum(counts[start:end]) <= 100 for start, end in ranges)
+    assert pack_batches([], max_tokens=100, max_items=5) == []
+
+
+def test_counter_reuses_remembered_counts(encoder: WordEncoder):
+    counter = TokenCounter("text-embedding-3-small", max_entries=10)
+    counter.remember(["chunk one"], [7])
+
+    assert counter.count(["chunk one", "three more words"]) == [7, 3]
+    assert encoder.encoded == ["three more words"]
+    assert counter.count(["three more words"]) == [3]
+    assert encoder.encoded == ["three more words"]
+
+
+def test_counter_forgets_the_oldest_counts(encoder: WordEncoder):
+    counter = TokenCounter("text-embedding-3-small", max_entries=2)
+    counter.remember(["a", "b"], [10, 20])
+    counter.remember(["c"], [30])
+
+    assert counter.count(["b", "c", "a"]) == [20, 30, 1]  # "a" was re-encoded
+    assert encoder.encoded == ["a"]
+
+
+def test_documents_come_back_in_order(
+    encoder: WordEncoder, monkeypatch: pytest.MonkeyPatch
+):
+    class SlowEmbedder(BaseEmbedder):
+        """Later batches finish first; vector [i] belongs to text "t i"."""
+
+        async def embed_text(self, text: str) -> List[float]:
+            return (await self.embed_batch([text]))[0]
+
+        async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+            first = int(texts[0].split()[1])
+            await asyncio.sleep(0.001 * (50 - first))
+            return [[float(text.split()[1])] for text in texts]
+
+    monkeypatch.setattr(settings, "BATCH_SIZE", 3)
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_TOKENS", 100)
+    texts = [f"t {i}" for i in range(20)]
+
+    vectors = LangChainEmbeddingsWrapper(SlowEmbedder()).embed_documents(texts)
+
+    assert vectors == [[float(i)] for i in range(20)]
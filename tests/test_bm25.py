@@ -0,0 +1,128 @@
+"""Unit tests for the BM25 sparse encoder and its SQLite statistics."""
+
+import asyncio
+import math
+from typing import Dict, List, Tuple
+
+import pytest
+from pinecone import SparseValues
+
+from app.components.vector_dbs.bm25 import (
+    BM25Encoder,
+    term_id,
+    tokenize,
+    weight_hybrid,
+)
+
+
+@pytest.fixture
+def encoder(tmp_path) -> BM25Encoder:
+    return BM25Encoder(str(tmp_path / "bm25.sqlite3"))
+
+
+def add(encoder: BM25Encoder, docs: List[Tuple[str, str, str]]):
+    """Records (chunk id, source, text) documents."""
+    counts = encoder.count_terms([text for _, _, text in docs])
+    documents = [
+        (chunk_id, source, tf) for (chunk_id, source, _), tf in zip(docs, counts)
+    ]
+    asyncio.run(encoder.add_documents(documents))
+
+
+def stats(encoder: BM25Encoder) -> Dict[str, list]:
+    with encoder._lock:
+        return {
+            table: sorted(encoder._conn.execute(f"SELECT * FROM {table}").fetchall())
+            for table in (
+                "bm25_sources",
+                "bm25_source_terms",
+                "bm25_terms",
+                "bm25_docs",
+            )
+        }
+
+
+def query_weights(encoder: BM25Encoder, text: str) -> Dict[int, float]:
+    (vector,) = asyncio.run(encoder.encode_queries([text]))
+    return dict(zip(vector.indices, vector.values)) if vector else {}
+
+
+def test_identifiers_are_kept_whole_and_split_into_parts():
+    assert tokenize("Order SKU-4411-B shipped") == [
+        "order",
+        "sku-4411-b",
+        "sku",
+        "4411",
+        "b",
+        "shipped",
+    ]
+    assert tokenize("v1.2 of the API") == ["v1.2", "v1", "2", "api"]
+    assert tokenize("The cat is on it") == ["cat"]  # stopwords dropped
+
+
+def test_rare_terms_weigh_more_in_queries(encoder: BM25Encoder):
+    add(
+        encoder,
+        [
+            ("1", "doc", "shared rare"),
+            ("2", "doc", "shared common"),
+            ("3", "doc", "shared common"),
+            ("4", "doc", "shared common"),
+        ],
+    )
+    weights = query_weights(encoder, "rare common shared unseen")
+
+    assert term_id("unseen") not in weights
+    assert sum(weights.values()) == pytest.approx(1.0)
+    idf = {
+        token: math.log(1 + (4 - df + 0.5) / (df + 0.5))
+        for token, df in (("rare", 1), ("common", 3), ("shared", 4))
+    }
+    total = sum(idf.values())
+    for token, weight in idf.items():
+        assert weights[term_id(token)] == pytest.approx(weight / total)
+    assert weights[term_id("rare")] > weights[term_id("common")]
+
+
+def test_adding_the_same_ids_again_is_idempotent(encoder: BM25Encoder):
+    docs = [("1", "doc", "alpha beta"), ("2", "doc", "beta gamma")]
+    add(encoder, docs)
+    before = stats(encoder)
+
+    add(encoder, docs)
+    assert stats(encoder) == before
+
+    # A replaced chunk takes its old terms out
+    add(encoder, [("2", "doc", "delta")])
+    assert query_weights(encoder, "gamma") == {}
+    assert set(query_weights(encoder, "beta delta")) == {
+        term_id("beta"),
+        term_id("delta"),
+    }
+    assert stats(encoder)["bm25_sources"] == [("doc", 2, 3)]
+
+
+def test_delete_source_clears_its_statistics(encoder: BM25Encoder):
+    add(encoder, [("1", "keep", "alpha beta")])
+    kept = stats(encoder)
+    add(encoder, [("2", "drop", "beta gamma"), ("3", "drop", "gamma")])
+
+    asyncio.run(encoder.delete_source("drop"))
+    assert stats(encoder) == kept
+    assert query_weights(encoder, "gamma") == {}
+
+
+def test_weight_hybrid_at_the_ends_of_alpha():
+    dense = [0.5, -1.0]
+    sparse = SparseValues(indices=[3, 7], values=[0.25, 0.75])
+
+    dense_only = weight_hybrid(dense, sparse, 1.0)
+    assert dense_only[0] == dense and dense_only[1].values == [0.0, 0.0]
+
+    sparse_only = weight_hybrid(dense, sparse, 0.0)
+    assert sparse_only[0] == [0.0, -0.0]
+    assert sparse_only[1].indices == [3, 7] and sparse_only[1].values == [0.25, 0.75]
+
+    assert weight_hybrid(dense, None, 0.3) == (dense, None)
+    with pytest.raises(ValueError):
+        weight_hybrid(dense, sparse, 1.5)
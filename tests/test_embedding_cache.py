@@ -0,0 +1,59 @@
+"""Unit tests for the embedding cache's LRU and its SQLite store."""
+
+import asyncio
+from typing import Dict
+
+import numpy as np
+import pytest
+
+from app.components.embedders import embedding_cache
+from app.components.embedders.embedding_cache import (
+    CACHE_TABLE,
+    EmbeddingCache,
+    SQLiteEmbeddingStore,
+)
+
+
+@pytest.fixture
+def store(tmp_path) -> SQLiteEmbeddingStore:
+    return SQLiteEmbeddingStore(str(tmp_path / "cache.sqlite3"))
+
+
+def last_used(store: SQLiteEmbeddingStore) -> Dict[bytes, float]:
+    with store._lock:
+        rows = store._conn.execute(f"SELECT key, last_used FROM {CACHE_TABLE}")
+        return dict(rows.fetchall())
+
+
+def test_memory_hits_refresh_the_store_in_batches(
+    store: SQLiteEmbeddingStore, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(embedding_cache, "TOUCH_BATCH_KEYS", 2)
+    cache = EmbeddingCache(store, memory_items=10, max_bytes=2**20)
+    vectors = {key: np.ones(4, dtype=np.float32) for key in (b"a", b"b", b"c")}
+    asyncio.run(cache.put_many(vectors))
+    with store._lock, store._conn:
+        store._conn.execute(f"UPDATE {CACHE_TABLE} SET last_used = 0")
+
+    found = asyncio.run(cache.get_many([b"a"]))
+    assert list(found) == [b"a"] and cache.memory_hits == 1
+    assert set(last_used(store).values()) == {0}  # one key is not a batch yet
+
+    asyncio.run(cache.get_many([b"b"]))
+    assert {key for key, used in last_used(store).items() if used} == {b"a", b"b"}
+
+
+def test_pending_hits_are_written_before_eviction(
+    store: SQLiteEmbeddingStore, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(embedding_cache, "EVICTION_CHECK_ROWS", 1)
+    vector = np.ones(256, dtype=np.float32)  # 1 KiB per entry
+    cache = EmbeddingCache(store, memory_items=10, max_bytes=2500)
+    asyncio.run(cache.put_many({b"old": vector, b"hot": vector}))
+    with store._lock, store._conn:
+        store._conn.execute(f"UPDATE {CACHE_TABLE} SET last_used = 0")
+
+    asyncio.run(cache.get_many([b"hot"]))  # served from memory
+    asyncio.run(cache.put_many({b"new": vector}))
+
+    assert set(last_used(store)) == {b"hot", b"new"}
@@ -0,0 +1,112 @@
+"""Unit tests for MicroBatchingEmbedder: windows, de-duplication and failures."""
+
+import asyncio
+from typing import Any, List, Optional
+
+import pytest
+
+from app.components.embedders.micro_batcher import MicroBatchingEmbedder
+from app.core.interfaces import BaseEmbedder
+
+
+class RecordingEmbedder(BaseEmbedder):
+    """Embeds a text as [len(text)]; records every batch it is sent."""
+
+    def __init__(self, fail_on: Optional[str] = None, short: bool = False):
+        self.batches: List[List[str]] = []
+        self.fail_on = fail_on
+        self.short = short
+
+    async def embed_text(self, text: str) -> List[float]:
+        return (await self.embed_batch([text]))[0]
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        self.batches.append(list(texts))
+        if self.fail_on in texts:
+            raise ValueError(f"cannot embed {self.fail_on}")
+        vectors = [[float(len(text))] for text in texts]
+        return vectors[:-1] if self.short else vectors
+
+
+def gather(*calls: Any) -> List[Any]:
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(*calls, return_exceptions=True), timeout=2
+        )
+
+    return asyncio.run(main())
+
+
+def test_full_window_is_sent_without_waiting():
+    inner = RecordingEmbedder()
+    batcher = MicroBatchingEmbedder(inner, max_wait_ms=60_000, max_items=3)
+
+    results = gather(*(batcher.embed_text(text) for text in ["a", "bb", "ccc"]))
+
+    assert results == [[1.0], [2.0], [3.0]]
+    assert inner.batches == [["a", "bb", "ccc"]]
+
+
+def test_partial_window_is_sent_by_the_timer():
+    inner = RecordingEmbedder()
+    batcher = MicroBatchingEmbedder(inner, max_wait_ms=5, max_items=100)
+
+    assert gather(batcher.embed_text("a"), batcher.embed_text("bb")) == [
+        [1.0],
+        [2.0],
+    ]
+    assert inner.batches == [["a", "bb"]]
+    assert batcher.stats()["batch_size"]["count"] == 1
+
+
+def test_identical_texts_are_embedded_once():
+    inner = RecordingEmbedder()
+    batcher = MicroBatchingEmbedder(inner, max_wait_ms=5, max_items=100)
+
+    results = gather(*(batcher.embed_text(text) for text in ["a", "bb", "a", "a"]))
+
+    assert results == [[1.0], [2.0], [1.0], [1.0]]
+    assert inner.batches == [["a", "bb"]]
+
+
+def test_failed_batch_is_retried_text_by_text():
+    inner = RecordingEmbedder(fail_on="bad")
+    batcher = MicroBatchingEmbedder(inner, max_wait_ms=5, max_items=100)
+
+    ok, bad, fine = gather(
+        batcher.embed_text("ok"), batcher.embed_text("bad"), batcher.embed_text("fine")
+    )
+
+    assert ok == [2.0] and fine == [4.0]
+    assert isinstance(bad, ValueError)
+    assert inner.batches == [["ok", "bad", "fine"], ["ok"], ["bad"], ["fine"]]
+
+
+def test_short_result_fails_the_callers_instead_of_hanging():
+    inner = RecordingEmbedder(short=True)
+    batcher = MicroBatchingEmbedder(inner, max_wait_ms=5, max_items=100)
+
+    results = gather(batcher.embed_text("a"), batcher.embed_text("b"))
+
+    # The batch and both single retries come back one vector short
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(inner.batches) == 3
+
+
+def test_large_batches_bypass_the_window():
+    inner = RecordingEmbedder()
+    batcher = MicroBatchingEmbedder(inner, max_wait_ms=60_000, max_items=2)
+
+    assert gather(batcher.embed_batch(["a", "bb"])) == [[[1.0], [2.0]]]
+    assert inner.batches == [["a", "bb"]]
+
+
+@pytest.mark.parametrize("max_items", [1, 4])
+def test_stats_count_every_window(max_items: int):
+    inner = RecordingEmbedder()
+    batcher = MicroBatchingEmbedder(inner, max_wait_ms=5, max_items=max_items)
+
+    gather(*(batcher.embed_text(text) for text in ["a", "b", "c", "d"]))
+
+    assert batcher.stats()["batch_size"]["count"] == len(inner.batches)
+    assert sum(len(batch) for batch in inner.batches) == 4
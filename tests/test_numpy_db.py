@@ -0,0 +1,150 @@
+"""Unit tests for the embedded NumPy store and its IVF-PQ index, on temp dirs."""
+
+import asyncio
+import json
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pytest
+
+from app.components.vector_dbs import numpy_db
+from app.components.vector_dbs.ivfpq import IVFPQQuantizer
+from app.components.vector_dbs.numpy_db import NumpyVectorDB
+from app.core.config import settings
+from app.models.domain import DocumentChunk, SearchOptions
+
+DIMENSION = 32
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch: pytest.MonkeyPatch) -> NumpyVectorDB:
+    monkeypatch.setattr(settings, "NUMPY_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "EMBEDDING_DIMENSION", DIMENSION)
+    monkeypatch.setattr(settings, "NUMPY_STORE_DTYPE", "float32")
+    monkeypatch.setattr(settings, "NUMPY_INDEX", "ivfpq")
+    monkeypatch.setattr(settings, "NUMPY_IVF_PQ_M", 8)
+    monkeypatch.setattr(settings, "NUMPY_IVF_NPROBE", 4)
+    monkeypatch.setattr(settings, "NUMPY_IVF_REFINE", 10)
+    monkeypatch.setattr(numpy_db, "_manifests", {})
+    return NumpyVectorDB()
+
+
+def clustered(count: int, seed: int = 0, clusters: int = 16) -> np.ndarray:
+    """Unit vectors around `clusters` random centres, like real embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, DIMENSION))
+    points = centres[rng.integers(clusters, size=count)]
+    points += 0.3 * rng.standard_normal((count, DIMENSION))
+    return (points / np.linalg.norm(points, axis=1, keepdims=True)).astype(np.float32)
+
+
+def make_chunks(vectors: np.ndarray, start: int = 0) -> List[DocumentChunk]:
+    return [
+        DocumentChunk(
+            id=f"c{i}", text=f"chunk {i}", metadata={"source": f"doc-{i % 4}"}
+        )
+        for i in range(start, start + len(vectors))
+    ]
+
+
+def search_ids(db: NumpyVectorDB, query: np.ndarray, top_k: int) -> List[str]:
+    return [hit.id for hit in asyncio.run(db.search(query.tolist(), top_k))]
+
+
+def codes_by_id(db: NumpyVectorDB) -> Dict[str, Tuple[int, bytes]]:
+    """id -> (inverted list, PQ code) of every encoded row."""
+    found = {}
+    for entry in db._manifest()["sources"].values():
+        base = db._path(f"{entry['segment']}-{entry['generation']}")
+        with open(base + ".ids.json", "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        assign, codes = db._read_codes(entry)
+        for chunk_id, list_id, code in zip(ids, assign, codes):
+            found[chunk_id] = (int(list_id), code.tobytes())
+    return found
+
+
+def test_quantizer_encodes_rows_to_their_nearest_list():
+    data = clustered(1000)
+    quantizer = IVFPQQuantizer.train(data, nlist=16, m=8)
+
+    assign, codes = quantizer.encode(data)
+    distances = ((data[:, None, :] - quantizer.centroids[None]) ** 2).sum(axis=2)
+    assert (assign == distances.argmin(axis=1)).all()
+    assert codes.shape == (1000, 8) and codes.dtype == np.uint8
+
+    probed, _ = quantizer.probe(data[0], nprobe=100)
+    assert len(probed) == 16 and assign[0] in probed
+
+
+def test_ivfpq_recall_matches_exact_search(
+    store: NumpyVectorDB, monkeypatch: pytest.MonkeyPatch
+):
+    data = clustered(3000)
+    asyncio.run(store.upsert(make_chunks(data), data.tolist()))
+    queries = clustered(50, seed=1)
+
+    monkeypatch.setattr(settings, "NUMPY_INDEX", "exact")
+    exact = [search_ids(store, query, 10) for query in queries]
+    monkeypatch.setattr(settings, "NUMPY_INDEX", "ivfpq")
+    asyncio.run(store.train_index(nlist=16, m=8))
+    approximate = [search_ids(store, query, 10) for query in queries]
+
+    recall = np.mean([len(set(a) & set(e)) / 10 for a, e in zip(approximate, exact)])
+    assert recall >= 0.9
+
+
+def test_upserts_after_training_keep_old_codes_and_encode_new_rows(
+    store: NumpyVectorDB,
+):
+    data = clustered(1200)
+    asyncio.run(store.upsert(make_chunks(data[:1000]), data[:1000].tolist()))
+    asyncio.run(store.train_index(nlist=16, m=8))
+    before = codes_by_id(store)
+    assert len(before) == 1000
+
+    asyncio.run(
+        store.upsert(make_chunks(data[1000:], start=1000), data[1000:].tolist())
+    )
+    after = codes_by_id(store)
+
+    assert len(after) == 1200
+    assert all(after[chunk_id] == code for chunk_id, code in before.items())
+    _, quantizer = store._quantizer(store._manifest())
+    assign, codes = quantizer.encode(data[1000:])
+    for i in range(200):
+        assert after[f"c{1000 + i}"] == (int(assign[i]), codes[i].tobytes())
+    # The new rows are found through the index
+    assert search_ids(store, data[1100], 1) == ["c1100"]
+
+
+def test_nprobe_is_clamped_to_the_lists_of_a_small_index(
+    store: NumpyVectorDB, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "NUMPY_IVF_NPROBE", 32)
+    data = clustered(500)
+    asyncio.run(store.upsert(make_chunks(data), data.tolist()))
+    asyncio.run(store.train_index(nlist=8, m=8))
+
+    for profile in ("fast", "balanced", "exhaustive"):
+        described = store.describe_retrieval(SearchOptions(profile=profile), 5)
+        assert "nlist=8, m=8, nprobe=8," in described["index"]
+    assert store._nprobe(SearchOptions(profile="fast"), 1024) == 16
+    assert store._nprobe(SearchOptions(profile="exhaustive"), 1024) == 128
+
+
+def test_duplicate_ids_in_one_upsert_keep_the_last_row(store: NumpyVectorDB):
+    data = clustered(4, seed=2)
+    chunks = [
+        DocumentChunk(id="a", text="first", metadata={"source": "doc"}),
+        DocumentChunk(id="b", text="other", metadata={"source": "doc"}),
+        DocumentChunk(id="a", text="second", metadata={"source": "doc"}),
+        DocumentChunk(id="a", text="moved", metadata={"source": "elsewhere"}),
+    ]
+    asyncio.run(store.upsert(chunks, data.tolist()))
+
+    exported, vectors, cursor = asyncio.run(store.export_page(None, 10))
+    assert sorted((c.id, c.text) for c in exported) == [("a", "moved"), ("b", "other")]
+    assert cursor is None and len(vectors) == 2
+    hits = asyncio.run(store.search(data[3].tolist(), 4))
+    assert [hit.id for hit in hits] == ["a", "b"] and hits[0].text == "moved"
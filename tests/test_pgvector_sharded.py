@@ -0,0 +1,234 @@
+"""
+Integration tests for ShardedPGVectorDB against real Postgres servers with the
+pgvector extension. They need DATABASE_URL (the placement directory) and three
+or more empty shard databases in PGVECTOR_TEST_SHARDS, and are skipped without:
+
+    PGVECTOR_TEST_SHARDS='{"shard_a": "postgresql://postgres@localhost/shard_a",
+                           "shard_b": "postgresql://postgres@localhost/shard_b",
+                           "shard_c": "postgresql://postgres@localhost/shard_c"}' \\
+    python -m pytest tests
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from typing import Any, Awaitable, Dict, Iterator, List, Tuple
+
+import numpy as np
+import psycopg
+import pytest
+from psycopg.sql import SQL, Identifier
+
+from app.components.vector_dbs.pg_pool import close_async_pools
+from app.components.vector_dbs.pgvector_db import REGISTRY_TABLE
+from app.components.vector_dbs.pgvector_sharded import (
+    PLACEMENT_TABLE,
+    ShardedPGVectorDB,
+    ShardRing,
+)
+from app.core.config import settings
+from app.models.domain import DocumentChunk
+
+SHARDS: Dict[str, str] = json.loads(os.getenv("PGVECTOR_TEST_SHARDS", "{}"))
+
+needs_shards = pytest.mark.skipif(
+    len(SHARDS) < 3, reason="PGVECTOR_TEST_SHARDS needs three shard databases"
+)
+
+
+def run(scenario: Awaitable[Any]) -> Any:
+    """Runs one test on its own event loop; pools are bound to it, so close them."""
+
+    async def main():
+        try:
+            return await scenario
+        finally:
+            await close_async_pools()
+
+    return asyncio.run(main())
+
+
+def make_chunks(
+    source: str, count: int, start: int = 0, version: int = 0
+) -> Tuple[List[DocumentChunk], List[List[float]]]:
+    """`count` chunks of `source`; a chunk id always gets the same unit vector."""
+    chunks, vectors = [], []
+    for i in range(start, start + count):
+        chunk_id = f"{source}-{i}"
+        seed = int.from_bytes(chunk_id.encode("utf-8")[-8:], "big")
+        vector = np.random.default_rng(seed).standard_normal(
+            settings.EMBEDDING_DIMENSION
+        )
+        chunks.append(
+            DocumentChunk(
+                id=chunk_id, text=f"{chunk_id} v{version}", metadata={"source": source}
+            )
+        )
+        vectors.append((vector / np.linalg.norm(vector)).tolist())
+    return chunks, vectors
+
+
+async def rows_on(db: ShardedPGVectorDB, shard: str, source: str) -> Dict[str, str]:
+    """id -> text of the source's rows stored on one shard."""
+    async with db.shards[shard]._connection() as conn:
+        cur = await conn.execute(
+            SQL("SELECT id, text FROM {table} WHERE metadata->>'source' = %s").format(
+                table=Identifier(db.table_name)
+            ),
+            [source],
+        )
+        return {row["id"]: row["text"] for row in await cur.fetchall()}
+
+
+@pytest.fixture
+def table(monkeypatch: pytest.MonkeyPatch) -> Iterator[str]:
+    """A fresh table name, dropped from every shard and the directory afterwards."""
+    monkeypatch.setattr(settings, "PGVECTOR_PARTITION_BY_SOURCE", False)
+    monkeypatch.setattr(settings, "PGVECTOR_DRAINING_SHARDS", [])
+    monkeypatch.setattr(settings, "PGVECTOR_SHARD_READ_URLS", {})
+    name = f"test_shards_{uuid.uuid4().hex[:8]}"
+    yield name
+
+    for dsn in SHARDS.values():
+        with psycopg.connect(dsn, autocommit=True) as conn:
+            conn.execute(SQL("DROP TABLE IF EXISTS {}").format(Identifier(name)))
+            conn.execute(
+                SQL("DELETE FROM {} WHERE table_name = %s").format(
+                    Identifier(REGISTRY_TABLE)
+                ),
+                [name],
+            )
+    with psycopg.connect(settings.DATABASE_URL, autocommit=True) as conn:
+        conn.execute(
+            SQL("DELETE FROM {} WHERE table_name = %s").format(
+                Identifier(PLACEMENT_TABLE)
+            ),
+            [name],
+        )
+
+
+def test_adding_a_shard_only_moves_sources_onto_it():
+    sources = [f"doc-{i}.pdf" for i in range(5000)]
+    before = ShardRing(["s0", "s1", "s2"], settings.PGVECTOR_SHARD_VNODES)
+    after = ShardRing(["s0", "s1", "s2", "s3"], settings.PGVECTOR_SHARD_VNODES)
+
+    moved = [
+        source for source in sources if before.owner(source) != after.owner(source)
+    ]
+    assert {after.owner(source) for source in moved} == {"s3"}
+    assert 0.15 < len(moved) / len(sources) < 0.35  # ~1/4 with four shards
+
+
+@needs_shards
+def test_placements_survive_a_new_shard_until_rebalanced(table: str):
+    names = sorted(SHARDS)
+    sources = [f"doc-{i}.pdf" for i in range(40)]
+
+    async def scenario():
+        two = ShardedPGVectorDB(table, {name: SHARDS[name] for name in names[:2]})
+        for source in sources:
+            await two.upsert(*make_chunks(source, 2))
+        placed = {s: p for s, (p, _) in (await two._placement_map(fresh=True)).items()}
+        assert set(placed.values()) <= set(names[:2])
+
+        three = ShardedPGVectorDB(table, {name: SHARDS[name] for name in names[:3]})
+        # The directory, not the new ring, decides where existing sources live
+        for source in sources:
+            await three.upsert(*make_chunks(source, 1, start=2))
+        for source in sources:
+            assert len(await rows_on(three, placed[source], source)) == 3
+
+        moves = await three.rebalance(dry_run=True)
+        expected = {s for s in sources if three.ring.owner(s) != placed[s]}
+        assert {source for source, _, _ in moves} == expected
+        assert {target for _, _, target in moves} <= {names[2]}
+
+    run(scenario())
+
+
+@needs_shards
+def test_move_source_keeps_concurrent_writes(
+    table: str, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "PGVECTOR_PLACEMENT_TTL", 0.05)
+    source = "moving.pdf"
+
+    async def scenario():
+        db = ShardedPGVectorDB(table, SHARDS)
+        chunks, vectors = make_chunks(source, 50)
+        await db.upsert(chunks, vectors)
+        expected = {chunk.id: chunk.text for chunk in chunks}
+        current, _ = (await db._locate([source]))[source]
+        target = next(name for name in sorted(SHARDS) if name != current)
+
+        stop = asyncio.Event()
+
+        async def writer():
+            # Every round adds new chunks and rewrites a few existing ones
+            version = 1
+            while not stop.is_set():
+                new = make_chunks(source, 3, start=len(expected), version=version)
+                old = make_chunks(source, 3, start=(version * 3) % 50, version=version)
+                for batch_chunks, batch_vectors in (new, old):
+                    await db.upsert(batch_chunks, batch_vectors)
+                    expected.update({c.id: c.text for c in batch_chunks})
+                version += 1
+                await asyncio.sleep(0.005)
+            return version
+
+        task = asyncio.create_task(writer())
+        await db.move_source(source, target, grace=0.2)
+        stop.set()
+        assert await task > 5  # writes really overlapped the move
+
+        assert (await db._placement_map(fresh=True))[source] == (target, None)
+        assert await rows_on(db, target, source) == expected
+        assert await rows_on(db, current, source) == {}
+
+    run(scenario())
+
+
+@needs_shards
+def test_searches_keep_finding_sources_while_a_shard_drains(
+    table: str, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "PGVECTOR_PLACEMENT_TTL", 0.05)
+    sources = [f"doc-{i}.pdf" for i in range(12)]
+
+    async def scenario():
+        db = ShardedPGVectorDB(table, SHARDS)
+        batches = [make_chunks(source, 5) for source in sources]
+        for chunks, vectors in batches:
+            await db.upsert(chunks, vectors)
+
+        placements = await db._placement_map(fresh=True)
+        draining = placements[sources[0]][0]
+        probes = [
+            (chunks[0], vectors[0])
+            for chunks, vectors in batches
+            if placements[chunks[0].metadata["source"]][0] == draining
+        ]
+        monkeypatch.setattr(settings, "PGVECTOR_DRAINING_SHARDS", [draining])
+        rebalancer = ShardedPGVectorDB(table, SHARDS)
+        rebalance = asyncio.create_task(rebalancer.rebalance(grace=0.1))
+
+        rounds = 0
+        while not rebalance.done() or rounds == 0:
+            for chunk, vector in probes:
+                scoped = {"source": chunk.metadata["source"]}
+                for filters in (None, scoped):  # fan-out, then routed
+                    hits = await db.search(vector, 1, filters)
+                    assert [hit.id for hit in hits] == [chunk.id]
+            rounds += 1
+
+        moves = await rebalance
+        assert {source for source, _, _ in moves} >= {
+            c.metadata["source"] for c, _ in probes
+        }
+        assert all(shard == draining for _, shard, _ in moves)
+        for source in sources:
+            assert await rows_on(db, draining, source) == {}
+        assert rounds > 1  # searches really overlapped the drain
+
+    run(scenario())
@@ -0,0 +1,215 @@
+"""Unit tests for the embedding scheduler: quotas, AIMD and retry handling."""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from app.components.embedders import scheduler as scheduler_module
+from app.components.embedders.scheduler import EmbeddingScheduler, TokenBucket
+
+
+class ProviderError(Exception):
+    """An API error carrying what the scheduler reads: status and headers."""
+
+    def __init__(self, status_code: int, headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+@pytest.fixture
+def sleeps(monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    """Records the scheduler's sleeps instead of waiting them out."""
+    recorded: List[float] = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay: float):
+        recorded.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(scheduler_module.asyncio, "sleep", sleep)
+    return recorded
+
+
+def make_scheduler(max_concurrency: int = 8, max_retries: int = 3):
+    return EmbeddingScheduler(
+        rpm=0,
+        tpm=0,
+        max_concurrency=max_concurrency,
+        timeout=5,
+        max_retries=max_retries,
+    )
+
+
+class Flaky:
+    """A provider call that raises `errors` in turn, then succeeds."""
+
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_bucket_lets_a_full_minute_through_then_charges_debt(sleeps: List[float]):
+    bucket = TokenBucket(per_minute=60)  # one unit per second
+
+    async def main():
+        await bucket.acquire(60)
+        await bucket.acquire(30)
+
+    asyncio.run(main())
+    assert len(sleeps) == 1 and sleeps[0] == pytest.approx(30, abs=0.1)
+
+
+def test_bucket_serves_requests_larger_than_itself(sleeps: List[float]):
+    bucket = TokenBucket(per_minute=60)
+
+    async def main():
+        await bucket.acquire(500)  # capped at one minute's worth
+        await bucket.acquire(6)
+
+    asyncio.run(main())
+    assert len(sleeps) == 1 and sleeps[0] == pytest.approx(6, abs=0.1)
+
+
+def test_unlimited_bucket_never_waits(sleeps: List[float]):
+    asyncio.run(TokenBucket(per_minute=0).acquire(10**9))
+    assert sleeps == []
+
+
+def test_success_grows_the_limit_up_to_the_maximum(sleeps: List[float]):
+    scheduler = make_scheduler(max_concurrency=8)
+    scheduler.limit = 4.0
+
+    async def main():
+        for _ in range(4):
+            await scheduler.run(1, Flaky())
+
+    asyncio.run(main())
+    assert 4.9 < scheduler.limit < 5.1  # about +1 per round of `limit` requests
+
+    scheduler.limit = 7.99
+    asyncio.run(scheduler.run(1, Flaky()))
+    assert scheduler.limit == 8
+
+
+def test_throttling_halves_the_limit_once_per_backoff(sleeps: List[float]):
+    scheduler = make_scheduler(max_concurrency=8)
+    call = Flaky(ProviderError(429), ProviderError(429))
+
+    assert asyncio.run(scheduler.run(1, call)) == "ok"
+    assert call.calls == 3
+    # The second 429 lands inside the first one's backoff window
+    assert int(scheduler.limit) == 4
+    assert scheduler.stats()["throttled"] == 2
+
+
+def test_timeouts_count_as_throttling(sleeps: List[float]):
+    scheduler = make_scheduler(max_concurrency=8)
+    asyncio.run(scheduler.run(1, Flaky(asyncio.TimeoutError())))
+    assert int(scheduler.limit) == 4
+
+
+def test_server_errors_are_retried_without_touching_the_limit(sleeps: List[float]):
+    scheduler = make_scheduler(max_concurrency=8)
+    call = Flaky(ProviderError(503), ProviderError(500))
+
+    assert asyncio.run(scheduler.run(1, call)) == "ok"
+    assert call.calls == 3
+    assert scheduler.limit == 8
+    assert scheduler.stats()["throttled"] == 0
+
+
+def test_other_errors_are_not_retried(sleeps: List[float]):
+    scheduler = make_scheduler()
+    call = Flaky(ValueError("bad input"), ProviderError(400))
+
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.run(1, call))
+    with pytest.raises(ProviderError):
+        asyncio.run(scheduler.run(1, call))
+    assert call.calls == 2
+
+
+def test_retries_give_up_after_max_retries(sleeps: List[float]):
+    scheduler = make_scheduler(max_retries=2)
+    call = Flaky(*(ProviderError(503) for _ in range(5)))
+
+    with pytest.raises(ProviderError):
+        asyncio.run(scheduler.run(1, call))
+    assert call.calls == 3
+
+
+def test_retry_after_header_sets_the_delay(sleeps: List[float]):
+    scheduler = make_scheduler()
+    call = Flaky(ProviderError(429, {"retry-after": "7"}))
+
+    asyncio.run(scheduler.run(1, call))
+    assert sleeps == [7.0]
+
+
+def test_backoff_without_retry_after_is_jittered_exponential(sleeps: List[float]):
+    scheduler = make_scheduler(max_retries=3)
+    call = Flaky(*(ProviderError(503) for _ in range(3)))
+
+    asyncio.run(scheduler.run(1, call))
+    for attempt, delay in enumerate(sleeps):
+        assert 0.5 * 2**attempt <= delay <= 1.5 * 2**attempt
+
+
+def test_waiters_get_slots_in_arrival_order():
+    scheduler = make_scheduler(max_concurrency=2)
+    started: List[int] = []
+
+    async def main():
+        release = asyncio.Event()
+
+        def request(i: int):
+            async def call() -> Any:
+                started.append(i)
+                await release.wait()
+                return i
+
+            return scheduler.run(1, call)
+
+        tasks = [asyncio.create_task(request(i)) for i in range(6)]
+        await asyncio.sleep(0.01)
+        assert started == [0, 1]
+        assert scheduler.stats()["waiting"] == 4
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(main()) == list(range(6))
+    assert started == list(range(6))
+    assert scheduler.stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_gives_its_slot_back():
+    scheduler = make_scheduler(max_concurrency=1)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            await release.wait()
+            return "held"
+
+        holder = asyncio.create_task(scheduler.run(1, hold))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(scheduler.run(1, hold))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        release.set()
+        await holder
+        return await scheduler.run(1, Flaky())
+
+    assert asyncio.run(main()) == "ok"
+    assert scheduler.stats()["in_flight"] == 0
+    assert scheduler.stats()["waiting"] == 0